@@ -0,0 +1,1076 @@
+"""
+An asyncio client for the Docker Engine API.
+
+The methods of :py:class:`AsyncAPIClient` are the methods of
+:py:class:`~docker.api.client.APIClient`, built from the same API mixins: each
+call runs the mixin method against a recorder that captures the HTTP requests
+it makes instead of sending them. The requests are then sent on an asyncio
+connection and, if the method needs a response to carry on (to parse it, or to
+make another request), it is run again with the responses received so far.
+
+Requires Python 3.6+.
+"""
+import asyncio
+import collections
+import functools
+import inspect
+import json
+import os
+import re
+import ssl
+import struct
+from urllib.parse import urlencode, urlsplit
+
+import requests.exceptions
+from requests.structures import CaseInsensitiveDict
+
+from .build import BuildApiMixin
+from .client import APIClient
+from .config import ConfigApiMixin
+from .container import ContainerApiMixin
+from .daemon import DaemonApiMixin
+from .exec_api import ExecApiMixin
+from .image import ImageApiMixin, _pull_key
+from .network import NetworkApiMixin
+from .plugin import PluginApiMixin
+from .secret import SecretApiMixin
+from .service import ServiceApiMixin
+from .swarm import SwarmApiMixin
+from .volume import VolumeApiMixin
+from .. import auth
+from ..constants import (
+    DEFAULT_DOCKER_API_VERSION, DEFAULT_NUM_POOLS, DEFAULT_TIMEOUT_SECONDS,
+    DEFAULT_USER_AGENT, IS_WINDOWS_PLATFORM, SAVE_BUFFER_SIZE,
+    STREAM_HEADER_SIZE_BYTES, STREAM_READ_SIZE
+)
+from ..errors import (
+    DockerException, PullError, TLSParameterError,
+    create_api_error_from_http_exception
+)
+from ..tls import TLSConfig
+from ..utils import update_headers, utils
+from ..utils.json_stream import JSONStreamDecoder
+from ..utils.save import ArchiveWriter
+from ..utils.socket import STDERR, STDOUT, SocketTimeout, parse_chunk_size
+
+# The size of the chunks request bodies are read from files in
+BODY_READ_SIZE = 1024 * 1024
+
+API_MIXINS = (
+    BuildApiMixin, ConfigApiMixin, ContainerApiMixin, DaemonApiMixin,
+    ExecApiMixin, ImageApiMixin, NetworkApiMixin, PluginApiMixin,
+    SecretApiMixin, ServiceApiMixin, SwarmApiMixin, VolumeApiMixin,
+)
+
+# The methods which create build contexts, or may run credential helpers,
+# and are run in the default executor so as not to block the loop
+_BLOCKING_METHODS = frozenset([
+    BuildApiMixin.build, DaemonApiMixin.login, ImageApiMixin.pull,
+    ImageApiMixin.push, ImageApiMixin.inspect_distribution,
+    ImageApiMixin.should_pull, PluginApiMixin.create_plugin,
+    PluginApiMixin.pull_plugin, PluginApiMixin.push_plugin,
+    PluginApiMixin.upgrade_plugin, ServiceApiMixin.create_service,
+    ServiceApiMixin.update_service,
+])
+
+
+class AsyncAPIClient(object):
+    """
+    A low-level asyncio client for the Docker Engine API.
+
+    It has the same methods and arguments as
+    :py:class:`~docker.api.client.APIClient`, as coroutines. Methods
+    returning a stream return an async iterator instead, which can also be
+    iterated on directly:
+
+        >>> import docker.api.async_client
+        >>> client = docker.api.async_client.AsyncAPIClient()
+        >>> await client.inspect_container('web')
+        {'Id': '...', ...}
+        >>> async for event in client.events(decode=True):
+        ...     print(event)
+
+    With ``demux=True``, streams from :py:meth:`attach`, :py:meth:`logs` and
+    :py:meth:`exec_start` yield ``(stdout, stderr)`` tuples, where one of the
+    two items is ``None``.
+
+    Args:
+        base_url (str): URL to the Docker server. For example,
+            ``unix:///var/run/docker.sock`` or ``tcp://127.0.0.1:1234``.
+        version (str): The version of the API to use. Set to ``auto`` to
+            detect the server's version on the first call. Default: ``1.30``
+        timeout (int): Default timeout for API calls, in seconds.
+        tls (bool or :py:class:`~docker.tls.TLSConfig`): Enable TLS. Pass
+            ``True`` to enable it with default options, or pass a
+            :py:class:`~docker.tls.TLSConfig` object to use custom
+            configuration.
+        user_agent (str): Set a custom user agent for requests to the server.
+        num_pools (int): Maximum number of idle connections kept open.
+        max_connections (int): Maximum number of requests in flight. No limit
+            by default.
+    """
+
+    def __init__(self, base_url=None, version=None,
+                 timeout=DEFAULT_TIMEOUT_SECONDS, tls=False,
+                 user_agent=DEFAULT_USER_AGENT, num_pools=DEFAULT_NUM_POOLS,
+                 max_connections=None):
+        if tls and not base_url:
+            raise TLSParameterError(
+                'If using TLS, the base_url argument must be provided.'
+            )
+        self.timeout = timeout
+        self.headers = {'User-Agent': user_agent}
+        self._auth_configs = auth.load_config()
+        self._credentials = auth.CredentialCache()
+        self._registry_digests = {}
+        # The pulls run by pull_many(), by _pull_key()
+        self._pulls = {}
+
+        base_url = utils.parse_host(
+            base_url, IS_WINDOWS_PLATFORM, tls=bool(tls)
+        )
+        if base_url.startswith('http+unix://'):
+            path = base_url[len('http+unix://'):]
+            self._open_connection = functools.partial(
+                asyncio.open_unix_connection, path
+            )
+            self.base_url = 'http+docker://localunixsocket'
+        elif base_url.startswith('npipe://'):
+            raise DockerException(
+                'The npipe:// protocol is not supported by AsyncAPIClient'
+            )
+        else:
+            url = urlsplit(base_url)
+            kwargs = {}
+            if url.scheme == 'https':
+                kwargs['ssl'] = _ssl_context(tls)
+                assert_hostname = getattr(tls, 'assert_hostname', None)
+                if isinstance(assert_hostname, str):
+                    kwargs['server_hostname'] = assert_hostname
+            self._open_connection = functools.partial(
+                asyncio.open_connection, url.hostname, url.port, **kwargs
+            )
+            self.base_url = base_url
+
+        self._host = urlsplit(self.base_url).netloc
+        self._pool = _ConnectionPool(
+            self._open_connection, num_pools, max_connections
+        )
+        self._version_detection = None
+        if version is None:
+            self._version = DEFAULT_DOCKER_API_VERSION
+        elif isinstance(version, str):
+            self._version = None if version.lower() == 'auto' else version
+        else:
+            raise DockerException(
+                'Version parameter must be a string or None. Found {0}'.format(
+                    type(version).__name__
+                )
+            )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    @property
+    def api_version(self):
+        return self._version
+
+    def close(self):
+        """
+        Close the idle connections to the server.
+        """
+        self._pool.close()
+
+    def build(self, *args, **kwargs):
+        return _Call(self._build(args, kwargs))
+    build.__doc__ = BuildApiMixin.build.__doc__
+
+    async def _build(self, args, kwargs):
+        stream = kwargs.pop('stream', False)
+        decode = kwargs.pop('decode', False) and stream
+        output = await self._call(
+            BuildApiMixin.build, args, dict(kwargs, stream=True, decode=decode)
+        )
+        if stream:
+            return output
+        # Read the stream here rather than letting the method parse the
+        # output, which would make it create the build context again.
+        chunks = []
+        async for chunk in output:
+            chunks.append(chunk)
+        output = b''.join(chunks).decode('utf-8')
+        match = re.search(r'Successfully built ([0-9a-f]+)', output)
+        if not match:
+            return None, output
+        return match.group(1), output
+
+    def pull_many(self, references, max_workers=4, auth_config=None,
+                  progress=None):
+        return _Call(
+            self._pull_many(references, max_workers, auth_config, progress)
+        )
+    pull_many.__doc__ = ImageApiMixin.pull_many.__doc__
+
+    async def _pull_many(self, references, max_workers, auth_config,
+                         progress):
+        keys = collections.OrderedDict()
+        for reference in references:
+            keys.setdefault(_pull_key(reference, auth_config), reference)
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def pull(key):
+            future = self._pulls.get(key)
+            if future is None:
+                future = self._pulls[key] = asyncio.ensure_future(
+                    self._pull_events(
+                        keys[key], auth_config, progress, semaphore
+                    )
+                )
+
+                def forget(f):
+                    if self._pulls.get(key) is f:
+                        del self._pulls[key]
+                future.add_done_callback(forget)
+            try:
+                # Shielded, so that cancelling a caller doesn't cancel the
+                # pull the others are waiting for
+                return await asyncio.shield(future), None
+            except Exception as e:
+                return None, e
+
+        results = dict(zip(
+            keys, await asyncio.gather(*[pull(key) for key in keys])
+        ))
+        return dict(
+            (reference, results[_pull_key(reference, auth_config)])
+            for reference in references
+        )
+
+    async def _pull_events(self, reference, auth_config, progress,
+                           semaphore):
+        repository, tag = utils.parse_repository_tag(reference)
+        events = []
+        async with semaphore:
+            async for event in self.pull(
+                    repository, tag=tag or 'latest', stream=True,
+                    decode=True, auth_config=auth_config):
+                events.append(event)
+                if progress is not None:
+                    progress(reference, event)
+                if 'error' in event:
+                    raise PullError(reference, event['error'])
+        return events
+
+    def save_many(self, targets, max_workers=4,
+                  buffer_size=SAVE_BUFFER_SIZE):
+        return _Call(self._save_many(targets, max_workers, buffer_size))
+    save_many.__doc__ = ImageApiMixin.save_many.__doc__
+
+    async def _save_many(self, targets, max_workers, buffer_size):
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def save(image, target):
+            try:
+                async with semaphore:
+                    return await self._save_to(
+                        image, target, buffer_size
+                    ), None
+            except Exception as e:
+                return None, e
+
+        items = list(targets.items())
+        results = await asyncio.gather(
+            *[save(image, target) for image, target in items]
+        )
+        return dict(
+            (image, result) for (image, _), result in zip(items, results)
+        )
+
+    def save_to(self, image, target, buffer_size=SAVE_BUFFER_SIZE):
+        return _Call(self._save_to(image, target, buffer_size))
+    save_to.__doc__ = ImageApiMixin.save_to.__doc__
+
+    async def _save_to(self, image, target, buffer_size):
+        body = await self._call(ImageApiMixin.get_image, (image,), {})
+        loop = asyncio.get_event_loop()
+        try:
+            writer = ArchiveWriter(target)
+            try:
+                while True:
+                    data = await body.read(buffer_size)
+                    if not data:
+                        break
+                    # Writing to disk would block the loop
+                    await loop.run_in_executor(None, writer.write, data)
+            except BaseException:
+                writer.abort()
+                raise
+        finally:
+            body.close()
+        return writer.commit()
+
+    async def _call(self, method, args, kwargs):
+        if self._version is None:
+            await self._detect_version()
+        return await self._run(method, args, kwargs)
+
+    async def _run(self, method, args, kwargs):
+        responses = []
+        while True:
+            recorder = _Recorder(self, responses)
+            try:
+                if method in _BLOCKING_METHODS:
+                    result = await asyncio.get_event_loop().run_in_executor(
+                        None, functools.partial(
+                            method, recorder, *args, **kwargs
+                        )
+                    )
+                else:
+                    result = method(recorder, *args, **kwargs)
+            except _NeedResponse as e:
+                responses.append(await self._send(e.request))
+                continue
+            break
+
+        # Send the requests whose responses the method didn't look at, and
+        # raise the errors it would have raised.
+        for request in recorder.requests:
+            if isinstance(request, _PendingRequest):
+                request.response = await self._send(request)
+        for request in recorder.checks:
+            _raise_for_status(request.response)
+
+        if isinstance(result, _Deferred):
+            result = await result.resolve()
+        elif inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def _detect_version(self):
+        # Concurrent first calls share a single version request
+        if self._version_detection is None:
+            self._version_detection = asyncio.ensure_future(
+                self._run(DaemonApiMixin.version, (), {'api_version': False})
+            )
+        try:
+            info = await self._version_detection
+        except Exception as e:
+            self._version_detection = None
+            raise DockerException(
+                'Error while fetching server API version: {0}'.format(e)
+            )
+        try:
+            self._version = info['ApiVersion']
+        except KeyError:
+            raise DockerException(
+                'Invalid response from docker daemon: key "ApiVersion"'
+                ' is missing.'
+            )
+
+    async def _send(self, request):
+        timeout = request.timeout
+        if timeout is None or request.stream:
+            return await self._pool.request(self, request)
+        return await asyncio.wait_for(
+            self._pool.request(self, request), timeout
+        )
+
+    def _encode_request(self, request):
+        url = urlsplit(request.url)
+        target = url.path or '/'
+        if request.params:
+            query = urlencode([
+                (k, v) for k, v in _iter_params(request.params)
+            ])
+            if query:
+                target = '{0}?{1}'.format(target, query)
+        headers = CaseInsensitiveDict(self.headers)
+        headers['Host'] = self._host
+        headers.update(request.headers or {})
+        data = request.data
+        if data is None:
+            if request.method in ('POST', 'PUT'):
+                headers['Content-Length'] = '0'
+        elif isinstance(data, bytes):
+            headers['Content-Length'] = str(len(data))
+        else:
+            headers['Transfer-Encoding'] = 'chunked'
+
+        head = ['{0} {1} HTTP/1.1'.format(request.method, target)]
+        head.extend('{0}: {1}'.format(k, v) for k, v in headers.items())
+        return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'), data
+
+
+class _Call(object):
+    """The result of calling an :py:class:`AsyncAPIClient` method: it can be
+    awaited, or iterated over if the method returns a stream."""
+    __slots__ = ('_coroutine',)
+
+    def __init__(self, coroutine):
+        self._coroutine = coroutine
+
+    def __await__(self):
+        return self._coroutine.__await__()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        result = await self._coroutine
+        async for item in result:
+            yield item
+
+
+def _async_method(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return _Call(self._call(method, args, kwargs))
+    return wrapper
+
+
+for _mixin in API_MIXINS:
+    for _name, _method in vars(_mixin).items():
+        if (not _name.startswith('_') and inspect.isfunction(_method) and
+                _name not in vars(AsyncAPIClient)):
+            setattr(AsyncAPIClient, _name, _async_method(_method))
+
+
+def _iter_params(params):
+    # Same encoding as requests: None values are dropped, lists are repeated
+    for key, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            for item in value:
+                yield key, item
+        else:
+            yield key, value
+
+
+def _ssl_context(tls):
+    if not isinstance(tls, TLSConfig):
+        return ssl.create_default_context()
+    # The protocol is negotiated: TLSConfig's default of TLSv1 is disabled by
+    # current OpenSSL builds.
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if tls.verify:
+        if tls.ca_cert:
+            context.load_verify_locations(cafile=tls.ca_cert)
+        elif isinstance(tls.verify, str):
+            context.load_verify_locations(cafile=tls.verify)
+        else:
+            context.load_default_certs()
+        context.check_hostname = tls.assert_hostname is not False
+    else:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    if getattr(tls, 'cert', None):
+        context.load_cert_chain(*tls.cert)
+    return context
+
+
+def _raise_for_status(response):
+    if response.status_code < 400:
+        return
+    kind = 'Client' if response.status_code < 500 else 'Server'
+    error = requests.exceptions.HTTPError(
+        '{0} {1} Error: {2} for url: {3}'.format(
+            response.status_code, kind, response.reason, response.url
+        ), response=response
+    )
+    raise create_api_error_from_http_exception(error)
+
+
+class _NeedResponse(BaseException):
+    # A BaseException so that the API methods' except clauses don't catch it
+    def __init__(self, request):
+        self.request = request
+
+
+class _PendingRequest(object):
+    """A request recorded while running an API method, standing in for its
+    response. Looking at the response makes the method run again once the
+    request has been sent."""
+
+    def __init__(self, method, url, params=None, data=None, headers=None,
+                 stream=False, timeout=None):
+        self.method = method
+        self.url = url
+        self.params = params
+        self.headers = headers
+        self.stream = stream
+        self.timeout = timeout
+        self.response = None
+        if hasattr(data, 'read'):
+            data = _file_body(data)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        elif isinstance(data, dict):
+            data = urlencode(data).encode('utf-8')
+        self.data = data
+
+    def __getattr__(self, name):
+        raise _NeedResponse(self)
+
+
+def _file_body(fileobj):
+    # The method may close the file before the request is sent, so read it
+    # from a duplicate of its descriptor, or at once if it has none.
+    try:
+        position = fileobj.tell()
+        fd = os.dup(fileobj.fileno())
+    except (AttributeError, OSError, ValueError):
+        return fileobj.read()
+    return _FileBody(fd, position)
+
+
+class _FileBody(object):
+    """The body of a request, read from a file descriptor in chunks."""
+
+    def __init__(self, fd, position):
+        self._file = os.fdopen(fd, 'rb')
+        self._file.seek(position)
+
+    def __iter__(self):
+        with self._file:
+            while True:
+                data = self._file.read(BODY_READ_SIZE)
+                if not data:
+                    break
+                yield data
+
+
+class _Recorder(*API_MIXINS):
+    """Runs the API mixins' methods, recording their requests."""
+
+    _url = APIClient._url
+    _post_json = APIClient._post_json
+    _attach_params = APIClient._attach_params
+    _check_is_tty = APIClient._check_is_tty
+    _get_result = APIClient._get_result
+
+    def __init__(self, client, responses):
+        self._client = client
+        self._responses = responses
+        self.requests = []
+        self.checks = []
+        self._version = client._version
+        self._auth_configs = client._auth_configs
+        # Kept by the client across calls
+        self._credentials = client._credentials
+        self._registry_digests = client._registry_digests
+        self.base_url = client.base_url
+        self.timeout = client.timeout
+
+    @property
+    def api_version(self):
+        return self._version
+
+    def _request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        index = len(self.requests)
+        if index < len(self._responses):
+            response = self._responses[index]
+        else:
+            for request in self.requests:
+                if isinstance(request, _PendingRequest):
+                    raise _NeedResponse(request)
+            response = _PendingRequest(method, url, **kwargs)
+        self.requests.append(response)
+        return response
+
+    @update_headers
+    def _post(self, url, **kwargs):
+        return self._request('POST', url, **kwargs)
+
+    @update_headers
+    def _get(self, url, **kwargs):
+        return self._request('GET', url, **kwargs)
+
+    @update_headers
+    def _put(self, url, **kwargs):
+        return self._request('PUT', url, **kwargs)
+
+    @update_headers
+    def _delete(self, url, **kwargs):
+        return self._request('DELETE', url, **kwargs)
+
+    def _raise_for_status(self, response):
+        if isinstance(response, _PendingRequest):
+            self.checks.append(response)
+        else:
+            _raise_for_status(response)
+
+    def _result(self, response, json=False, binary=False):
+        assert not (json and binary)
+        if isinstance(response, _PendingRequest):
+            raise _NeedResponse(response)
+        _raise_for_status(response)
+        if json:
+            return response.json()
+        if binary:
+            return response.content
+        return response.text
+
+    def _attach_websocket(self, container, params=None):
+        raise DockerException(
+            'Websocket attach is not supported by AsyncAPIClient'
+        )
+
+    def _stream_helper(self, response, decode=False, read_size=None):
+        self._raise_for_status(response)
+        return _Deferred(response, _json_stream if decode else _raw_stream)
+
+    def _get_raw_response_socket(self, response):
+        self._raise_for_status(response)
+        return _Deferred(response, _connection_streams)
+
+    def _read_from_socket(self, response, stream, tty=False, demux=False,
+                          timeout=None):
+        self._raise_for_status(response)
+        return _Deferred(
+            response, _frames_result, stream=stream, tty=tty, demux=demux,
+            timeout=timeout
+        )
+
+    def _get_result_tty(self, stream, res, is_tty, demux=False,
+                        timeout=None):
+        return self._read_from_socket(
+            res, stream, is_tty, demux, timeout if stream else None
+        )
+
+
+class _Deferred(object):
+    """A result computed from a response once it has been received."""
+
+    def __init__(self, request, function, **kwargs):
+        self.request = request
+        self.function = function
+        self.kwargs = kwargs
+
+    async def resolve(self):
+        response = self.request
+        if isinstance(response, _PendingRequest):
+            response = response.response
+        return await self.function(response, **self.kwargs)
+
+
+async def _raw_stream(response):
+    return _close_after(response, response.raw)
+
+
+async def _json_stream(response):
+    return _close_after(response, _decode_json(response.raw))
+
+
+async def _decode_json(body):
+    decoder = JSONStreamDecoder()
+    async for data in body:
+        for obj in decoder.feed(data):
+            yield obj
+    for obj in decoder.close():
+        yield obj
+
+
+async def _close_after(response, iterator):
+    try:
+        async for item in iterator:
+            yield item
+    finally:
+        response.close()
+
+
+async def _connection_streams(response):
+    return response.connection.reader, response.connection.writer
+
+
+async def _frames_result(response, stream, tty, demux, timeout=None):
+    frames = _frames(response.raw, tty)
+    if timeout is not None:
+        frames = _idle_timeout(frames, timeout)
+    if stream:
+        if demux:
+            frames = _demux_stream(frames)
+        else:
+            frames = _payloads(frames)
+        return _close_after(response, frames)
+    output, stderr = [], []
+    try:
+        async for stream_id, data in frames:
+            if demux and stream_id == STDERR:
+                stderr.append(data)
+            else:
+                output.append(data)
+    finally:
+        response.close()
+    if demux:
+        return b''.join(output), b''.join(stderr)
+    return b''.join(output)
+
+
+async def _frames(body, tty):
+    if tty:
+        async for data in body:
+            yield STDOUT, data
+        return
+    while True:
+        header = await body.readexactly(STREAM_HEADER_SIZE_BYTES)
+        if len(header) < STREAM_HEADER_SIZE_BYTES:
+            return
+        stream_id, length = struct.unpack('>BxxxL', header)
+        while length:
+            data = await body.read(min(length, STREAM_READ_SIZE))
+            if not data:
+                return
+            length -= len(data)
+            yield stream_id, data
+
+
+async def _idle_timeout(frames, timeout):
+    frames = frames.__aiter__()
+    while True:
+        try:
+            frame = await asyncio.wait_for(frames.__anext__(), timeout)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            raise SocketTimeout(
+                'No data received in {0} seconds'.format(timeout)
+            )
+        yield frame
+
+
+async def _payloads(frames):
+    async for _, data in frames:
+        yield data
+
+
+async def _demux_stream(frames):
+    async for stream_id, data in frames:
+        if stream_id == STDERR:
+            yield None, data
+        else:
+            yield data, None
+
+
+class AsyncResponse(object):
+    """
+    A response to a request sent by :py:class:`AsyncAPIClient`.
+    """
+
+    def __init__(self, url, status_code, reason, headers, connection, body):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.connection = connection
+        #: The body of the response, as an async iterator of bytes.
+        self.raw = body
+        self.content = None
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def close(self):
+        self.raw.close()
+
+
+class _Body(object):
+    """The body of an HTTP response, read from the connection as it's
+    consumed."""
+
+    def __init__(self, connection, chunked=False, length=None,
+                 reusable=True):
+        self.connection = connection
+        self.chunked = chunked
+        self.remaining = length
+        self.reusable = reusable
+        self.done = length == 0
+        self._chunk_left = 0
+        if self.done:
+            self._finish()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        while True:
+            data = await self.read()
+            if not data:
+                return
+            yield data
+
+    async def read(self, n=STREAM_READ_SIZE):
+        """Read up to ``n`` bytes. Returns ``b''`` at the end of the body."""
+        if self.done:
+            return b''
+        reader = self.connection.reader
+        if self.chunked:
+            if not self._chunk_left:
+                size = await self._read_chunk_size()
+                if not size:
+                    self._finish()
+                    return b''
+                self._chunk_left = size
+            data = await reader.read(min(n, self._chunk_left))
+            self._chunk_left -= len(data)
+            if not self._chunk_left and data:
+                await reader.readline()
+        elif self.remaining is not None:
+            data = await reader.read(min(n, self.remaining))
+            self.remaining -= len(data)
+            if not self.remaining:
+                self._finish()
+                return data
+        else:
+            data = await reader.read(n)
+        if not data:
+            self.reusable = False
+            self._finish()
+        return data
+
+    async def readexactly(self, n):
+        """Read ``n`` bytes, or fewer if the body ends first."""
+        data = b''
+        while len(data) < n:
+            chunk = await self.read(n - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    async def readall(self):
+        chunks = []
+        while True:
+            data = await self.read(1 << 20)
+            if not data:
+                return b''.join(chunks)
+            chunks.append(data)
+
+    async def _read_chunk_size(self):
+        reader = self.connection.reader
+        while True:
+            line = await reader.readline()
+            if not line:
+                self.reusable = False
+                return 0
+            size = parse_chunk_size(line.rstrip(b'\r\n'))
+            if size is not None:
+                break
+        if not size:
+            # Trailers
+            while (await reader.readline()).strip():
+                pass
+        return size
+
+    def _finish(self):
+        self.done = True
+        if self.reusable:
+            self.connection.release()
+        else:
+            self.connection.close()
+
+    def close(self):
+        if not self.done:
+            self.done = True
+            self.connection.close()
+
+
+class _BufferedBody(object):
+    """The body of a response that has already been read."""
+
+    def __init__(self, data):
+        self._data = memoryview(data)
+        self._pos = 0
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        if self._pos < len(self._data):
+            yield await self.read(len(self._data))
+
+    async def read(self, n=STREAM_READ_SIZE):
+        data = self._data[self._pos:self._pos + n].tobytes()
+        self._pos += len(data)
+        return data
+
+    readexactly = read
+
+    async def readall(self):
+        return await self.read(len(self._data))
+
+    def close(self):
+        pass
+
+
+class _Connection(object):
+    def __init__(self, pool, reader, writer):
+        self.pool = pool
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def release(self):
+        self.pool.release(self)
+
+    def close(self):
+        self.writer.close()
+        self.pool.discard(self)
+
+
+_END = object()
+
+
+async def _iter_body(data):
+    # Generating the body may read files or compress them, which would block
+    # the loop
+    loop = asyncio.get_event_loop()
+    iterator = iter(data)
+    while True:
+        chunk = await loop.run_in_executor(None, next, iterator, _END)
+        if chunk is _END:
+            return
+        yield chunk
+
+
+class _ConnectionPool(object):
+    def __init__(self, open_connection, maxsize, max_connections=None):
+        self.open_connection = open_connection
+        self.maxsize = maxsize
+        self.max_connections = max_connections
+        self._semaphore = None
+        self._idle = collections.deque()
+        self._busy = set()
+
+    async def request(self, client, request):
+        head, data = client._encode_request(request)
+        connection = await self._checkout()
+        try:
+            return await self._exchange(connection, request, head, data)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if not connection.reused or not (
+                    data is None or isinstance(data, bytes)):
+                raise
+        # The server closed the idle connection; try again on a new one.
+        connection = await self._checkout(reuse=False)
+        return await self._exchange(connection, request, head, data)
+
+    async def _checkout(self, reuse=True):
+        if self.max_connections is not None:
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_connections)
+            await self._semaphore.acquire()
+        connection = self._idle_connection() if reuse else None
+        if connection is None:
+            try:
+                reader, writer = await self.open_connection()
+            except BaseException:
+                self._release_slot()
+                raise
+            connection = _Connection(self, reader, writer)
+        self._busy.add(connection)
+        return connection
+
+    def _idle_connection(self):
+        while self._idle:
+            connection = self._idle.pop()
+            if not connection.reader.at_eof():
+                connection.reused = True
+                return connection
+            connection.writer.close()
+
+    async def _exchange(self, connection, request, head, data):
+        try:
+            writer = connection.writer
+            writer.write(head)
+            if isinstance(data, bytes):
+                writer.write(data)
+            elif data is not None:
+                async for chunk in _iter_body(data):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    if chunk:
+                        writer.write(
+                            '{0:x}\r\n'.format(len(chunk)).encode('ascii') +
+                            chunk + b'\r\n'
+                        )
+                        await writer.drain()
+                writer.write(b'0\r\n\r\n')
+            await writer.drain()
+            response = await self._read_head(connection, request)
+        except BaseException:
+            connection.close()
+            raise
+        if not request.stream or response.status_code >= 400:
+            response.content = await response.raw.readall()
+            response.raw = _BufferedBody(response.content)
+        return response
+
+    async def _read_head(self, connection, request):
+        reader = connection.reader
+        while True:
+            status_line = await reader.readuntil(b'\r\n')
+            _, status, reason = (
+                status_line.decode('latin-1').rstrip().split(' ', 2) + ['']
+            )[:3]
+            status = int(status)
+            headers = CaseInsensitiveDict()
+            while True:
+                line = await reader.readuntil(b'\r\n')
+                if line == b'\r\n':
+                    break
+                key, _, value = line.decode('latin-1').partition(':')
+                headers[key.strip()] = value.strip()
+            if status != 100:
+                break
+
+        if status == 101 or request.headers and (
+                request.headers.get('Upgrade') and status == 200 and
+                headers.get('Content-Type') ==
+                'application/vnd.docker.raw-stream'):
+            # Hijacked connection: the raw stream lasts until it's closed
+            body = _Body(connection, reusable=False)
+        elif request.method == 'HEAD' or status in (204, 304):
+            body = _Body(connection, length=0)
+        elif 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            body = _Body(connection, chunked=True)
+        elif 'Content-Length' in headers:
+            body = _Body(connection, length=int(headers['Content-Length']))
+        else:
+            body = _Body(connection, reusable=False)
+        if headers.get('Connection', '').lower() == 'close':
+            body.reusable = False
+        return AsyncResponse(
+            request.url, status, reason, headers, connection, body
+        )
+
+    def release(self, connection):
+        if connection not in self._busy:
+            return
+        self._busy.discard(connection)
+        self._release_slot()
+        if len(self._idle) < self.maxsize:
+            self._idle.append(connection)
+        else:
+            connection.writer.close()
+
+    def discard(self, connection):
+        if connection in self._busy:
+            self._busy.discard(connection)
+            self._release_slot()
+
+    def _release_slot(self):
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def close(self):
+        while self._idle:
+            self._idle.pop().writer.close()
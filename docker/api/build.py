@@ -19,7 +19,8 @@ class BuildApiMixin(object):
               forcerm=False, dockerfile=None, container_limits=None,
               decode=False, buildargs=None, gzip=False, shmsize=None,
               labels=None, cache_from=None, target=None, network_mode=None,
-              squash=None, extra_hosts=None):
+              squash=None, extra_hosts=None, stream_context=False,
+              context_cache=None, reproducible=False):
         """
         Similar to the ``docker build`` command. Either ``path`` or ``fileobj``
         needs to be set. ``path`` can be a local path (to a directory
@@ -103,6 +104,20 @@ class BuildApiMixin(object):
                 single layer.
             extra_hosts (dict): Extra hosts to add to /etc/hosts in building
                 containers, as a mapping of hostname to IP address.
+            stream_context (bool): When building from a local ``path``, send
+                the build context while it is being archived, using a chunked
+                request, instead of writing it to a temporary file first.
+            context_cache (:py:class:`~docker.utils.context.ContextCache`):
+                When building from a local ``path``, build the context from
+                the entries kept in this cache, only reading the files that
+                changed since it was last archived. The context is sent as
+                with ``stream_context``.
+            reproducible (bool): When building from a local ``path``, clear
+                the modification times and ownership of the files in the
+                context, so that identical trees produce identical archives.
+                To know the archive's digest, archive the context with
+                :py:func:`docker.utils.tar` and ``reproducible=True``, and
+                build from the archive with ``custom_context=True``.
 
         Returns:
             A generator for the build output.
@@ -141,14 +156,17 @@ class BuildApiMixin(object):
         elif not os.path.isdir(path):
             raise TypeError("You must specify a directory to build in path")
         else:
-            dockerignore = os.path.join(path, '.dockerignore')
-            exclude = None
-            if os.path.exists(dockerignore):
-                with open(dockerignore, 'r') as f:
-                    exclude = list(filter(bool, f.read().splitlines()))
-            context = utils.tar(
-                path, exclude=exclude, dockerfile=dockerfile, gzip=gzip
-            )
+            exclude = utils.read_dockerignore(path)
+            if context_cache is not None:
+                context = context_cache.tar(
+                    path, exclude=exclude, dockerfile=dockerfile, gzip=gzip,
+                    reproducible=reproducible
+                )
+            else:
+                context = utils.tar(
+                    path, exclude=exclude, dockerfile=dockerfile, gzip=gzip,
+                    stream=stream_context, reproducible=reproducible
+                )
             encoding = 'gzip' if gzip else encoding
 
         if utils.compare_version('1.8', self._version) >= 0:
@@ -262,7 +280,10 @@ class BuildApiMixin(object):
             context.close()
 
         if stream:
-            return self._stream_helper(response, decode=decode)
+            return self._stream_helper(
+                response, decode=decode,
+                read_size=constants.TRANSFER_STREAM_READ_SIZE
+            )
         else:
             output = self._result(response)
             srch = r'Successfully built ([0-9a-f]+)'
@@ -290,12 +311,16 @@ class BuildApiMixin(object):
                 # Matches CLI behavior: https://github.com/docker/docker/blob/
                 # 67b85f9d26f1b0b2b240f2d794748fac0f45243c/cliconfig/
                 # credentials/native_store.go#L68-L83
-                for registry in self._auth_configs.keys():
-                    if registry == 'credsStore' or registry == 'HttpHeaders':
-                        continue
-                    auth_data[registry] = auth.resolve_authconfig(
-                        self._auth_configs, registry
-                    )
+                # The stores are queried concurrently, and what they return
+                # is cached for the next builds.
+                auth_data = auth.resolve_authconfigs(
+                    self._auth_configs, [
+                        registry for registry in self._auth_configs.keys()
+                        if registry not in (
+                            'credsStore', 'credHelpers', 'HttpHeaders'
+                        )
+                    ], credentials=self._credentials
+                )
             else:
                 auth_data = self._auth_configs.copy()
                 # See https://github.com/docker/docker-py/issues/1683
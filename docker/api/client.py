@@ -24,7 +24,7 @@ from .. import auth
 from ..constants import (
     DEFAULT_TIMEOUT_SECONDS, DEFAULT_USER_AGENT, IS_WINDOWS_PLATFORM,
     DEFAULT_DOCKER_API_VERSION, STREAM_HEADER_SIZE_BYTES, DEFAULT_NUM_POOLS,
-    MINIMUM_DOCKER_API_VERSION
+    MINIMUM_DOCKER_API_VERSION, STREAM_READ_SIZE
 )
 from ..errors import (
     DockerException, TLSParameterError,
@@ -33,13 +33,22 @@ from ..errors import (
 from ..tls import TLSConfig
 from ..transport import SSLAdapter, UnixAdapter
 from ..utils import utils, check_resource, update_headers
-from ..utils.socket import frames_iter, socket_raw_iter
+from ..utils.socket import (
+    STDOUT, SocketTimeout, chunks_iter, demux_frames, frames_iter,
+    frames_view_iter, join_frames, socket_raw_iter
+)
 from ..utils.json_stream import json_stream
+from ..utils.singleflight import SingleFlight
 try:
     from ..transport import NpipeAdapter
 except ImportError:
     pass
 
+try:
+    from requests.packages.urllib3.exceptions import ReadTimeoutError
+except ImportError:
+    from urllib3.exceptions import ReadTimeoutError
+
 
 class APIClient(
         requests.Session,
@@ -106,6 +115,9 @@ class APIClient(
         self.headers['User-Agent'] = user_agent
 
         self._auth_configs = auth.load_config()
+        self._credentials = auth.CredentialCache()
+        self._pulls = SingleFlight()
+        self._registry_digests = {}
 
         base_url = utils.parse_host(
             base_url, IS_WINDOWS_PLATFORM, tls=bool(tls)
@@ -290,13 +302,39 @@ class APIClient(
 
         return sock
 
-    def _stream_helper(self, response, decode=False):
+    def _get_chunked_body_fp(self, response):
+        """Returns the buffered socket file the body of a chunked response can
+        be read from directly, or None if the body has to be read through
+        urllib3."""
+        if response.headers.get('Content-Encoding'):
+            return None
+        raw_fp = response.raw._fp
+        if getattr(raw_fp, 'chunk_left', None) is not None:
+            # http.client already started parsing the chunks
+            return None
+        fp = getattr(raw_fp, 'fp', None)
+        if not hasattr(fp, 'readinto1'):
+            return None
+        return fp
+
+    def _stream_helper(self, response, decode=False, read_size=None):
         """Generator for data coming from a chunked-encoded HTTP response."""
 
         if response.raw._fp.chunked:
             if decode:
-                for chunk in json_stream(self._stream_helper(response, False)):
+                for chunk in json_stream(
+                    self._stream_helper(response, False, read_size)
+                ):
                     yield chunk
+                return
+
+            fp = self._get_chunked_body_fp(response)
+            if fp is not None:
+                try:
+                    for data in chunks_iter(fp, read_size or STREAM_READ_SIZE):
+                        yield data
+                finally:
+                    response.close()
             else:
                 reader = response.raw
                 while not reader.closed:
@@ -328,14 +366,15 @@ class APIClient(
             walker = end
             yield buf[start:end]
 
-    def _multiplexed_response_stream_helper(self, response):
+    def _multiplexed_response_stream_helper(self, response, timeout=None):
         """A generator of multiplexed data blocks coming from a response
         stream."""
 
-        # Disable timeout on the underlying socket to prevent
-        # Read timed out(s) for long running processes
-        socket = self._get_raw_response_socket(response)
-        self._disable_socket_timeout(socket)
+        if timeout is None:
+            # Disable timeout on the underlying socket to prevent
+            # Read timed out(s) for long running processes
+            socket = self._get_raw_response_socket(response)
+            self._disable_socket_timeout(socket)
 
         while True:
             header = response.raw.read(STREAM_HEADER_SIZE_BYTES)
@@ -349,6 +388,28 @@ class APIClient(
                 break
             yield data
 
+    def _multiplexed_frames_helper(self, response, stream, timeout=None):
+        """A generator of (stream_id, data) tuples read from a multiplexed
+        response."""
+        if not stream:
+            buf = memoryview(self._result(response, binary=True))
+            buf_length = len(buf)
+            walker = 0
+            while buf_length - walker >= STREAM_HEADER_SIZE_BYTES:
+                stream_id, length = struct.unpack_from(
+                    '>BxxxL', buf[walker:walker + STREAM_HEADER_SIZE_BYTES]
+                )
+                start = walker + STREAM_HEADER_SIZE_BYTES
+                walker = start + length
+                yield stream_id, buf[start:walker]
+            return
+
+        if timeout is None:
+            socket = self._get_raw_response_socket(response)
+            self._disable_socket_timeout(socket)
+        for frame in frames_view_iter(response.raw):
+            yield frame
+
     def _stream_raw_result_old(self, response):
         ''' Stream raw output for API versions below 1.6 '''
         self._raise_for_status(response)
@@ -364,20 +425,38 @@ class APIClient(
         for out in response.iter_content(chunk_size=1, decode_unicode=True):
             yield out
 
-    def _read_from_socket(self, response, stream, tty=False):
+    def _read_from_socket(self, response, stream, tty=False, demux=False,
+                          timeout=None):
         socket = self._get_raw_response_socket(response)
+        # Reads on a blocking socket don't need to wait for data first
+        self._disable_socket_timeout(socket)
+
+        if demux:
+            if tty is False:
+                frames = frames_view_iter(socket, timeout=timeout)
+            else:
+                frames = (
+                    (STDOUT, data)
+                    for data in socket_raw_iter(socket, timeout=timeout)
+                )
+            return self._demux_result(frames, stream)
 
         gen = None
         if tty is False:
-            gen = frames_iter(socket)
+            gen = frames_iter(socket, timeout=timeout)
         else:
-            gen = socket_raw_iter(socket)
+            gen = socket_raw_iter(socket, timeout=timeout)
 
         if stream:
             return gen
         else:
             return six.binary_type().join(gen)
 
+    def _demux_result(self, frames, stream):
+        if stream:
+            return demux_frames(frames)
+        return join_frames(frames)
+
     def _disable_socket_timeout(self, socket):
         """ Depending on the combination of python version and whether we're
         connecting over http or https, we might need to access _sock, which
@@ -406,34 +485,70 @@ class APIClient(
 
             s.settimeout(None)
 
+    def _set_socket_timeout(self, socket, timeout):
+        """ Makes reads of a response fail after timeout seconds without
+        data, on the socket or on the _sock it wraps, like
+        _disable_socket_timeout. """
+        for s in [socket, getattr(socket, '_sock', None)]:
+            if hasattr(s, 'settimeout'):
+                s.settimeout(timeout)
+
     @check_resource('container')
     def _check_is_tty(self, container):
         cont = self.inspect_container(container)
         return cont['Config']['Tty']
 
-    def _get_result(self, container, stream, res):
-        return self._get_result_tty(stream, res, self._check_is_tty(container))
+    def _get_result(self, container, stream, res, demux=False,
+                    timeout=None):
+        return self._get_result_tty(
+            stream, res, self._check_is_tty(container), demux=demux,
+            timeout=timeout
+        )
 
-    def _get_result_tty(self, stream, res, is_tty):
+    def _get_result_tty(self, stream, res, is_tty, demux=False,
+                        timeout=None):
         # Stream multi-plexing was only introduced in API v1.6. Anything
         # before that needs old-style streaming.
         if utils.compare_version('1.6', self._version) < 0:
             return self._stream_raw_result_old(res)
 
+        if not stream:
+            timeout = None
+        if timeout is not None:
+            self._set_socket_timeout(
+                self._get_raw_response_socket(res), timeout
+            )
+
+        if demux:
+            if is_tty:
+                if stream:
+                    frames = ((STDOUT, data)
+                              for data in self._stream_raw_result(res))
+                else:
+                    frames = [(STDOUT, self._result(res, binary=True))]
+            else:
+                self._raise_for_status(res)
+                frames = self._multiplexed_frames_helper(res, stream, timeout)
+            if timeout is not None:
+                frames = _raise_idle_timeout(frames, timeout)
+            return self._demux_result(frames, stream)
+
         # We should also use raw streaming (without keep-alives)
         # if we're dealing with a tty-enabled container.
         if is_tty:
-            return self._stream_raw_result(res) if stream else \
-                self._result(res, binary=True)
-
-        self._raise_for_status(res)
-        sep = six.binary_type()
-        if stream:
-            return self._multiplexed_response_stream_helper(res)
+            if not stream:
+                return self._result(res, binary=True)
+            gen = self._stream_raw_result(res)
         else:
-            return sep.join(
-                [x for x in self._multiplexed_buffer_helper(res)]
-            )
+            self._raise_for_status(res)
+            if not stream:
+                return six.binary_type().join(
+                    [x for x in self._multiplexed_buffer_helper(res)]
+                )
+            gen = self._multiplexed_response_stream_helper(res, timeout)
+        if timeout is not None:
+            gen = _raise_idle_timeout(gen, timeout)
+        return gen
 
     def _unmount(self, *args):
         for proto in args:
@@ -454,7 +569,8 @@ class APIClient(
 
     def reload_config(self, dockercfg_path=None):
         """
-        Force a reload of the auth configuration
+        Force a reload of the auth configuration, and forget the credentials
+        obtained from credentials stores so far.
 
         Args:
             dockercfg_path (str): Use a custom path for the Docker config file
@@ -465,3 +581,19 @@ class APIClient(
             None
         """
         self._auth_configs = auth.load_config(dockercfg_path)
+        self._credentials.invalidate()
+
+
+def _raise_idle_timeout(gen, timeout):
+    """Raises SocketTimeout when a read of a response stream times out,
+    instead of the error of the HTTP library that read it."""
+    try:
+        for item in gen:
+            yield item
+    except (ReadTimeoutError, requests.exceptions.ConnectionError) as e:
+        if not isinstance(e, ReadTimeoutError) and not (
+                e.args and isinstance(e.args[0], ReadTimeoutError)):
+            raise
+        raise SocketTimeout(
+            'No data received in {0} seconds'.format(timeout)
+        )
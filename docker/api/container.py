@@ -4,6 +4,7 @@ from datetime import datetime
 
 from .. import errors
 from .. import utils
+from ..constants import EVENT_STREAM_READ_SIZE
 from ..types import (
     ContainerConfig, EndpointConfig, HostConfig, NetworkingConfig
 )
@@ -12,7 +13,7 @@ from ..types import (
 class ContainerApiMixin(object):
     @utils.check_resource('container')
     def attach(self, container, stdout=True, stderr=True,
-               stream=False, logs=False):
+               stream=False, logs=False, demux=False, timeout=None):
         """
         Attach to a container.
 
@@ -27,12 +28,19 @@ class ContainerApiMixin(object):
             stream (bool): Return container output progressively as an iterator
                 of strings, rather than a single string.
             logs (bool): Include the container's previous output.
+            demux (bool): Keep stdout and stderr separate.
+            timeout (float): Raise
+                :py:class:`docker.utils.socket.SocketTimeout` if no output
+                is received for this many seconds.
 
         Returns:
             By default, the container's output as a single string.
 
             If ``stream=True``, an iterator of output strings.
 
+            If ``demux=True``, a tuple of two strings, or of two iterators if
+            ``stream=True``, for stdout and stderr respectively.
+
         Raises:
             :py:class:`docker.errors.APIError`
                 If the server returns an error.
@@ -53,7 +61,8 @@ class ContainerApiMixin(object):
         response = self._post(u, headers=headers, params=params, stream=True)
 
         return self._read_from_socket(
-            response, stream, self._check_is_tty(container)
+            response, stream, self._check_is_tty(container), demux=demux,
+            timeout=timeout
         )
 
     @utils.check_resource('container')
@@ -785,7 +794,8 @@ class ContainerApiMixin(object):
 
     @utils.check_resource('container')
     def logs(self, container, stdout=True, stderr=True, stream=False,
-             timestamps=False, tail='all', since=None, follow=None):
+             timestamps=False, tail='all', since=None, follow=None,
+             demux=False, timeout=None):
         """
         Get logs from a container. Similar to the ``docker logs`` command.
 
@@ -804,9 +814,14 @@ class ContainerApiMixin(object):
             since (datetime or int): Show logs since a given datetime or
                 integer epoch (in seconds)
             follow (bool): Follow log output
+            demux (bool): Keep stdout and stderr separate.
+            timeout (float): With ``stream=True``, raise
+                :py:class:`docker.utils.socket.SocketTimeout` if no output
+                is received for this many seconds.
 
         Returns:
-            (generator or str)
+            (generator or str): If ``demux=True``, a tuple of two generators
+            or two strings, for stdout and stderr respectively.
 
         Raises:
             :py:class:`docker.errors.APIError`
@@ -842,13 +857,17 @@ class ContainerApiMixin(object):
                         )
             url = self._url("/containers/{0}/logs", container)
             res = self._get(url, params=params, stream=stream)
-            return self._get_result(container, stream, res)
+            return self._get_result(
+                container, stream, res, demux=demux, timeout=timeout
+            )
         return self.attach(
             container,
             stdout=stdout,
             stderr=stderr,
             stream=stream,
-            logs=True
+            logs=True,
+            demux=demux,
+            timeout=timeout if stream else None
         )
 
     @utils.check_resource('container')
@@ -918,7 +937,7 @@ class ContainerApiMixin(object):
 
     @utils.check_resource('container')
     @utils.minimum_version('1.20')
-    def put_archive(self, container, path, data):
+    def put_archive(self, container, path, data, gzip=False):
         """
         Insert a file or folder in an existing container using a tar archive as
         source.
@@ -927,7 +946,10 @@ class ContainerApiMixin(object):
             container (str): The container where the file(s) will be extracted
             path (str): Path inside the container where the file(s) will be
                 extracted. Must exist.
-            data (bytes): tar data to be extracted
+            data (bytes): tar data to be extracted. Can also be a file
+                object or a generator.
+            gzip (bool): Compress the data using gzip, on all the available
+                cores, before sending it. Default: False
 
         Returns:
             (bool): True if the call succeeds.
@@ -938,6 +960,16 @@ class ContainerApiMixin(object):
         """
         params = {'path': path}
         url = self._url('/containers/{0}/archive', container)
+        if gzip:
+            if isinstance(data, six.binary_type):
+                data = b''.join(utils.gzip_stream([data]))
+            else:
+                if hasattr(data, 'read'):
+                    fileobj = data
+                    data = iter(
+                        lambda: fileobj.read(utils.compress.BLOCK_SIZE), b''
+                    )
+                data = utils.gzip_stream(data)
         res = self._put(url, params=params, data=data)
         self._raise_for_status(res)
         return res.status_code == 200
@@ -1105,8 +1137,10 @@ class ContainerApiMixin(object):
         """
         url = self._url("/containers/{0}/stats", container)
         if stream:
-            return self._stream_helper(self._get(url, stream=True),
-                                       decode=decode)
+            return self._stream_helper(
+                self._get(url, stream=True), decode=decode,
+                read_size=EVENT_STREAM_READ_SIZE
+            )
         else:
             return self._result(self._get(url, params={'stream': False}),
                                 json=True)
@@ -3,7 +3,9 @@ import warnings
 from datetime import datetime
 
 from .. import auth, utils
-from ..constants import INSECURE_REGISTRY_DEPRECATION_WARNING
+from ..constants import (
+    EVENT_STREAM_READ_SIZE, INSECURE_REGISTRY_DEPRECATION_WARNING
+)
 
 
 class DaemonApiMixin(object):
@@ -72,7 +74,7 @@ class DaemonApiMixin(object):
 
         return self._stream_helper(
             self._get(url, params=params, stream=True, timeout=None),
-            decode=decode
+            decode=decode, read_size=EVENT_STREAM_READ_SIZE
         )
 
     def info(self):
@@ -128,7 +130,9 @@ class DaemonApiMixin(object):
         elif not self._auth_configs:
             self._auth_configs = auth.load_config()
 
-        authcfg = auth.resolve_authconfig(self._auth_configs, registry)
+        authcfg = auth.resolve_authconfig(
+            self._auth_configs, registry, credentials=self._credentials
+        )
         # If we found an existing auth config for this registry and username
         # combination, we can return it immediately unless reauth is requested.
         if authcfg and authcfg.get('username', None) == username \
@@ -145,6 +149,7 @@ class DaemonApiMixin(object):
         response = self._post_json(self._url('/auth'), data=req_data)
         if response.status_code == 200:
             self._auth_configs[registry or auth.INDEX_NAME] = req_data
+            self._credentials.invalidate(registry)
         return self._result(response, json=True)
 
     def ping(self):
@@ -112,7 +112,7 @@ class ExecApiMixin(object):
     @utils.minimum_version('1.15')
     @utils.check_resource('exec_id')
     def exec_start(self, exec_id, detach=False, tty=False, stream=False,
-                   socket=False):
+                   socket=False, demux=False, timeout=None):
         """
         Start a previously set up exec instance.
 
@@ -122,10 +122,16 @@ class ExecApiMixin(object):
                 Default: False
             tty (bool): Allocate a pseudo-TTY. Default: False
             stream (bool): Stream response data. Default: False
+            demux (bool): Keep stdout and stderr separate. Default: False
+            timeout (float): Raise
+                :py:class:`docker.utils.socket.SocketTimeout` if no output
+                is received for this many seconds. Default: None
 
         Returns:
             (generator or str): If ``stream=True``, a generator yielding
             response chunks. A string containing response data otherwise.
+            If ``demux=True``, a tuple of two generators or two strings, for
+            stdout and stderr respectively.
 
         Raises:
             :py:class:`docker.errors.APIError`
@@ -153,4 +159,6 @@ class ExecApiMixin(object):
             return self._result(res)
         if socket:
             return self._get_raw_response_socket(res)
-        return self._read_from_socket(res, stream, tty)
+        return self._read_from_socket(
+            res, stream, tty, demux=demux, timeout=timeout
+        )
@@ -1,11 +1,18 @@
 import logging
 import os
+import time
 import warnings
+from multiprocessing.pool import ThreadPool
 
 import six
 
 from .. import auth, errors, utils
-from ..constants import INSECURE_REGISTRY_DEPRECATION_WARNING
+from ..constants import (
+    DISTRIBUTION_CACHE_TTL, INSECURE_REGISTRY_DEPRECATION_WARNING,
+    PULL_ALWAYS, PULL_IF_NOT_PRESENT, PULL_POLICIES, SAVE_BUFFER_SIZE,
+    TRANSFER_STREAM_READ_SIZE
+)
+from ..utils.save import save_stream
 
 log = logging.getLogger(__name__)
 
@@ -34,6 +41,9 @@ class ImageApiMixin(object):
             >>> f = open('/tmp/fedora-latest.tar', 'w')
             >>> f.write(image.data)
             >>> f.close()
+
+        To write large images to a file without holding them in memory, use
+        :py:meth:`save_to` instead.
         """
         res = self._get(self._url("/images/{0}/get", image), stream=True)
         self._raise_for_status(res)
@@ -262,6 +272,109 @@ class ImageApiMixin(object):
             self._get(self._url("/images/{0}/json", image)), True
         )
 
+    @utils.minimum_version('1.30')
+    @utils.check_resource('image')
+    def inspect_distribution(self, image, auth_config=None):
+        """
+        Get image digest and platform information by contacting the
+        registry.
+
+        Args:
+            image (str): The image name to inspect
+            auth_config (dict): Override the credentials that
+                :py:meth:`~docker.api.daemon.DaemonApiMixin.login` has set for
+                this request.
+
+        Returns:
+            (dict): A dict containing distribution data
+
+        Raises:
+            :py:class:`docker.errors.APIError`
+                If the server returns an error.
+        """
+        registry, _ = auth.resolve_repository_name(image)
+        headers = {}
+        if auth_config is None:
+            header = auth.get_config_header(self, registry)
+            if header:
+                headers['X-Registry-Auth'] = header
+        else:
+            headers['X-Registry-Auth'] = auth.encode_header(auth_config)
+
+        return self._result(self._get(
+            self._url("/distribution/{0}/json", image), headers=headers
+        ), True)
+
+    def should_pull(self, image, policy=PULL_ALWAYS,
+                    max_age=DISTRIBUTION_CACHE_TTL, auth_config=None):
+        """
+        Whether an image needs to be pulled, according to a pull policy:
+
+        - ``always``: it does.
+        - ``if-not-present``: only if it isn't available locally.
+        - ``if-digest-changed``: also if its digest in the registry, from
+          :py:meth:`inspect_distribution`, isn't one of the local image's
+          ``RepoDigests``. Images referenced by digest are never pulled
+          again. If the registry can't be asked, the image is pulled.
+
+        Args:
+            image (str): The image, as ``repository[:tag]`` or
+                ``repository@digest``.
+            policy (str): The pull policy.
+            max_age (float): Use the digest found in the registry if it was
+                looked up less than this many seconds ago.
+            auth_config (dict): Override the credentials that
+                :py:meth:`~docker.api.daemon.DaemonApiMixin.login` has set for
+                the registry.
+
+        Returns:
+            (bool): ``True`` if the image should be pulled.
+
+        Raises:
+            :py:class:`docker.errors.InvalidArgument`
+                If the policy is unknown.
+        """
+        if policy not in PULL_POLICIES:
+            raise errors.InvalidArgument(
+                'Invalid pull policy {0!r}, expected one of {1}'.format(
+                    policy, ', '.join(PULL_POLICIES)
+                )
+            )
+        if policy == PULL_ALWAYS:
+            return True
+        try:
+            local = self.inspect_image(image)
+        except errors.NotFound:
+            return True
+        if policy == PULL_IF_NOT_PRESENT or '@' in image:
+            return False
+
+        local_digests = [
+            d.split('@', 1)[1] for d in local.get('RepoDigests') or []
+        ]
+        if not local_digests:
+            return True
+        try:
+            remote = self._registry_digest(image, max_age, auth_config)
+        except errors.DockerException as e:
+            log.debug('Could not get the digest of {0}: {1}'.format(
+                image, e
+            ))
+            return True
+        return remote not in local_digests
+
+    def _registry_digest(self, image, max_age, auth_config):
+        key = _pull_key(image, auth_config)
+        cached = self._registry_digests.get(key)
+        now = time.time()
+        if cached is not None and now - cached[0] < max_age:
+            return cached[1]
+        digest = self.inspect_distribution(
+            image, auth_config=auth_config
+        )['Descriptor']['digest']
+        self._registry_digests[key] = (now, digest)
+        return digest
+
     def load_image(self, data, quiet=None):
         """
         Load an image that was previously saved using
@@ -293,7 +406,9 @@ class ImageApiMixin(object):
             self._url("/images/load"), data=data, params=params, stream=True
         )
         if utils.version_gte(self._version, '1.23'):
-            return self._stream_helper(res, decode=True)
+            return self._stream_helper(
+                res, decode=True, read_size=TRANSFER_STREAM_READ_SIZE
+            )
 
         self._raise_for_status(res)
 
@@ -393,10 +508,87 @@ class ImageApiMixin(object):
         self._raise_for_status(response)
 
         if stream:
-            return self._stream_helper(response, decode=decode)
+            return self._stream_helper(
+                response, decode=decode, read_size=TRANSFER_STREAM_READ_SIZE
+            )
 
         return self._result(response)
 
+    def pull_many(self, references, max_workers=4, auth_config=None,
+                  progress=None):
+        """
+        Pull several images at the same time. Similar to running the
+        ``docker pull`` command for each of them.
+
+        References that name the same image (``busybox``,
+        ``busybox:latest`` and ``docker.io/library/busybox``, for instance)
+        are only pulled once. So are images that are being pulled already
+        by another thread calling ``pull_many()`` on this client: their pull
+        is waited for and its result shared, instead of asking the daemon to
+        pull them again.
+
+        Args:
+            references (:py:class:`list`): The images to pull, as
+                ``repository[:tag]`` or ``repository@digest``.
+            max_workers (int): The maximum number of images pulled at the
+                same time. Default: 4
+            auth_config (dict): Override the credentials that
+                :py:meth:`~docker.api.daemon.DaemonApiMixin.login` has set for
+                these requests.
+            progress (callable): Called with the reference and each decoded
+                progress event of the pulls this call runs, from the threads
+                that run them.
+
+        Returns:
+            (dict): One ``(events, error)`` tuple per reference: the list of
+            decoded events of the pull and ``None`` if it succeeded, ``None``
+            and the exception it raised (an
+            :py:class:`~docker.errors.APIError`, or a
+            :py:class:`~docker.errors.PullError` for errors reported while
+            pulling) otherwise.
+
+        Example:
+
+            >>> results = cli.pull_many(['busybox', 'alpine:3.6'])
+            >>> [ref for ref, (_, error) in results.items() if error]
+            []
+        """
+        keys = {}
+        for reference in references:
+            keys.setdefault(_pull_key(reference, auth_config), reference)
+
+        def pull(key):
+            reference = keys[key]
+            try:
+                return self._pulls.do(
+                    key, self._pull_events, reference, auth_config, progress
+                )[0], None
+            except Exception as e:
+                return None, e
+
+        pool = ThreadPool(max(1, min(max_workers, len(keys))))
+        try:
+            results = dict(zip(keys, pool.map(pull, list(keys))))
+        finally:
+            pool.close()
+            pool.join()
+        return dict(
+            (reference, results[_pull_key(reference, auth_config)])
+            for reference in references
+        )
+
+    def _pull_events(self, reference, auth_config, progress):
+        repository, tag = utils.parse_repository_tag(reference)
+        events = []
+        for event in self.pull(repository, tag=tag or 'latest', stream=True,
+                               decode=True, auth_config=auth_config):
+            events.append(event)
+            if progress is not None:
+                progress(reference, event)
+            if 'error' in event:
+                raise errors.PullError(reference, event['error'])
+        return events
+
     def push(self, repository, tag=None, stream=False,
              insecure_registry=False, auth_config=None, decode=False):
         """
@@ -462,7 +654,9 @@ class ImageApiMixin(object):
         self._raise_for_status(response)
 
         if stream:
-            return self._stream_helper(response, decode=decode)
+            return self._stream_helper(
+                response, decode=decode, read_size=TRANSFER_STREAM_READ_SIZE
+            )
 
         return self._result(response)
 
@@ -480,6 +674,88 @@ class ImageApiMixin(object):
         res = self._delete(self._url("/images/{0}", image), params=params)
         return self._result(res, True)
 
+    def save_many(self, targets, max_workers=4,
+                  buffer_size=SAVE_BUFFER_SIZE):
+        """
+        Save several images to files at the same time, with
+        :py:meth:`save_to`.
+
+        Args:
+            targets (dict): The target of each image: a path, a file
+                descriptor or a file object. Each target must be distinct.
+            max_workers (int): The maximum number of images saved at the
+                same time. Default: 4
+            buffer_size (int): The size of the reads and writes.
+
+        Returns:
+            (dict): One ``(result, error)`` tuple per image: the
+            ``(digest, size)`` tuple :py:meth:`save_to` returned and
+            ``None``, or ``None`` and the exception it raised.
+
+        Example:
+
+            >>> results = cli.save_many({
+            ...     'busybox': '/tmp/busybox.tar',
+            ...     'alpine': '/tmp/alpine.tar',
+            ... })
+        """
+        def save(item):
+            image, target = item
+            try:
+                return image, (
+                    self.save_to(image, target, buffer_size=buffer_size),
+                    None
+                )
+            except Exception as e:
+                return image, (None, e)
+
+        items = list(targets.items())
+        pool = ThreadPool(max(1, min(max_workers, len(items))))
+        try:
+            return dict(pool.map(save, items))
+        finally:
+            pool.close()
+            pool.join()
+
+    @utils.check_resource('image')
+    def save_to(self, image, target, buffer_size=SAVE_BUFFER_SIZE):
+        """
+        Save a tarball of an image to a file. Similar to the ``docker save
+        -o`` command.
+
+        The tarball is streamed from the daemon to the file ``buffer_size``
+        bytes at a time, and hashed on the way, so that images of any size
+        can be saved without holding them in memory.
+
+        Args:
+            image (str): The image to save
+            target: A path, which is written to a temporary file next to it
+                and renamed once the whole tarball is saved; a file
+                descriptor or a file object, which is written to as is; or
+                ``'-'`` to write to the standard output, unless it is a
+                terminal.
+            buffer_size (int): The size of the reads and writes.
+                Default: 4 MB
+
+        Returns:
+            (tuple): The ``sha256:`` digest of the tarball, and its size.
+
+        Raises:
+            :py:class:`docker.errors.APIError`
+                If the server returns an error.
+
+        Example:
+
+            >>> cli.save_to('fedora:latest', '/tmp/fedora-latest.tar')
+            ('sha256:5a0a...', 243251712)
+        """
+        res = self._get(self._url("/images/{0}/get", image), stream=True)
+        self._raise_for_status(res)
+        try:
+            return save_stream(res.raw, target, buffer_size=buffer_size)
+        finally:
+            res.close()
+
     def search(self, term):
         """
         Search for images on Docker Hub. Similar to the ``docker search``
@@ -561,3 +837,18 @@ def _import_image_params(repo, tag, image=None, src=None,
         params['changes'] = changes
 
     return params
+
+
+def _pull_key(reference, auth_config=None):
+    """
+    What identifies the pull of an image: its canonical repository name and
+    tag (or digest), and the credentials used.
+    """
+    repository, tag = utils.parse_repository_tag(reference)
+    index, name = auth.resolve_repository_name(repository)
+    if index == auth.INDEX_NAME and name.startswith('library/'):
+        name = name[len('library/'):]
+    return (
+        index, name, tag or 'latest',
+        auth.encode_header(auth_config) if auth_config else None
+    )
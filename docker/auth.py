@@ -2,6 +2,9 @@ import base64
 import json
 import logging
 import os
+import threading
+import time
+from multiprocessing.pool import ThreadPool
 
 import dockerpycreds
 import six
@@ -14,9 +17,20 @@ INDEX_URL = 'https://index.{0}/v1/'.format(INDEX_NAME)
 DOCKER_CONFIG_FILENAME = os.path.join('.docker', 'config.json')
 LEGACY_DOCKER_CONFIG_FILENAME = '.dockercfg'
 TOKEN_USERNAME = '<token>'
+# How long the credentials returned by credential helpers are kept, in
+# seconds
+CREDENTIALS_TTL = 300
+# The number of credential helpers queried at the same time
+CREDENTIALS_WORKERS = 8
+# The number of encoded auth headers kept by encode_header()
+MAX_CACHED_HEADERS = 256
 
 log = logging.getLogger(__name__)
 
+_config_cache = {}
+_config_lock = threading.Lock()
+_headers = {}
+
 
 def resolve_repository_name(repo_name):
     if '://' in repo_name:
@@ -47,7 +61,10 @@ def get_config_header(client, registry):
             "No auth config in memory - loading from filesystem"
         )
         client._auth_configs = load_config()
-    authcfg = resolve_authconfig(client._auth_configs, registry)
+    authcfg = resolve_authconfig(
+        client._auth_configs, registry,
+        credentials=getattr(client, '_credentials', None)
+    )
     # Do not fail here if no authentication exists for this
     # specific registry as we can have a readonly pull. Just
     # put the header if we can.
@@ -79,12 +96,15 @@ def get_credential_store(authconfig, registry):
     )
 
 
-def resolve_authconfig(authconfig, registry=None):
+def resolve_authconfig(authconfig, registry=None, credentials=None):
     """
     Returns the authentication data from the given auth configuration for a
     specific registry. As with the Docker client, legacy entries in the config
     with full URLs are stripped down to hostnames before checking for a match.
     Returns None if no match was found.
+
+    Credentials obtained from a credentials store are kept in the
+    ``credentials`` :py:class:`CredentialCache`, if one is given.
     """
 
     if 'credHelpers' in authconfig or 'credsStore' in authconfig:
@@ -93,6 +113,8 @@ def resolve_authconfig(authconfig, registry=None):
             log.debug(
                 'Using credentials store "{0}"'.format(store_name)
             )
+            if credentials is not None:
+                return credentials.get(store_name, registry)
             return _resolve_authconfig_credstore(
                 authconfig, registry, store_name
             )
@@ -114,11 +136,96 @@ def resolve_authconfig(authconfig, registry=None):
     return None
 
 
-def _resolve_authconfig_credstore(authconfig, registry, credstore_name):
+def resolve_authconfigs(authconfig, registries, credentials=None,
+                        workers=CREDENTIALS_WORKERS):
+    """
+    Resolves the authentication data of several registries, like
+    :py:func:`resolve_authconfig`, querying up to ``workers`` credentials
+    stores at the same time.
+
+    Returns:
+        (dict): The authentication data (or None) by registry.
+    """
+    registries = list(registries)
+
+    def resolve(registry):
+        return resolve_authconfig(authconfig, registry, credentials)
+
+    uses_store = 'credHelpers' in authconfig or 'credsStore' in authconfig
+    if not uses_store or workers <= 1 or len(registries) <= 1:
+        return dict(zip(registries, map(resolve, registries)))
+
+    pool = ThreadPool(min(workers, len(registries)))
+    try:
+        return dict(zip(registries, pool.map(resolve, registries)))
+    finally:
+        pool.terminate()
+
+
+class CredentialCache(object):
+    """
+    Keeps the credentials returned by credentials stores (credential
+    helpers) in memory, so that each store is only run once per registry
+    every ``ttl`` seconds. Registries without credentials are remembered as
+    well. Errors are not cached.
+
+    Args:
+        ttl (float): How long credentials are kept, in seconds.
+        clock (callable): Returns the current time. Defaults to
+            ``time.time``.
+    """
+
+    def __init__(self, ttl=CREDENTIALS_TTL, clock=None):
+        self.ttl = ttl
+        self.clock = clock or time.time
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, store_name, registry):
+        """
+        The authentication data of ``registry`` from the ``store_name``
+        credentials store, or None if it has none.
+        """
+        key = (store_name, _credstore_registry(registry))
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > self.clock():
+            log.debug('Using cached credentials for {0}'.format(
+                repr(key[1])
+            ))
+        else:
+            entry = (
+                self.clock() + self.ttl,
+                _resolve_authconfig_credstore(None, registry, store_name)
+            )
+            with self._lock:
+                self._entries[key] = entry
+        return dict(entry[1]) if entry[1] is not None else None
+
+    def invalidate(self, registry=None):
+        """
+        Forget the credentials of ``registry``, or of all the registries.
+        """
+        with self._lock:
+            if registry is None:
+                self._entries.clear()
+                return
+            registry = _credstore_registry(registry)
+            for key in list(self._entries):
+                if key[1] == registry:
+                    del self._entries[key]
+
+
+def _credstore_registry(registry):
     if not registry or registry == INDEX_NAME:
         # The ecosystem is a little schizophrenic with index.docker.io VS
         # docker.io - in that case, it seems the full URL is necessary.
-        registry = INDEX_URL
+        return INDEX_URL
+    return registry
+
+
+def _resolve_authconfig_credstore(authconfig, registry, credstore_name):
+    registry = _credstore_registry(registry)
     log.debug("Looking for auth entry for {0}".format(repr(registry)))
     store = dockerpycreds.Store(credstore_name)
     try:
@@ -156,8 +263,30 @@ def decode_auth(auth):
 
 
 def encode_header(auth):
+    key = _header_key(auth)
+    if key is not None:
+        header = _headers.get(key)
+        if header is not None:
+            return header
     auth_json = json.dumps(auth).encode('ascii')
-    return base64.urlsafe_b64encode(auth_json)
+    header = base64.urlsafe_b64encode(auth_json)
+    if key is not None:
+        if len(_headers) >= MAX_CACHED_HEADERS:
+            _headers.clear()
+        _headers[key] = header
+    return header
+
+
+def _header_key(auth):
+    # Only flat dictionaries (single registries' auth configs) are cached
+    try:
+        key = tuple(sorted(
+            (k, v.__class__, v) for k, v in six.iteritems(auth)
+        ))
+        hash(key)
+    except (AttributeError, TypeError):
+        return None
+    return key
 
 
 def parse_auth(entries, raise_on_error=False):
@@ -268,12 +397,43 @@ def load_config(config_path=None):
     Lookup priority:
         explicit config_path parameter > DOCKER_CONFIG environment variable >
         ~/.docker/config.json > ~/.dockercfg
+
+    The parsed files are cached for the whole process, and only parsed again
+    when their modification time, size or inode change. Each call returns a
+    copy that the caller can modify.
     """
     config_file = find_config_file(config_path)
 
     if not config_file:
         return {}
 
+    try:
+        st = os.stat(config_file)
+    except OSError:
+        return {}
+    key = (
+        st.st_dev, st.st_ino, st.st_size,
+        getattr(st, 'st_mtime_ns', None) or st.st_mtime
+    )
+    with _config_lock:
+        cached = _config_cache.get(config_file)
+    if cached is None or cached[0] != key:
+        cached = (key, _load_config_file(config_file))
+        # Warm the encode_header() cache with every registry's header
+        for entry in cached[1].values():
+            if isinstance(entry, dict) and entry:
+                encode_header(entry)
+        with _config_lock:
+            _config_cache[config_file] = cached
+    else:
+        log.debug('Using cached config for {0}'.format(config_file))
+    return dict(
+        (k, dict(v) if isinstance(v, dict) else v)
+        for k, v in six.iteritems(cached[1])
+    )
+
+
+def _load_config_file(config_file):
     try:
         with open(config_file) as f:
             data = json.load(f)
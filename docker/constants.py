@@ -5,6 +5,14 @@ DEFAULT_DOCKER_API_VERSION = '1.30'
 MINIMUM_DOCKER_API_VERSION = '1.21'
 DEFAULT_TIMEOUT_SECONDS = 60
 STREAM_HEADER_SIZE_BYTES = 8
+STREAM_READ_SIZE = 64 * 1024
+# The read sizes of the progress streams of transfers, which can send many
+# messages at once, and of the event and stats streams, which send a few small
+# messages at a time
+TRANSFER_STREAM_READ_SIZE = 256 * 1024
+EVENT_STREAM_READ_SIZE = 8 * 1024
+# The size of the reads and writes when saving images to files
+SAVE_BUFFER_SIZE = 4 * 1024 * 1024
 CONTAINER_LIMITS_KEYS = [
     'memory', 'memswap', 'cpushares', 'cpusetcpus'
 ]
@@ -17,3 +25,15 @@ IS_WINDOWS_PLATFORM = (sys.platform == 'win32')
 
 DEFAULT_USER_AGENT = "docker-sdk-python/{0}".format(version)
 DEFAULT_NUM_POOLS = 25
+
+# Label holding the digest of the inputs of a build, see
+# ImageCollection.build(reuse_existing=True)
+BUILD_DIGEST_LABEL = 'com.docker.py.build-digest'
+
+# Pull policies, see ImageApiMixin.should_pull()
+PULL_ALWAYS = 'always'
+PULL_IF_NOT_PRESENT = 'if-not-present'
+PULL_IF_DIGEST_CHANGED = 'if-digest-changed'
+PULL_POLICIES = (PULL_ALWAYS, PULL_IF_NOT_PRESENT, PULL_IF_DIGEST_CHANGED)
+# How long the digests of images in registries are remembered, in seconds
+DISTRIBUTION_CACHE_TTL = 60
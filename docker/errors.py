@@ -135,6 +135,19 @@ class ContainerError(DockerException):
         super(ContainerError, self).__init__(msg)
 
 
+class PullError(DockerException):
+    """
+    An error reported by the Docker daemon while pulling an image.
+    """
+    def __init__(self, reference, message):
+        super(PullError, self).__init__(reference, message)
+        self.reference = reference
+        self.message = message
+
+    def __str__(self):
+        return 'Error pulling {0}: {1}'.format(self.reference, self.message)
+
+
 class StreamParseError(RuntimeError):
     def __init__(self, reason):
         self.msg = reason
@@ -1,6 +1,7 @@
 import copy
 
 from ..api import APIClient
+from ..constants import PULL_IF_NOT_PRESENT
 from ..errors import (ContainerError, ImageNotFound,
                       create_unexpected_kwargs_error)
 from ..types import HostConfig
@@ -16,6 +17,8 @@ class Container(Model):
         """
         The name of the container.
         """
+        if self.attrs.get('Names'):
+            return self.attrs['Names'][0].lstrip('/')
         if self.attrs.get('Name') is not None:
             return self.attrs['Name'].lstrip('/')
 
@@ -24,7 +27,7 @@ class Container(Model):
         """
         The image of the container.
         """
-        image_id = self.attrs['Image']
+        image_id = self.attrs.get('ImageID', self.attrs['Image'])
         if image_id is None:
             return None
         return self.client.images.get(image_id.split(':')[1])
@@ -34,6 +37,8 @@ class Container(Model):
         """
         The labels of a container as dictionary.
         """
+        if 'Labels' in self.attrs:
+            return self.attrs['Labels'] or {}
         result = self.attrs['Config'].get('Labels')
         return result or {}
 
@@ -42,7 +47,9 @@ class Container(Model):
         """
         The status of the container. For example, ``running``, or ``exited``.
         """
-        return self.attrs['State']['Status']
+        if isinstance(self.attrs['State'], dict):
+            return self.attrs['State']['Status']
+        return self.attrs['State']
 
     def attach(self, **kwargs):
         """
@@ -58,12 +65,19 @@ class Container(Model):
             stream (bool): Return container output progressively as an iterator
                 of strings, rather than a single string.
             logs (bool): Include the container's previous output.
+            demux (bool): Keep stdout and stderr separate.
+            timeout (float): Raise
+                :py:class:`docker.utils.socket.SocketTimeout` if no output
+                is received for this many seconds.
 
         Returns:
             By default, the container's output as a single string.
 
             If ``stream=True``, an iterator of output strings.
 
+            If ``demux=True``, a tuple of two strings, or of two iterators if
+            ``stream=True``, for stdout and stderr respectively.
+
         Raises:
             :py:class:`docker.errors.APIError`
                 If the server returns an error.
@@ -126,7 +140,7 @@ class Container(Model):
 
     def exec_run(self, cmd, stdout=True, stderr=True, stdin=False, tty=False,
                  privileged=False, user='', detach=False, stream=False,
-                 socket=False, environment=None):
+                 socket=False, environment=None, demux=False):
         """
         Run a command inside this container. Similar to
         ``docker exec``.
@@ -145,10 +159,13 @@ class Container(Model):
             environment (dict or list): A dictionary or a list of strings in
                 the following format ``["PASSWORD=xxx"]`` or
                 ``{"PASSWORD": "xxx"}``.
+            demux (bool): Keep stdout and stderr separate. Default: False
 
         Returns:
             (generator or str): If ``stream=True``, a generator yielding
                 response chunks. A string containing response data otherwise.
+                If ``demux=True``, a tuple of two generators or two strings,
+                for stdout and stderr respectively.
 
         Raises:
             :py:class:`docker.errors.APIError`
@@ -159,7 +176,8 @@ class Container(Model):
             privileged=privileged, user=user, environment=environment
         )
         return self.client.api.exec_start(
-            resp['Id'], detach=detach, tty=tty, stream=stream, socket=socket
+            resp['Id'], detach=detach, tty=tty, stream=stream, socket=socket,
+            demux=demux
         )
 
     def export(self):
@@ -225,9 +243,15 @@ class Container(Model):
             since (datetime or int): Show logs since a given datetime or
                 integer epoch (in seconds)
             follow (bool): Follow log output
+            demux (bool): Keep stdout and stderr separate.
+            timeout (float): With ``stream=True``, raise
+                :py:class:`docker.utils.socket.SocketTimeout` if no output
+                is received for this many seconds.
 
         Returns:
-            (generator or str): Logs from the container.
+            (generator or str): Logs from the container. If ``demux=True``, a
+            tuple of two generators or two strings, for stdout and stderr
+            respectively.
 
         Raises:
             :py:class:`docker.errors.APIError`
@@ -245,7 +269,7 @@ class Container(Model):
         """
         return self.client.api.pause(self.id)
 
-    def put_archive(self, path, data):
+    def put_archive(self, path, data, gzip=False):
         """
         Insert a file or folder in this container using a tar archive as
         source.
@@ -253,7 +277,10 @@ class Container(Model):
         Args:
             path (str): Path inside the container where the file(s) will be
                 extracted. Must exist.
-            data (bytes): tar data to be extracted
+            data (bytes): tar data to be extracted. Can also be a file
+                object or a generator.
+            gzip (bool): Compress the data using gzip, on all the available
+                cores, before sending it. Default: False
 
         Returns:
             (bool): True if the call succeeds.
@@ -261,7 +288,7 @@ class Container(Model):
         Raises:
             :py:class:`~docker.errors.APIError` If an error occurs.
         """
-        return self.client.api.put_archive(self.id, path, data)
+        return self.client.api.put_archive(self.id, path, data, gzip=gzip)
 
     def remove(self, **kwargs):
         """
@@ -600,6 +627,11 @@ class ContainerCollection(Collection):
 
             privileged (bool): Give extended privileges to this container.
             publish_all_ports (bool): Publish all ports to the host.
+            pull_policy (str): When to pull the image before creating the
+                container: ``always``, ``if-not-present`` or
+                ``if-digest-changed``. See
+                :py:meth:`~docker.api.image.ImageApiMixin.should_pull`.
+                Default: ``if-not-present``.
             read_only (bool): Mount the container's root filesystem as read
                 only.
             remove (bool): Remove the container when it has finished running.
@@ -707,6 +739,10 @@ class ContainerCollection(Collection):
                 'together.'
             )
 
+        pull_policy = kwargs.pop('pull_policy', PULL_IF_NOT_PRESENT)
+        if pull_policy != PULL_IF_NOT_PRESENT:
+            self.client.images.pull(image, policy=pull_policy)
+
         try:
             container = self.create(image=image, command=command,
                                     detach=detach, **kwargs)
@@ -782,7 +818,8 @@ class ContainerCollection(Collection):
         resp = self.client.api.inspect_container(container_id)
         return self.prepare_model(resp)
 
-    def list(self, all=False, before=None, filters=None, limit=-1, since=None):
+    def list(self, all=False, before=None, filters=None, limit=-1, since=None,
+             sparse=False):
         """
         List containers. Similar to the ``docker ps`` command.
 
@@ -815,6 +852,10 @@ class ContainerCollection(Collection):
                 A comprehensive list can be found in the documentation for
                 `docker ps
                 <https://docs.docker.com/engine/reference/commandline/ps>`_.
+            sparse (bool): Build the containers from the list's summary
+                instead of inspecting each of them. Attributes that are not
+                part of the summary are fetched with an inspect the first time
+                they are accessed. Default: ``False``
 
         Returns:
             (list of :py:class:`Container`)
@@ -826,6 +867,8 @@ class ContainerCollection(Collection):
         resp = self.client.api.containers(all=all, before=before,
                                           filters=filters, limit=limit,
                                           since=since)
+        if sparse:
+            return [self.prepare_sparse_model(r) for r in resp]
         return [self.get(r['Id']) for r in resp]
 
     def prune(self, filters=None):
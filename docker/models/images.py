@@ -1,9 +1,21 @@
+import os
 import re
+from multiprocessing.pool import ThreadPool
 
 import six
 
 from ..api import APIClient
-from ..errors import BuildError
+from ..constants import (
+    BUILD_DIGEST_LABEL, DISTRIBUTION_CACHE_TTL, PULL_ALWAYS
+)
+from ..errors import BuildError, DockerException, PullError
+from ..utils import (
+    build_digest, mkbuildcontext, parse_repository_tag, read_dockerignore,
+    tar
+)
+from ..utils.context import SharedBuffer
+from ..utils.progress import ProgressAggregator
+from ..utils.watch import DEBOUNCE, ContextWatcher
 from ..utils.json_stream import json_stream
 from .resource import Collection, Model
 
@@ -20,6 +32,8 @@ class Image(Model):
         """
         The labels of an image as dictionary.
         """
+        if 'Labels' in self.attrs:
+            return self.attrs['Labels'] or {}
         result = self.attrs['Config'].get('Labels')
         return result or {}
 
@@ -76,9 +90,38 @@ class Image(Model):
             >>> for chunk in resp.stream():
             >>>     f.write(chunk)
             >>> f.close()
+
+        To write large images to a file without holding them in memory, use
+        :py:meth:`save_to` instead.
         """
         return self.client.api.get_image(self.id)
 
+    def save_to(self, target, **kwargs):
+        """
+        Save a tarball of this image to a file. Similar to the ``docker save
+        -o`` command.
+
+        Args:
+            target: A path, a file descriptor, a file object, or ``'-'``
+                for the standard output. See
+                :py:meth:`~docker.api.image.ImageApiMixin.save_to`.
+            buffer_size (int): The size of the reads and writes.
+
+        Returns:
+            (tuple): The ``sha256:`` digest of the tarball, and its size.
+
+        Raises:
+            :py:class:`docker.errors.APIError`
+                If the server returns an error.
+
+        Example:
+
+            >>> image = cli.images.get("fedora:latest")
+            >>> image.save_to('/tmp/fedora-latest.tar')
+            ('sha256:5a0a...', 243251712)
+        """
+        return self.client.api.save_to(self.id, target, **kwargs)
+
     def tag(self, repository, tag=None, **kwargs):
         """
         Tag this image into a repository. Similar to the ``docker tag``
@@ -99,6 +142,12 @@ class Image(Model):
         return self.client.api.tag(self.id, repository, tag=tag, **kwargs)
 
 
+_CONTEXT_KWARGS = (
+    'path', 'fileobj', 'custom_context', 'encoding', 'gzip', 'stream_context',
+    'context_cache', 'reproducible'
+)
+
+
 class ImageCollection(Collection):
     model = Image
 
@@ -157,6 +206,36 @@ class ImageCollection(Collection):
                 single layer.
             extra_hosts (dict): Extra hosts to add to /etc/hosts in building
                 containers, as a mapping of hostname to IP address.
+            stream_context (bool): When building from a local ``path``, send
+                the build context while it is being archived, using a chunked
+                request, instead of writing it to a temporary file first.
+            context_cache (:py:class:`~docker.utils.context.ContextCache`):
+                When building from a local ``path``, build the context from
+                the entries kept in this cache, only reading the files that
+                changed since it was last archived. The context is sent as
+                with ``stream_context``.
+            reproducible (bool): When building from a local ``path``, clear
+                the modification times and ownership of the files in the
+                context, so that identical trees produce identical archives.
+                To know the archive's digest, archive the context with
+                :py:func:`docker.utils.tar` and ``reproducible=True``, and
+                build from the archive with ``custom_context=True``.
+            analyzer (:py:class:`~docker.utils.build_stream.BuildAnalyzer`):
+                An analyzer to feed the build output to, to find out how
+                long each step took.
+            reuse_existing (bool): Look for a local image built from the
+                same inputs first, and return it (tagged with ``tag``)
+                without uploading the context or building anything. The
+                inputs (context, Dockerfile, ``buildargs``, ``target``,
+                ``labels`` and ``squash``) are hashed with
+                :py:func:`~docker.utils.build_digest`, and built images are
+                labelled with the digest. Builds with ``nocache`` or
+                ``pull`` don't look for an image, and builds whose context
+                can't be hashed (remote contexts) are never reused. A local
+                ``path`` is archived once, reproducibly and to a temporary
+                file even with ``stream_context``, and that archive is
+                uploaded if no image is found.
+                Default: ``False``
 
         Returns:
             (:py:class:`Image`): The built image.
@@ -169,26 +248,282 @@ class ImageCollection(Collection):
             ``TypeError``
                 If neither ``path`` nor ``fileobj`` is specified.
         """
+        analyzer = kwargs.pop('analyzer', None)
+        if not kwargs.pop('reuse_existing', False):
+            return self._build(kwargs, analyzer)
+
+        archive = None
+        path = kwargs.get('path')
+        if (kwargs.get('fileobj') is None and path is not None and
+                kwargs.get('context_cache') is None and os.path.isdir(path)):
+            # Archive the context once, hashing it on the way, and upload
+            # that archive if no image is found.
+            gzip = kwargs.get('gzip', False)
+            archive = tar(
+                path, read_dockerignore(path), kwargs.get('dockerfile'),
+                gzip=gzip, reproducible=True
+            )
+        try:
+            digest = build_digest(
+                path=path, fileobj=kwargs.get('fileobj'),
+                dockerfile=kwargs.get('dockerfile'),
+                buildargs=kwargs.get('buildargs'),
+                target=kwargs.get('target'), labels=kwargs.get('labels'),
+                squash=kwargs.get('squash'),
+                context_cache=kwargs.get('context_cache'),
+                context_digest=archive.digest if archive else None
+            )
+            if digest is not None:
+                if not kwargs.get('nocache') and not kwargs.get('pull'):
+                    image = self._get_built(digest, kwargs.get('tag'))
+                    if image is not None:
+                        return image
+                labels = dict(kwargs.get('labels') or {})
+                labels[BUILD_DIGEST_LABEL] = digest
+                kwargs['labels'] = labels
+            if archive is not None:
+                for key in ('path', 'gzip', 'stream_context', 'reproducible'):
+                    kwargs.pop(key, None)
+                kwargs['fileobj'] = archive
+                kwargs['custom_context'] = True
+                if gzip:
+                    kwargs['encoding'] = 'gzip'
+            return self._build(kwargs, analyzer)
+        finally:
+            if archive is not None:
+                archive.close()
+
+    def _build(self, kwargs, analyzer):
         resp = self.client.api.build(**kwargs)
         if isinstance(resp, six.string_types):
             return self.get(resp)
         last_event = None
         image_id = None
-        for chunk in json_stream(resp):
-            if 'error' in chunk:
-                raise BuildError(chunk['error'])
-            if 'stream' in chunk:
-                match = re.search(
-                    r'(^Successfully built |sha256:)([0-9a-f]+)$',
-                    chunk['stream']
-                )
-                if match:
-                    image_id = match.group(2)
-            last_event = chunk
+        try:
+            for chunk in json_stream(resp):
+                if analyzer is not None:
+                    analyzer.feed(chunk)
+                if 'error' in chunk:
+                    raise BuildError(chunk['error'])
+                if 'stream' in chunk:
+                    match = re.search(
+                        r'(^Successfully built |sha256:)([0-9a-f]+)$',
+                        chunk['stream']
+                    )
+                    if match:
+                        image_id = match.group(2)
+                last_event = chunk
+        finally:
+            if analyzer is not None:
+                analyzer.close()
         if image_id:
             return self.get(image_id)
         raise BuildError(last_event or 'Unknown')
 
+    def build_many(self, builds, max_workers=4, **kwargs):
+        """
+        Build several images from the same context, for instance the targets
+        of a multi-stage Dockerfile. The context is archived (and compressed)
+        once, into a read-only buffer that all the builds upload from, and up
+        to ``max_workers`` builds run at the same time.
+
+        Args:
+            builds (:py:class:`list`): The arguments of each build, as
+                dictionaries of keyword arguments to :py:meth:`build`, e.g.
+                ``{'target': 'web', 'tag': 'app/web:latest'}``. They can't
+                describe the context: ``path``, ``fileobj``,
+                ``custom_context``, ``encoding``, ``gzip``,
+                ``stream_context``, ``context_cache`` and ``reproducible``
+                can only be shared.
+            max_workers (int): The maximum number of builds that run at the
+                same time. Default: 4
+            **kwargs: The arguments shared by all the builds, as for
+                :py:meth:`build`. Each build's own arguments override them.
+
+        Returns:
+            (:py:class:`list`): One ``(image, error)`` tuple per build, in
+            the order of ``builds``: the built :py:class:`Image` and ``None``
+            if the build succeeded, ``None`` and the exception it raised
+            otherwise.
+
+        Raises:
+            ``TypeError``
+                If neither ``path`` nor ``fileobj`` is specified, or if a
+                build has its own context arguments.
+        """
+        for build in builds:
+            shared = set(build).intersection(_CONTEXT_KWARGS)
+            if shared:
+                raise TypeError(
+                    'Build context arguments can only be shared: {0}'.format(
+                        ', '.join(sorted(shared))
+                    )
+                )
+        if not builds:
+            return []
+
+        buf = self._shared_context(kwargs)
+        try:
+            def run(build):
+                build_kwargs = dict(kwargs, **build)
+                if buf is not None:
+                    build_kwargs['fileobj'] = buf.reader()
+                try:
+                    return self.build(**build_kwargs), None
+                except Exception as e:
+                    return None, e
+
+            pool = ThreadPool(max(1, min(max_workers, len(builds))))
+            try:
+                return pool.map(run, builds)
+            finally:
+                pool.close()
+                pool.join()
+        finally:
+            if buf is not None:
+                buf.close()
+
+    def watch_build(self, path, debounce=DEBOUNCE, timeout=None, **kwargs):
+        """
+        Build an image from a local directory, then build it again every
+        time the files of the context change, until the generator is closed.
+
+        The context is indexed once, and the index is kept up to date from
+        inotify events (on Linux; the directory is polled elsewhere), so the
+        context of each build is archived without walking the directory. See
+        :py:class:`~docker.utils.watch.ContextWatcher`.
+
+        Args:
+            path (str): The directory of the build context.
+            debounce (float): How long the context must be left alone after
+                a change, in seconds, before it is built again.
+            timeout (float): Stop if the context doesn't change for this
+                long, in seconds. Default: wait forever
+            **kwargs: The arguments of each build, as for :py:meth:`build`,
+                except for ``fileobj``, ``custom_context`` and ``encoding``.
+
+        Returns:
+            A generator of one ``(image, error)`` tuple per build: the built
+            :py:class:`Image` and ``None`` if the build succeeded, ``None``
+            and the exception it raised otherwise.
+
+        Raises:
+            ``TypeError``
+                If ``path`` isn't a directory, or if a context argument is
+                given.
+
+        Example:
+
+            >>> for image, error in client.images.watch_build('.', tag='app'):
+            ...     print(error or image.short_id)
+        """
+        for key in ('fileobj', 'custom_context', 'encoding'):
+            if key in kwargs:
+                raise TypeError(
+                    'watch_build() got an unexpected keyword argument '
+                    '{0!r}'.format(key)
+                )
+        if not os.path.isdir(path):
+            raise TypeError("You must specify a directory to build in path")
+        gzip = kwargs.pop('gzip', False)
+        stream = kwargs.pop('stream_context', False)
+        reproducible = kwargs.pop('reproducible', False)
+        context_cache = kwargs.pop('context_cache', None)
+
+        with ContextWatcher(
+                path, dockerfile=kwargs.get('dockerfile'),
+                debounce=debounce) as watcher:
+            while True:
+                context = watcher.tar(
+                    gzip=gzip, stream=stream, reproducible=reproducible,
+                    context_cache=context_cache
+                )
+                try:
+                    result = self.build(
+                        fileobj=context, custom_context=True,
+                        encoding='gzip' if gzip else None, **kwargs
+                    ), None
+                except Exception as e:
+                    result = None, e
+                finally:
+                    if hasattr(context, 'close'):
+                        context.close()
+                yield result
+                if not watcher.changes(timeout):
+                    return
+
+    def _shared_context(self, kwargs):
+        """
+        Archive the build context described by ``kwargs`` into a
+        :py:class:`~docker.utils.context.SharedBuffer`, and replace its
+        arguments in ``kwargs`` with those of a custom context. Remote
+        contexts are left to the daemon, and return None.
+        """
+        path = kwargs.pop('path', None)
+        fileobj = kwargs.pop('fileobj', None)
+        custom_context = kwargs.pop('custom_context', False)
+        encoding = kwargs.pop('encoding', None)
+        gzip = kwargs.pop('gzip', False)
+        context_cache = kwargs.pop('context_cache', None)
+        reproducible = kwargs.pop('reproducible', False)
+        kwargs.pop('stream_context', None)
+        if path is None and fileobj is None:
+            raise TypeError("Either path or fileobj needs to be provided.")
+        if gzip and encoding is not None:
+            raise DockerException(
+                'Can not use custom encoding if gzip is enabled'
+            )
+
+        if custom_context:
+            if not fileobj:
+                raise TypeError("You must specify fileobj with custom_context")
+            context = fileobj
+        elif fileobj is not None:
+            context = mkbuildcontext(fileobj)
+        elif path.startswith(('http://', 'https://',
+                              'git://', 'github.com/', 'git@')):
+            kwargs['path'] = path
+            return None
+        elif not os.path.isdir(path):
+            raise TypeError("You must specify a directory to build in path")
+        else:
+            exclude = read_dockerignore(path)
+            dockerfile = kwargs.get('dockerfile')
+            if context_cache is not None:
+                context = context_cache.tar(
+                    path, exclude=exclude, dockerfile=dockerfile, gzip=gzip,
+                    reproducible=reproducible
+                )
+            else:
+                context = tar(
+                    path, exclude=exclude, dockerfile=dockerfile, gzip=gzip,
+                    reproducible=reproducible
+                )
+            encoding = 'gzip' if gzip else encoding
+
+        try:
+            buf = SharedBuffer(context)
+        finally:
+            if context is not fileobj:
+                context.close()
+        kwargs['custom_context'] = True
+        if encoding:
+            kwargs['encoding'] = encoding
+        return buf
+
+    def _get_built(self, digest, tag=None):
+        images = self.client.api.images(filters={
+            'label': '{0}={1}'.format(BUILD_DIGEST_LABEL, digest)
+        })
+        if not images:
+            return None
+        image = self.get(images[0]['Id'])
+        if tag:
+            repository, tag = parse_repository_tag(tag)
+            if image.tag(repository, tag):
+                image.reload()
+        return image
+
     def get(self, name):
         """
         Gets an image.
@@ -207,7 +542,7 @@ class ImageCollection(Collection):
         """
         return self.prepare_model(self.client.api.inspect_image(name))
 
-    def list(self, name=None, all=False, filters=None):
+    def list(self, name=None, all=False, filters=None, sparse=False):
         """
         List images on the server.
 
@@ -219,6 +554,11 @@ class ImageCollection(Collection):
                 Available filters:
                 - ``dangling`` (bool)
                 - ``label`` (str): format either ``key`` or ``key=value``
+            sparse (bool): Build the images from the list's summary
+                (``RepoTags``, ``RepoDigests``, ``Size``, ``Labels``,
+                ``Created``...) instead of inspecting each of them. Other
+                attributes are fetched with an inspect the first time they are
+                accessed. Default: ``False``
 
         Returns:
             (list of :py:class:`Image`): The images.
@@ -228,6 +568,8 @@ class ImageCollection(Collection):
                 If the server returns an error.
         """
         resp = self.client.api.images(name=name, all=all, filters=filters)
+        if sparse:
+            return [self.prepare_sparse_model(r) for r in resp]
         return [self.get(r["Id"]) for r in resp]
 
     def load(self, data):
@@ -265,20 +607,100 @@ class ImageCollection(Collection):
                 :py:meth:`~docker.client.DockerClient.login` has set for
                 this request. ``auth_config`` should contain the ``username``
                 and ``password`` keys to be valid.
+            policy (str): When to pull the image: ``always``,
+                ``if-not-present`` or ``if-digest-changed``. See
+                :py:meth:`~docker.api.image.ImageApiMixin.should_pull`.
+                Default: ``always``.
+            max_age (float): With ``if-digest-changed``, how long the digest
+                of the image in the registry is remembered, in seconds.
+            progress (callable): Called with
+                :py:class:`~docker.utils.progress.ProgressSnapshot` objects
+                as the pull goes, at most 10 times per second. Can also be
+                a :py:class:`~docker.utils.progress.ProgressAggregator`, to
+                pick the interval or callback.
 
         Returns:
-            (:py:class:`Image`): The image that has been pulled.
+            (:py:class:`Image`): The image that has been pulled, or the local
+            image if the policy says it doesn't need to be.
 
         Raises:
+            :py:class:`docker.errors.PullError`
+                If the pull fails while following its ``progress``.
             :py:class:`docker.errors.APIError`
                 If the server returns an error.
 
         Example:
 
             >>> image = client.images.pull('busybox')
+            >>> image = client.images.pull(
+            ...     'busybox', progress=lambda snapshot: print(snapshot)
+            ... )
+        """
+        policy = kwargs.pop('policy', PULL_ALWAYS)
+        max_age = kwargs.pop('max_age', DISTRIBUTION_CACHE_TTL)
+        reference = '{0}:{1}'.format(name, tag) if tag else name
+        if policy != PULL_ALWAYS and not self.client.api.should_pull(
+                reference, policy=policy, max_age=max_age,
+                auth_config=kwargs.get('auth_config')):
+            return self.get(reference)
+        progress = kwargs.pop('progress', None)
+        if progress is None:
+            self.client.api.pull(name, tag=tag, **kwargs)
+            return self.get(reference)
+
+        if not isinstance(progress, ProgressAggregator):
+            progress = ProgressAggregator(callback=progress)
+        kwargs.update(stream=True, decode=True)
+        try:
+            for event in self.client.api.pull(name, tag=tag, **kwargs):
+                progress.feed(event)
+                if 'error' in event:
+                    raise PullError(reference, event['error'])
+        finally:
+            progress.close()
+        return self.get(reference)
+
+    def pull_many(self, references, **kwargs):
+        """
+        Pull several images at the same time, and return them. Identical
+        references, and images being pulled already by another thread, are
+        only pulled once.
+
+        If you want to get the raw pull output, use the
+        :py:meth:`~docker.api.image.ImageApiMixin.pull_many` method in the
+        low-level API.
+
+        Args:
+            references (:py:class:`list`): The images to pull, as
+                ``repository[:tag]`` or ``repository@digest``.
+            max_workers (int): The maximum number of images pulled at the
+                same time. Default: 4
+            auth_config (dict): Override the credentials that
+                :py:meth:`~docker.client.DockerClient.login` has set for
+                these requests.
+            progress (callable): Called with the reference and each decoded
+                progress event of the pulls.
+
+        Returns:
+            (dict): One ``(image, error)`` tuple per reference: the pulled
+            :py:class:`Image` and ``None``, or ``None`` and the exception
+            the pull raised.
+
+        Example:
+
+            >>> results = client.images.pull_many(['busybox', 'alpine'])
         """
-        self.client.api.pull(name, tag=tag, **kwargs)
-        return self.get('{0}:{1}'.format(name, tag) if tag else name)
+        results = {}
+        for reference, (events, error) in six.iteritems(
+                self.client.api.pull_many(references, **kwargs)):
+            if error is None:
+                try:
+                    results[reference] = self.get(reference), None
+                except Exception as e:
+                    results[reference] = None, e
+            else:
+                results[reference] = None, error
+        return results
 
     def push(self, repository, tag=None, **kwargs):
         return self.client.api.push(repository, tag=tag, **kwargs)
@@ -288,6 +710,10 @@ class ImageCollection(Collection):
         self.client.api.remove_image(*args, **kwargs)
     remove.__doc__ = APIClient.remove_image.__doc__
 
+    def save_many(self, *args, **kwargs):
+        return self.client.api.save_many(*args, **kwargs)
+    save_many.__doc__ = APIClient.save_many.__doc__
+
     def search(self, *args, **kwargs):
         return self.client.api.search(*args, **kwargs)
     search.__doc__ = APIClient.search.__doc__
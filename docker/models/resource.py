@@ -49,6 +49,54 @@ class Model(object):
         self.attrs = new_model.attrs
 
 
+class SparseAttrs(dict):
+    """
+    The attributes of a model built from a list endpoint's summary.
+
+    The summary is used as is, until a key it doesn't contain is looked up.
+    The full representation of the object is then loaded with ``load`` and
+    replaces the summary.
+    """
+    def __init__(self, summary, load):
+        super(SparseAttrs, self).__init__(summary)
+        self._load = load
+
+    @property
+    def sparse(self):
+        """
+        Whether the full representation has not been loaded yet.
+        """
+        return self._load is not None
+
+    def hydrate(self):
+        """
+        Replace the summary with the full representation of the object.
+        """
+        if self._load is None:
+            return
+        # If loading fails, it is tried again on the next lookup
+        attrs = self._load()
+        self._load = None
+        self.clear()
+        self.update(attrs)
+
+    def __missing__(self, key):
+        if self._load is None:
+            raise KeyError(key)
+        self.hydrate()
+        return self[key]
+
+    def __contains__(self, key):
+        if not super(SparseAttrs, self).__contains__(key):
+            self.hydrate()
+        return super(SparseAttrs, self).__contains__(key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+
 class Collection(object):
     """
     A base class for representing all objects of a particular type on the
@@ -91,3 +139,15 @@ class Collection(object):
         else:
             raise Exception("Can't create %s from %s" %
                             (self.model.__name__, attrs))
+
+    def prepare_sparse_model(self, attrs):
+        """
+        Create a model from the summary returned by a list endpoint. The full
+        attributes are loaded with :py:meth:`get` the first time a key that
+        isn't part of the summary is accessed.
+        """
+        model = self.prepare_model(attrs)
+        model.attrs = SparseAttrs(
+            model.attrs, lambda: self.get(model.id).attrs
+        )
+        return model
@@ -0,0 +1,37 @@
+import six
+
+
+class ChunkedRequestMixin(object):
+    """
+    Adds the ``request_chunked`` method urllib3 uses to send request bodies
+    of unknown length (e.g. generators) to ``httplib.HTTPConnection``
+    subclasses.
+    """
+
+    def request_chunked(self, method, url, body=None, headers=None):
+        headers = headers or {}
+        header_keys = set(k.lower() for k in headers)
+        self.putrequest(
+            method, url,
+            skip_accept_encoding='accept-encoding' in header_keys,
+            skip_host='host' in header_keys
+        )
+        for header, value in headers.items():
+            self.putheader(header, value)
+        if 'transfer-encoding' not in header_keys:
+            self.putheader('Transfer-Encoding', 'chunked')
+        self.endheaders()
+
+        if body is not None:
+            if isinstance(body, (six.binary_type, six.text_type)):
+                body = (body,)
+            for chunk in body:
+                if not chunk:
+                    continue
+                if not isinstance(chunk, six.binary_type):
+                    chunk = chunk.encode('utf-8')
+                self.send(
+                    '{0:x}\r\n'.format(len(chunk)).encode('ascii') +
+                    chunk + b'\r\n'
+                )
+        self.send(b'0\r\n\r\n')
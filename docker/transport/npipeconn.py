@@ -2,6 +2,7 @@ import six
 import requests.adapters
 
 from .. import constants
+from .chunked import ChunkedRequestMixin
 from .npipesocket import NpipeSocket
 
 if six.PY3:
@@ -17,7 +18,8 @@ except ImportError:
 RecentlyUsedContainer = urllib3._collections.RecentlyUsedContainer
 
 
-class NpipeHTTPConnection(httplib.HTTPConnection, object):
+class NpipeHTTPConnection(ChunkedRequestMixin, httplib.HTTPConnection,
+                          object):
     def __init__(self, npipe_path, timeout=60):
         super(NpipeHTTPConnection, self).__init__(
             'localhost', timeout=timeout
@@ -3,6 +3,7 @@ import requests.adapters
 import socket
 
 from .. import constants
+from .chunked import ChunkedRequestMixin
 
 if six.PY3:
     import http.client as httplib
@@ -30,7 +31,8 @@ class UnixHTTPResponse(httplib.HTTPResponse, object):
             self.fp = new_fp
 
 
-class UnixHTTPConnection(httplib.HTTPConnection, object):
+class UnixHTTPConnection(ChunkedRequestMixin, httplib.HTTPConnection,
+                         object):
 
     def __init__(self, base_url, unix_socket, timeout=60):
         super(UnixHTTPConnection, self).__init__(
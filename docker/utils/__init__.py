@@ -1,5 +1,8 @@
 # flake8: noqa
-from .build import tar, exclude_paths
+from .build import (
+    tar, exclude_paths, archive_digest, build_digest, read_dockerignore
+)
+from .compress import gzip_stream
 from .decorators import check_resource, minimum_version, update_headers
 from .utils import (
     compare_version, convert_port_bindings, convert_volume_binds,
@@ -8,6 +11,6 @@ from .utils import (
     create_host_config, parse_bytes, ping_registry, parse_env_file, version_lt,
     version_gte, decode_json_header, split_command, create_ipam_config,
     create_ipam_pool, parse_devices, normalize_links, convert_service_networks,
-    format_environment, create_archive, format_extra_hosts
+    format_environment, create_archive, format_extra_hosts, stream_archive
 )
 
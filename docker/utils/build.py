@@ -1,20 +1,152 @@
+import collections
+import hashlib
+import json
 import os
+import re
+from stat import S_ISDIR
 
 from ..constants import IS_WINDOWS_PLATFORM
-from .fnmatch import fnmatch
-from .utils import create_archive
+from .fnmatch import fnmatch, translate
+from .pool import get_pool
+from .utils import create_archive, stream_archive
 
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
 
-def tar(path, exclude=None, dockerfile=None, fileobj=None, gzip=False):
+# Directories are read, and their entries stat'ed, by this many threads,
+# which mostly helps on network filesystems
+WALK_WORKERS = 16
+
+
+def tar(path, exclude=None, dockerfile=None, fileobj=None, gzip=False,
+        stream=False, reproducible=False):
+    """
+    Archive a build context directory, leaving out the paths matching the
+    ``.dockerignore`` patterns in ``exclude``.
+
+    Returns:
+        The archive, as a file object positioned at its start or, with
+        ``stream=True``, as a :py:class:`~docker.utils.utils.ArchiveStream`.
+        With ``reproducible=True``, either has a ``digest`` attribute: the
+        digest of the archive before compression, which is set as soon as
+        it has been written out.
+    """
     root = os.path.abspath(path)
     exclude = exclude or []
-
+    stats = walk_context(root, exclude, dockerfile=dockerfile)
+    files = sorted(stats)
+
+    if stream:
+        return stream_archive(
+            root, files=files, gzip=gzip, reproducible=reproducible,
+            stats=stats
+        )
     return create_archive(
-        files=sorted(exclude_paths(root, exclude, dockerfile=dockerfile)),
-        root=root, fileobj=fileobj, gzip=gzip
+        files=files, root=root, fileobj=fileobj, gzip=gzip,
+        reproducible=reproducible, stats=stats
     )
 
 
+def archive_digest(path, exclude=None, dockerfile=None):
+    """
+    The digest of the reproducible build context archive of a directory, as
+    generated by ``tar(path, exclude, dockerfile, reproducible=True)``
+    before compression. When the archive is also going to be used, read its
+    ``digest`` attribute instead, to avoid archiving the directory twice.
+
+    Args:
+        path (str): The directory to archive.
+        exclude (:py:class:`list`): ``.dockerignore`` patterns.
+        dockerfile (str): The path of the Dockerfile within ``path``.
+
+    Returns:
+        (str): The SHA-256 digest of the archive, as ``sha256:<hex>``.
+    """
+    archive = tar(path, exclude, dockerfile, stream=True, reproducible=True)
+    for chunk in archive:
+        pass
+    return archive.digest
+
+
+def read_dockerignore(path):
+    """
+    Read the patterns of the ``.dockerignore`` file of a directory, if it has
+    one.
+
+    Returns:
+        (:py:class:`list`): The patterns, or None.
+    """
+    dockerignore = os.path.join(path, '.dockerignore')
+    if not os.path.exists(dockerignore):
+        return None
+    with open(dockerignore, 'r') as f:
+        return list(filter(bool, f.read().splitlines()))
+
+
+def build_digest(path=None, fileobj=None, dockerfile=None, buildargs=None,
+                 target=None, labels=None, squash=None, context_cache=None,
+                 context_digest=None):
+    """
+    A digest of the inputs of a build: the context (or Dockerfile object),
+    the Dockerfile path, build arguments, target stage, labels and whether
+    the image is squashed.
+
+    The context is hashed as its reproducible archive (see
+    :py:func:`archive_digest`), or as its ``CachedContext.digest`` when a
+    ``context_cache`` is given, so the two don't produce the same digests.
+    ``fileobj`` is read and rewound. If the context has already been
+    archived with ``tar(path, ..., reproducible=True)``, pass the archive's
+    ``digest`` as ``context_digest`` to avoid archiving it again.
+
+    Returns:
+        (str): The digest, as ``sha256:<hex>``, or None if the context can't
+        be hashed: a remote ``path``, or a ``fileobj`` that can't be rewound.
+    """
+    if context_digest is not None:
+        context = context_digest
+    elif fileobj is not None:
+        try:
+            start = fileobj.tell()
+        except (AttributeError, IOError, OSError):
+            return None
+        sha = hashlib.sha256()
+        while True:
+            data = fileobj.read(65536)
+            if not data:
+                break
+            if not isinstance(data, bytes):
+                data = data.encode('utf-8')
+            sha.update(data)
+        fileobj.seek(start)
+        context = 'sha256:' + sha.hexdigest()
+    elif path is None or path.startswith(
+            ('http://', 'https://', 'git://', 'github.com/', 'git@')):
+        return None
+    elif context_cache is not None:
+        context = context_cache.tar(
+            path, read_dockerignore(path), dockerfile, reproducible=True
+        ).digest
+    else:
+        context = archive_digest(path, read_dockerignore(path), dockerfile)
+
+    inputs = {
+        'context': context,
+        'dockerfile': dockerfile,
+        'buildargs': buildargs or {},
+        'target': target,
+        'labels': labels or {},
+        'squash': bool(squash),
+    }
+    return 'sha256:' + hashlib.sha256(
+        json.dumps(inputs, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+
+
 def exclude_paths(root, patterns, dockerfile=None):
     """
     Given a root directory path and a list of .dockerignore patterns, return
@@ -23,27 +155,65 @@ def exclude_paths(root, patterns, dockerfile=None):
 
     All paths returned are relative to the root.
     """
+    return set(walk_context(root, patterns, dockerfile, stat=False))
+
+
+def walk_context(root, patterns, dockerfile=None, stat=True,
+                 workers=WALK_WORKERS):
+    """
+    Like :py:func:`exclude_paths`, but also returns the ``os.lstat()``
+    results of the paths, obtained while walking the directory.
+
+    The directories are read in parallel. When ``os.scandir`` (or the
+    ``scandir`` package) is available, the entries that are excluded are
+    never stat'ed.
+
+    Args:
+        root (str): The directory to walk.
+        patterns (:py:class:`list`): ``.dockerignore`` patterns.
+        dockerfile (str): The path of the Dockerfile within ``root``.
+        stat (bool): Whether to stat the paths.
+        workers (int): The number of threads reading directories.
+
+    Returns:
+        (dict): The stat results, or ``None`` when they aren't known, by
+        path relative to the root.
+    """
     if dockerfile is None:
         dockerfile = 'Dockerfile'
 
+    matcher = context_matcher(patterns, dockerfile)
+    paths = scan_paths(root, matcher, stat=stat, workers=workers)
+
+    # If the Dockerfile is in a subdirectory that is excluded, the walk
+    # will not descend into it and the file will be skipped. This ensures
+    # it doesn't happen.
+    dockerfile = dockerfile.replace('/', os.path.sep)
+    if dockerfile not in paths and os.path.exists(
+            os.path.join(root, dockerfile)):
+        paths[dockerfile] = None
+    return paths
+
+
+def context_matcher(patterns, dockerfile=None):
+    """
+    The :py:class:`PatternMatcher` that decides which paths are part of a
+    build context, given its ``.dockerignore`` patterns and the path of its
+    Dockerfile. The Dockerfile and the ``.dockerignore`` file are always
+    included.
+    """
+    return PatternMatcher(*_context_patterns(patterns, dockerfile))
+
+
+def _context_patterns(patterns, dockerfile=None):
     patterns = [p.lstrip('/') for p in patterns]
     exceptions = [p for p in patterns if p.startswith('!')]
 
     include_patterns = [p[1:] for p in exceptions]
-    include_patterns += [dockerfile, '.dockerignore']
+    include_patterns += [dockerfile or 'Dockerfile', '.dockerignore']
 
     exclude_patterns = list(set(patterns) - set(exceptions))
-
-    paths = get_paths(root, exclude_patterns, include_patterns,
-                      has_exceptions=len(exceptions) > 0)
-
-    return set(paths).union(
-        # If the Dockerfile is in a subdirectory that is excluded, get_paths
-        # will not descend into it and the file will be skipped. This ensures
-        # it doesn't happen.
-        set([dockerfile.replace('/', os.path.sep)])
-        if os.path.exists(os.path.join(root, dockerfile)) else set()
-    )
+    return exclude_patterns, include_patterns
 
 
 def should_include(path, exclude_patterns, include_patterns):
@@ -56,13 +226,9 @@ def should_include(path, exclude_patterns, include_patterns):
     3. Returns true if the path matches an exclusion pattern and matches an
        inclusion pattern
     """
-    for pattern in exclude_patterns:
-        if match_path(path, pattern):
-            for pattern in include_patterns:
-                if match_path(path, pattern):
-                    return True
-            return False
-    return True
+    return PatternMatcher(
+        exclude_patterns, include_patterns
+    ).should_include(path)
 
 
 def should_check_directory(directory_path, exclude_patterns, include_patterns):
@@ -77,54 +243,112 @@ def should_check_directory(directory_path, exclude_patterns, include_patterns):
     3. Returns False otherwise
     """
 
-    # To account for exception rules, check directories if their path is a
-    # a prefix to an inclusion pattern. This logic conforms with the current
-    # docker logic (2016-10-27):
-    # https://github.com/docker/docker/blob/bc52939b0455116ab8e0da67869ec81c1a1c3e2c/pkg/archive/archive.go#L640-L671
+    return PatternMatcher(
+        exclude_patterns, include_patterns
+    ).should_check_directory(directory_path)
 
-    def normalize_path(path):
-        return path.replace(os.path.sep, '/')
 
-    path_with_slash = normalize_path(directory_path) + '/'
-    possible_child_patterns = [
-        pattern for pattern in map(normalize_path, include_patterns)
-        if (pattern + '/').startswith(path_with_slash)
-    ]
-    directory_included = should_include(
-        directory_path, exclude_patterns, include_patterns
-    )
-    return directory_included or len(possible_child_patterns) > 0
+def get_paths(root, exclude_patterns, include_patterns, has_exceptions=False):
+    matcher = PatternMatcher(exclude_patterns, include_patterns)
+    return list(scan_paths(root, matcher, stat=False))
 
 
-def get_paths(root, exclude_patterns, include_patterns, has_exceptions=False):
-    paths = []
-
-    for parent, dirs, files in os.walk(root, topdown=True, followlinks=False):
-        parent = os.path.relpath(parent, root)
-        if parent == '.':
-            parent = ''
-
-        # Remove excluded patterns from the list of directories to traverse
-        # by mutating the dirs we're iterating over.
-        # This looks strange, but is considered the correct way to skip
-        # traversal. See https://docs.python.org/2/library/os.html#os.walk
-        dirs[:] = [
-            d for d in dirs if should_check_directory(
-                os.path.join(parent, d), exclude_patterns, include_patterns
+def scan_paths(root, matcher, stat=True, workers=WALK_WORKERS, top='',
+               directories=None):
+    """
+    Walk ``root`` with ``scandir``, skipping the directories ``matcher``
+    excludes, on a pool of ``workers`` threads shared by all the walks.
+    Without ``scandir``, the entries are listed with ``os.listdir()`` and
+    stat'ed one by one.
+
+    Args:
+        top (str): Only walk this directory, relative to ``root``.
+        directories (set): The paths of the directories walked, relative to
+            ``root``, are added to it (``''`` being the root).
+
+    Returns:
+        (dict): The ``os.lstat()`` results of the paths to include, or
+        ``None`` if ``stat`` is False, by path relative to the root.
+    """
+    def scan(parent):
+        found = []
+        subdirs = []
+        try:
+            entries = list(
+                (scandir or _list_entries)(os.path.join(root, parent))
             )
-        ]
+        except OSError:
+            # Unreadable directories are skipped, like os.walk does
+            return found, subdirs
+
+        for entry in entries:
+            path = os.path.join(parent, entry.name) if parent else entry.name
+            try:
+                # os.walk doesn't descend into links to directories
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
+
+            if matcher.should_include(path):
+                statres = None
+                if stat:
+                    try:
+                        statres = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        pass
+                found.append((path, statres))
+                if is_dir:
+                    subdirs.append(path)
+            elif is_dir and matcher.has_child_exceptions(path):
+                subdirs.append(path)
+        return found, subdirs
+
+    if directories is None:
+        directories = set()
+    directories.add(top)
+    paths = {}
+    if workers <= 1:
+        pending = [top]
+        while pending:
+            found, subdirs = scan(pending.pop())
+            paths.update(found)
+            directories.update(subdirs)
+            pending.extend(subdirs)
+        return paths
+
+    pool = get_pool(workers)
+    pending = collections.deque([pool.apply_async(scan, (top,))])
+    while pending:
+        found, subdirs = pending.popleft().get()
+        paths.update(found)
+        directories.update(subdirs)
+        pending.extend(
+            pool.apply_async(scan, (subdir,)) for subdir in subdirs
+        )
+    return paths
 
-        for path in dirs:
-            if should_include(os.path.join(parent, path),
-                              exclude_patterns, include_patterns):
-                paths.append(os.path.join(parent, path))
 
-        for path in files:
-            if should_include(os.path.join(parent, path),
-                              exclude_patterns, include_patterns):
-                paths.append(os.path.join(parent, path))
+class _Entry(object):
+    """
+    The parts of ``os.DirEntry`` that :py:func:`scan_paths` uses.
+    """
 
-    return paths
+    def __init__(self, parent, name):
+        self.name = name
+        self.path = os.path.join(parent, name)
+        self._stat = None
+
+    def stat(self, follow_symlinks=True):
+        if self._stat is None:
+            self._stat = os.lstat(self.path)
+        return self._stat
+
+    def is_dir(self, follow_symlinks=True):
+        return S_ISDIR(self.stat().st_mode)
+
+
+def _list_entries(path):
+    return [_Entry(path, name) for name in os.listdir(path)]
 
 
 def match_path(path, pattern):
@@ -141,3 +365,87 @@ def match_path(path, pattern):
     else:
         path_components = path.split(os.path.sep)
     return fnmatch('/'.join(path_components), '/'.join(pattern_components))
+
+
+class PatternMatcher(object):
+    """
+    Matches paths against lists of exclusion and inclusion patterns, with the
+    same results as :py:func:`should_include` and
+    :py:func:`should_check_directory`.
+
+    Patterns are normalized once, and all the patterns that are compared to
+    the same number of leading path components are combined into a single
+    regular expression, so each path is split and matched once per group
+    rather than once per pattern.
+    """
+
+    def __init__(self, exclude_patterns, include_patterns):
+        self.exclude = _compile_patterns(exclude_patterns)
+        self.include = _compile_patterns(include_patterns)
+        self.include_prefixes = [
+            p.replace(os.path.sep, '/') + '/' for p in include_patterns
+        ]
+
+    def should_include(self, path):
+        if not self.exclude:
+            return True
+        components = path.lower().split(os.path.sep)
+        if not _match_groups(self.exclude, components):
+            return True
+        return _match_groups(self.include, components)
+
+    def has_child_exceptions(self, directory_path):
+        """
+        Whether an inclusion pattern could match a path inside the directory.
+        """
+        path_with_slash = directory_path.replace(os.path.sep, '/') + '/'
+        return any(
+            p.startswith(path_with_slash) for p in self.include_prefixes
+        )
+
+    def should_check_directory(self, directory_path):
+        return (
+            self.should_include(directory_path) or
+            self.has_child_exceptions(directory_path)
+        )
+
+
+def _compile_patterns(patterns):
+    """
+    Translates patterns the way match_path does, and groups them by the
+    number of path components they are matched against (None standing for the
+    whole path, for patterns containing "**").
+    """
+    groups = {}
+    for pattern in patterns:
+        pattern = pattern.rstrip('/' + os.path.sep)
+        if pattern:
+            pattern = os.path.relpath(pattern)
+
+        components = pattern.split(os.path.sep)
+        if len(components) == 1 and IS_WINDOWS_PLATFORM:
+            components = pattern.split('/')
+
+        depth = None if '**' in pattern else len(components)
+        # translate() only ever emits this one group; keep the combined
+        # expression free of capturing groups.
+        regex = translate('/'.join(components).lower()).replace(
+            '(.*/)?', '(?:.*/)?'
+        )
+        groups.setdefault(depth, []).append('(?:{0})'.format(regex))
+
+    return [
+        (depth, re.compile('|'.join(regexes)))
+        for depth, regexes in groups.items()
+    ]
+
+
+def _match_groups(groups, components):
+    for depth, regex in groups:
+        if depth is None:
+            name = '/'.join(components)
+        else:
+            name = '/'.join(components[:depth])
+        if regex.match(name) is not None:
+            return True
+    return False
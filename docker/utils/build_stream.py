@@ -0,0 +1,300 @@
+import re
+import time
+
+import six
+
+from .json_stream import decoded_json_stream
+
+STEP = 'step'
+CACHE = 'cache'
+CONTAINER = 'container'
+LAYER = 'layer'
+REMOVED = 'removed'
+OUTPUT = 'output'
+BUILT = 'built'
+TAGGED = 'tagged'
+ERROR = 'error'
+
+_patterns = [
+    (STEP, re.compile(r'^Step (\d+)(?:/(\d+))? ?: ?(.*)$')),
+    (CACHE, re.compile(r'^ ---> Using cache$')),
+    (CONTAINER, re.compile(r'^ ---> Running in ([0-9a-f]+)$')),
+    (LAYER, re.compile(r'^ ---> ([0-9a-f]+)$')),
+    (REMOVED, re.compile(r'^Removing intermediate container ([0-9a-f]+)$')),
+    (BUILT, re.compile(r'^Successfully built ([0-9a-f]+)$')),
+    (TAGGED, re.compile(r'^Successfully tagged (.+)$')),
+]
+
+
+class BuildEvent(object):
+    """
+    Something that happened during a build.
+
+    Attributes:
+        type (str): One of ``step``, ``cache``, ``container``, ``layer``,
+            ``removed``, ``output``, ``built``, ``tagged`` or ``error``.
+        step (:py:class:`BuildStep`): The step being run, if any.
+        text (str): The output line (or error message) of the event.
+        value (str): What the event is about: the instruction of a step, the
+            ID of a container or an image, or the name of a tag.
+        time (float): When the event was received.
+        duration (float): The time elapsed since the previous event.
+    """
+
+    def __init__(self, type, step, text, value, time, duration):
+        self.type = type
+        self.step = step
+        self.text = text
+        self.value = value
+        self.time = time
+        self.duration = duration
+
+    def __repr__(self):
+        return '<BuildEvent: {0} {1!r} ({2:.3f}s)>'.format(
+            self.type, self.value, self.duration
+        )
+
+
+class BuildStep(object):
+    """
+    A step of a build.
+
+    Attributes:
+        number (int): The number of the step, starting at 1.
+        total (int): The number of steps of the build, if the daemon says.
+        instruction (str): The Dockerfile instruction of the step.
+        cached (bool): Whether the step was served from the build cache.
+        container (str): The ID of the intermediate container of the step.
+        image (str): The ID of the image the step produced.
+        output_lines (int): The number of lines the step printed.
+        started (float): When the step started.
+        finished (float): When the step finished, or None while it runs.
+    """
+
+    def __init__(self, number, total, instruction, started):
+        self.number = number
+        self.total = total
+        self.instruction = instruction
+        self.cached = False
+        self.container = None
+        self.image = None
+        self.output_lines = 0
+        self.started = started
+        self.finished = None
+
+    @property
+    def duration(self):
+        """
+        The wall-clock time the step took, or None while it runs.
+        """
+        if self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def __repr__(self):
+        return '<BuildStep: {0} {1}>'.format(self.number, self.instruction)
+
+
+class BuildAnalyzer(object):
+    """
+    Parses the output of a build into :py:class:`BuildEvent` and
+    :py:class:`BuildStep` objects, and times them.
+
+    Args:
+        clock (callable): Returns the current time. Defaults to
+            ``time.time``.
+
+    Example:
+
+        >>> analyzer = BuildAnalyzer()
+        >>> for event in analyzer.analyze(client.api.build(path='.')):
+        ...     pass
+        >>> print(analyzer.report())
+        Built 0123456789ab in 74.2s: 9 steps, 6 cached
+        Slowest steps:
+          4/9   61.0s  RUN make
+          ...
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or time.time
+        self.steps = []
+        self.image_id = None
+        self.tags = []
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._last = None
+        self._partial = six.text_type('')
+
+    @property
+    def step(self):
+        """
+        The step being run, or the last one.
+        """
+        return self.steps[-1] if self.steps else None
+
+    @property
+    def duration(self):
+        """
+        The wall-clock time from the first event to the end of the build.
+        """
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def analyze(self, stream):
+        """
+        Analyze a build output stream, as returned by
+        :py:meth:`~docker.api.build.BuildApiMixin.build`, either decoded or
+        not.
+
+        Returns:
+            A generator of :py:class:`BuildEvent` objects.
+        """
+        for chunk in decoded_json_stream(stream):
+            for event in self.feed(chunk):
+                yield event
+        for event in self.close():
+            yield event
+
+    def feed(self, chunk):
+        """
+        Analyze one decoded chunk of build output.
+
+        Returns:
+            (list): The :py:class:`BuildEvent` objects the chunk completes.
+        """
+        now = self.clock()
+        if self.started is None:
+            self.started = now
+        events = []
+        text = chunk.get('stream')
+        if text:
+            lines = (self._partial + text).split('\n')
+            self._partial = lines.pop()
+            for line in lines:
+                event = self._parse(line, now)
+                if event is not None:
+                    events.append(event)
+        if 'error' in chunk:
+            events.extend(self._flush(now))
+            self.error = chunk['error']
+            events.append(self._event(ERROR, self.error, self.error, now))
+            self._finish(now)
+        return events
+
+    def close(self):
+        """
+        Mark the end of the build output.
+
+        Returns:
+            (list): The :py:class:`BuildEvent` of the last, unterminated line
+            of output, if there is one.
+        """
+        now = self.clock()
+        if self.started is None:
+            self.started = now
+        events = self._flush(now)
+        self._finish(now)
+        return events
+
+    def slowest(self, count=5):
+        """
+        The ``count`` finished steps that took the longest.
+        """
+        steps = [step for step in self.steps if step.duration is not None]
+        steps.sort(key=lambda step: step.duration, reverse=True)
+        return steps[:count]
+
+    def report(self, count=5):
+        """
+        A summary of the build, and of its ``count`` slowest steps.
+
+        Returns:
+            (str): The report.
+        """
+        if self.error is not None:
+            outcome = 'Failed'
+        elif self.image_id is not None:
+            outcome = 'Built {0}'.format(self.image_id)
+        else:
+            outcome = 'Ran'
+        lines = ['{0} in {1:.1f}s: {2} steps, {3} cached'.format(
+            outcome, self.duration or 0, len(self.steps),
+            len([step for step in self.steps if step.cached])
+        )]
+        if self.error is not None:
+            lines.append('Error: {0}'.format(self.error.strip()))
+        slowest = self.slowest(count)
+        if slowest:
+            lines.append('Slowest steps:')
+        for step in slowest:
+            number = str(step.number)
+            if step.total:
+                number += '/{0}'.format(step.total)
+            lines.append('  {0:<5} {1:>6.1f}s  {2}{3}'.format(
+                number, step.duration, step.instruction,
+                ' (cached)' if step.cached else ''
+            ))
+        return '\n'.join(lines)
+
+    def _flush(self, now):
+        event = None
+        if self._partial:
+            event = self._parse(self._partial, now)
+            self._partial = six.text_type('')
+        return [event] if event is not None else []
+
+    def _parse(self, line, now):
+        line = line.rstrip('\r')
+        if not line.strip():
+            return None
+        for type, pattern in _patterns:
+            match = pattern.match(line)
+            if match is not None:
+                break
+        else:
+            if self.step is not None and self.step.finished is None:
+                self.step.output_lines += 1
+            return self._event(OUTPUT, line, None, now)
+
+        step = self.step
+        if type == STEP:
+            if step is not None and step.finished is None:
+                step.finished = now
+            self.steps.append(BuildStep(
+                int(match.group(1)),
+                int(match.group(2)) if match.group(2) else None,
+                match.group(3), now
+            ))
+            return self._event(STEP, line, match.group(3), now)
+
+        value = match.group(1) if match.groups() else None
+        if step is not None and step.finished is None:
+            if type == CACHE:
+                step.cached = True
+            elif type == CONTAINER:
+                step.container = value
+            elif type == LAYER:
+                step.image = value
+        if type == BUILT:
+            self.image_id = value
+            self._finish(now)
+        elif type == TAGGED:
+            self.tags.append(value)
+        return self._event(type, line, value, now)
+
+    def _event(self, type, text, value, now):
+        last, self._last = self._last, now
+        return BuildEvent(
+            type, self.step, text, value, now,
+            now - (self.started if last is None else last)
+        )
+
+    def _finish(self, now):
+        step = self.step
+        if step is not None and step.finished is None:
+            step.finished = now
+        if self.finished is None:
+            self.finished = now
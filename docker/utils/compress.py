@@ -0,0 +1,145 @@
+import collections
+import multiprocessing
+import zlib
+
+from .pool import get_pool
+
+BLOCK_SIZE = 1024 * 1024
+
+
+def gzip_member(data, compresslevel=9):
+    """
+    Compress ``data`` into a complete gzip member. Concatenated members form
+    a valid gzip stream.
+    """
+    compressor = zlib.compressobj(
+        compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+    )
+    return compressor.compress(data) + compressor.flush()
+
+
+class ParallelGzipWriter(object):
+    """
+    A write-only file object that compresses what is written to it with
+    gzip, using all the available cores.
+
+    The data is split into blocks which are compressed independently, by a
+    shared pool of threads (zlib releases the GIL), and written out in order
+    as the members of a multi-member gzip stream, which any gzip reader
+    accepts. Closing the writer doesn't close ``fileobj``.
+
+    Args:
+        fileobj: The file object the compressed data is written to.
+        compresslevel (int): The zlib compression level.
+        block_size (int): The size of the blocks compressed independently.
+    """
+
+    def __init__(self, fileobj, compresslevel=9, block_size=BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.compresslevel = compresslevel
+        self.block_size = block_size
+        self.closed = False
+        self._buf = []
+        self._buffered = 0
+        self._offset = 0
+        self._written = False
+        self._pending = collections.deque()
+        self._max_pending = 2 * multiprocessing.cpu_count()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError('write to closed file')
+        if not data:
+            return
+        self._buf.append(data)
+        self._buffered += len(data)
+        self._offset += len(data)
+        if self._buffered < self.block_size:
+            return
+
+        data = b''.join(self._buf)
+        start = 0
+        while len(data) - start >= self.block_size:
+            self._submit(data[start:start + self.block_size])
+            start += self.block_size
+        self._buf = [data[start:]] if start < len(data) else []
+        self._buffered = len(data) - start
+
+    def tell(self):
+        return self._offset
+
+    def close(self):
+        if self.closed:
+            return
+        data = b''.join(self._buf)
+        self._buf = []
+        self._buffered = 0
+        if not self._pending:
+            # Not worth a round trip to the pool
+            if data or not self._written:
+                self._output(gzip_member(data, self.compresslevel))
+        elif data:
+            self._submit(data)
+        self._drain(0)
+        self.closed = True
+
+    def _submit(self, block):
+        self._pending.append(
+            get_pool(multiprocessing.cpu_count()).apply_async(
+                gzip_member, (block, self.compresslevel)
+            )
+        )
+        self._drain(self._max_pending)
+
+    def _drain(self, max_pending):
+        while self._pending and (
+                len(self._pending) > max_pending or self._pending[0].ready()):
+            self._output(self._pending.popleft().get())
+
+    def _output(self, data):
+        self._written = True
+        self.fileobj.write(data)
+
+
+class _Chunks(object):
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def gzip_stream(chunks, compresslevel=9, block_size=BLOCK_SIZE):
+    """
+    Compress a stream of byte strings with a :py:class:`ParallelGzipWriter`.
+
+    Args:
+        chunks: An iterable of byte strings.
+        compresslevel (int): The zlib compression level.
+        block_size (int): The size of the blocks compressed independently.
+
+    Returns:
+        A generator of the compressed data, generated as soon as each block
+        is compressed.
+    """
+    out = _Chunks()
+    writer = ParallelGzipWriter(out, compresslevel, block_size)
+    for chunk in chunks:
+        writer.write(chunk)
+        if out.chunks:
+            yield out.take()
+    writer.close()
+    data = out.take()
+    if data:
+        yield data
@@ -0,0 +1,398 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+
+from .. import constants
+from .build import walk_context
+from .compress import ParallelGzipWriter, gzip_member
+from .utils import (
+    get_tarinfo, normalize_tarinfo, sort_archive_paths, tar_options
+)
+
+READ_SIZE = 65536
+
+
+class ContextCache(object):
+    """
+    A persistent cache of build context archives.
+
+    Each entry of an archive (its tar header, data and padding) is stored once
+    in the cache directory, under the SHA-256 digest of its contents. The
+    entries of every archived directory are indexed by path, along with the
+    modification time, size, inode and ownership they had when they were
+    archived, so that the next archive of the same directory only reads the
+    files that changed, and splices the cached entries for everything else.
+
+    Args:
+        directory (str): The directory the cache is kept in. It is created if
+            it doesn't exist.
+
+    Example:
+
+        >>> cache = ContextCache('/var/cache/docker-context')
+        >>> context = cache.tar('.', gzip=True)
+        >>> context.digest
+        'sha256:8a3f...'
+        >>> client.build(path='.', gzip=True, context_cache=cache)
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.segments_dir = os.path.join(directory, 'segments')
+        self.index_dir = os.path.join(directory, 'index')
+        for d in (self.segments_dir, self.index_dir):
+            if not os.path.isdir(d):
+                os.makedirs(d)
+
+    def tar(self, path, exclude=None, dockerfile=None, gzip=False,
+            reproducible=False):
+        """
+        Archive a build context, like :py:func:`docker.utils.tar`.
+
+        Args:
+            path (str): The directory to archive.
+            exclude (:py:class:`list`): ``.dockerignore`` patterns.
+            dockerfile (str): The path of the Dockerfile within ``path``.
+            gzip (bool): Compress the archive with gzip.
+            reproducible (bool): Normalize the archive entries, see
+                :py:func:`docker.utils.utils.normalize_tarinfo`.
+
+        Returns:
+            (:py:class:`CachedContext`): The archive.
+        """
+        root = os.path.abspath(path)
+        stats = walk_context(root, exclude or [], dockerfile=dockerfile)
+        return self.archive(
+            root, sorted(stats), gzip=gzip, reproducible=reproducible,
+            stats=stats
+        )
+
+    def archive(self, root, files, gzip=False, reproducible=False,
+                stats=None):
+        """
+        Archive the given paths, relative to ``root``, like
+        :py:func:`docker.utils.create_archive`. ``stats`` can hold the
+        ``os.lstat()`` results of the paths, which are then not stat'ed
+        again.
+
+        Returns:
+            (:py:class:`CachedContext`): The archive.
+        """
+        root = os.path.abspath(root)
+        index_file = os.path.join(
+            self.index_dir,
+            hashlib.sha256(root.encode('utf-8')).hexdigest() + '.json'
+        )
+        index = self._load_index(index_file)
+        stats = stats or {}
+        names = {}
+        entries = {}
+        digests = []
+        size = 0
+        # Only used for its gettarinfo() and settings, and to keep track of
+        # hard links
+        t = tarfile.open(
+            mode='w', fileobj=io.BytesIO(), **tar_options(reproducible)
+        )
+        if reproducible:
+            files = sort_archive_paths(files)
+
+        for path in files:
+            full_path = os.path.join(root, path)
+            st = stats.get(path) or os.lstat(full_path)
+            if not _is_archived(st.st_mode):
+                # Sockets, see create_archive
+                continue
+            key = _entry_key(t, path, full_path, st) + [reproducible]
+            entry = index.get(path)
+            if (entry is None or entry['key'] != key or
+                    not os.path.exists(
+                        self._segment_path(entry['digest'], gzip))):
+                digest, entry_size = self._write_segment(
+                    get_tarinfo(t, root, path, {path: st}, names),
+                    t, full_path, gzip, reproducible
+                )
+                entry = {'key': key, 'digest': digest, 'size': entry_size}
+            entries[path] = entry
+            digests.append(entry['digest'])
+            size += entry['size']
+
+        if entries != index:
+            self._save_index(index_file, entries)
+        return CachedContext(
+            [self._segment_path(d, gzip) for d in digests], digests, size,
+            gzip
+        )
+
+    def prune(self):
+        """
+        Remove the cached entries that aren't part of the last archive of any
+        directory.
+        """
+        used = set()
+        for name in os.listdir(self.index_dir):
+            index = self._load_index(os.path.join(self.index_dir, name))
+            used.update(entry['digest'] for entry in index.values())
+        for name in os.listdir(self.segments_dir):
+            if name.split('.')[0] not in used:
+                try:
+                    os.remove(os.path.join(self.segments_dir, name))
+                except OSError:
+                    pass
+
+    def _segment_path(self, digest, gzip):
+        return os.path.join(
+            self.segments_dir, digest + ('.gz' if gzip else '')
+        )
+
+    def _load_index(self, index_file):
+        try:
+            with open(index_file, 'r') as f:
+                return json.load(f)['entries']
+        except (IOError, OSError, ValueError, KeyError):
+            return {}
+
+    def _save_index(self, index_file, entries):
+        self._write_atomic(
+            index_file,
+            json.dumps({'entries': entries}).encode('utf-8')
+        )
+
+    def _write_atomic(self, filename, data):
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            _replace(tmp, filename)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    def _write_segment(self, i, t, full_path, gzip, reproducible):
+        if constants.IS_WINDOWS_PLATFORM:
+            i.mode = i.mode & 0o755 | 0o111
+        if reproducible:
+            normalize_tarinfo(i)
+
+        sha = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.segments_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                out = ParallelGzipWriter(f) if gzip else f
+
+                def write(data):
+                    sha.update(data)
+                    out.write(data)
+
+                header = i.tobuf(t.format, t.encoding, t.errors)
+                write(header)
+                size = len(header)
+                if i.isreg() and i.size:
+                    remaining = i.size
+                    with open(full_path, 'rb') as src:
+                        while remaining:
+                            data = src.read(min(READ_SIZE, remaining))
+                            if not data:
+                                raise IOError('unexpected end of data')
+                            remaining -= len(data)
+                            write(data)
+                    rest = i.size % tarfile.BLOCKSIZE
+                    if rest:
+                        write(tarfile.NUL * (tarfile.BLOCKSIZE - rest))
+                    size += i.size + (-i.size % tarfile.BLOCKSIZE)
+                if gzip:
+                    out.close()
+
+            digest = sha.hexdigest()
+            segment = self._segment_path(digest, gzip)
+            if os.path.exists(segment):
+                os.remove(tmp)
+            else:
+                _replace(tmp, segment)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return digest, size
+
+
+class CachedContext(object):
+    """
+    A build context archive made of entries kept in a
+    :py:class:`ContextCache`. Iterating over it generates the archive.
+    """
+
+    def __init__(self, segments, digests, size, gzip):
+        self.segments = segments
+        self.gzip = gzip
+        self.size = size
+        sha = hashlib.sha256()
+        for digest in digests:
+            sha.update(digest.encode('ascii') + b'\n')
+        self._digest = sha.hexdigest()
+
+    @property
+    def digest(self):
+        """
+        A digest of the archive's entries, which only changes when the files
+        in the context do. It doesn't depend on the compression.
+        """
+        return 'sha256:' + self._digest
+
+    def __iter__(self):
+        for segment in self.segments:
+            with open(segment, 'rb') as f:
+                while True:
+                    data = f.read(READ_SIZE)
+                    if not data:
+                        break
+                    yield data
+
+        end = tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+        rest = (self.size + len(end)) % tarfile.RECORDSIZE
+        if rest:
+            end += tarfile.NUL * (tarfile.RECORDSIZE - rest)
+        if self.gzip:
+            end = gzip_member(end)
+        yield end
+
+    def close(self):
+        pass
+
+
+class SharedBuffer(object):
+    """
+    A read-only, memory-mapped copy of a build context, which several builds
+    can upload at the same time. Each of them reads it through its own
+    :py:meth:`reader`.
+
+    Args:
+        source: The context: a file object, which is mapped as a whole if it
+            is backed by a file, and copied from its current position
+            otherwise, or an iterable of byte strings, like a
+            :py:class:`CachedContext`.
+    """
+
+    def __init__(self, source):
+        self._file = None
+        fileno = None
+        if hasattr(source, 'read'):
+            try:
+                fileno = source.fileno()
+                if hasattr(source, 'flush'):
+                    source.flush()
+            except (AttributeError, IOError, OSError, ValueError):
+                fileno = None
+        if fileno is None:
+            self._file = tempfile.TemporaryFile()
+            if hasattr(source, 'read'):
+                shutil.copyfileobj(source, self._file, READ_SIZE)
+            else:
+                for chunk in source:
+                    self._file.write(chunk)
+            self._file.flush()
+            fileno = self._file.fileno()
+        self.size = os.fstat(fileno).st_size
+        # Empty files can't be mapped
+        self._map = mmap.mmap(
+            fileno, 0, access=mmap.ACCESS_READ
+        ) if self.size else b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def reader(self):
+        """
+        A new file object reading the buffer from the start.
+        """
+        return _BufferReader(self._map, self.size)
+
+    def close(self):
+        if self.size:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+
+class _BufferReader(object):
+    def __init__(self, buf, size):
+        self._buf = buf
+        self._size = size
+        self._pos = 0
+
+    def __len__(self):
+        return self._size
+
+    def read(self, size=-1):
+        start = self._pos
+        if size is None or size < 0:
+            end = self._size
+        else:
+            end = min(start + size, self._size)
+        if end <= start:
+            return b''
+        self._pos = end
+        return self._buf[start:end]
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self._size
+        if offset < 0:
+            raise ValueError('negative seek position {0}'.format(offset))
+        self._pos = offset
+        return self._pos
+
+    def close(self):
+        pass
+
+
+def _is_archived(mode):
+    return (
+        stat.S_ISREG(mode) or stat.S_ISDIR(mode) or stat.S_ISLNK(mode) or
+        stat.S_ISFIFO(mode) or stat.S_ISCHR(mode) or stat.S_ISBLK(mode)
+    )
+
+
+def _entry_key(t, path, full_path, st):
+    """
+    Everything about a file that its archive entry depends on, apart from
+    its contents.
+    """
+    link = None
+    if stat.S_ISREG(st.st_mode) and st.st_nlink > 1:
+        # Same bookkeeping as TarFile.gettarinfo(), which archives the later
+        # paths of a hard link as links to the first one.
+        link = t.inodes.setdefault((st.st_ino, st.st_dev), path)
+        if link == path:
+            link = None
+    elif stat.S_ISLNK(st.st_mode):
+        link = os.readlink(full_path)
+    mtime = getattr(st, 'st_mtime_ns', None) or repr(st.st_mtime)
+    return [
+        mtime, st.st_size, st.st_ino, st.st_mode, st.st_uid, st.st_gid, link
+    ]
+
+
+def _replace(src, dst):
+    try:
+        os.rename(src, dst)
+    except OSError:
+        # Windows doesn't replace existing files
+        if not os.path.exists(dst):
+            raise
+        os.remove(dst)
+        os.rename(src, dst)
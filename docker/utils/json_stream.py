@@ -3,6 +3,7 @@ from __future__ import unicode_literals
 
 import json
 import json.decoder
+import re
 
 import six
 
@@ -11,6 +12,13 @@ from ..errors import StreamParseError
 
 json_decoder = json.JSONDecoder()
 
+_non_whitespace = re.compile(b'[^ \t\n\r]')
+_escaped_byte = re.compile(u'[\udc80-\udcff]')
+
+# Text used to locate the end of objects that are not newline-delimited must
+# map back to exact byte offsets, including around invalid or truncated UTF-8.
+_scan_errors = 'replace' if six.PY2 else 'surrogateescape'
+
 
 def stream_as_text(stream):
     """
@@ -38,12 +46,145 @@ def json_splitter(buffer):
         return None
 
 
+class JSONStreamDecoder(object):
+    """Incrementally decodes a stream of JSON objects fed as chunks of bytes
+    or text.
+
+    Newline-delimited objects are decoded one line at a time. Objects that
+    are not newline-delimited, such as several objects on a single line, are
+    located with ``raw_decode``. Consumed data is dropped from the front of
+    the internal buffer, so the cost of each chunk is proportional to its own
+    size rather than to the amount of pending data.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        # How much of the start of the buffer is known to hold no newline
+        self._scanned = 0
+
+    def feed(self, data):
+        """Add a chunk of data to the buffer and return a list of the objects
+        it completes."""
+        if isinstance(data, six.text_type):
+            data = data.encode('utf-8')
+        self._buffer += data
+        return self._decode()
+
+    def close(self):
+        """Return a list of the objects left in the buffer.
+
+        Raises:
+            :py:class:`docker.errors.StreamParseError`
+                If the remaining data isn't valid JSON.
+        """
+        objects = self._decode(final=True)
+        buf = self._buffer
+        self._buffer = bytearray()
+        self._scanned = 0
+        if _non_whitespace.search(buf) is not None:
+            try:
+                objects.append(json_decoder.decode(
+                    buf.decode('utf-8', 'replace')
+                ))
+            except Exception as e:
+                raise StreamParseError(e)
+        return objects
+
+    def _decode(self, final=False):
+        buf = self._buffer
+        objects = []
+        pos = 0
+        while True:
+            eol = buf.find(b'\n', max(pos, self._scanned))
+            if eol >= 0:
+                try:
+                    objects.append(json_decoder.decode(
+                        buf[pos:eol].decode('utf-8', 'replace')
+                    ))
+                    pos = eol + 1
+                    continue
+                except ValueError:
+                    pass
+
+            match = _non_whitespace.search(buf, pos)
+            if match is None:
+                pos = len(buf)
+                break
+            pos = match.start()
+            if 0 <= eol < pos:
+                # Only whitespace was left on the current line
+                continue
+
+            result = None
+            if eol >= 0:
+                # Several objects on one line
+                result = self._raw_decode(pos, eol)
+            if result is None and (final or self._may_end_object()):
+                result = self._raw_decode(pos, len(buf))
+            if result is None:
+                break
+            obj, pos = result
+            objects.append(obj)
+
+        # A partial line left in the buffer isn't searched for a newline
+        # again when more data is fed
+        self._scanned = len(buf) - pos if eol < 0 else 0
+        del buf[:pos]
+        return objects
+
+    def _may_end_object(self):
+        # Partial lines are only worth scanning once they end the way an
+        # object or array does.
+        buf = self._buffer
+        end = len(buf)
+        while end > 0 and buf[end - 1] in (0x20, 0x09, 0x0a, 0x0d):
+            end -= 1
+        return end > 0 and buf[end - 1] in (0x7d, 0x5d)
+
+    def _raw_decode(self, pos, end):
+        buf = self._buffer
+        text = buf[pos:end].decode('utf-8', _scan_errors)
+        try:
+            obj, index = json_decoder.raw_decode(text)
+        except ValueError:
+            return None
+        consumed = text[:index]
+        end = pos + len(consumed.encode('utf-8', _scan_errors))
+        if _escaped_byte.search(consumed):
+            obj = json_decoder.decode(buf[pos:end].decode('utf-8', 'replace'))
+        return obj, end
+
+
 def json_stream(stream):
     """Given a stream of text, return a stream of json objects.
     This handles streams which are inconsistently buffered (some entries may
     be newline delimited, and others are not).
     """
-    return split_buffer(stream, json_splitter, json_decoder.decode)
+    decoder = JSONStreamDecoder()
+    for data in stream:
+        for obj in decoder.feed(data):
+            yield obj
+    for obj in decoder.close():
+        yield obj
+
+
+def decoded_json_stream(stream):
+    """Given a stream of json objects, either decoded already or as text or
+    bytes, return a stream of json objects.
+    """
+    stream = iter(stream)
+    for item in stream:
+        if isinstance(item, dict):
+            yield item
+            continue
+        for obj in json_stream(_prepend(item, stream)):
+            yield obj
+
+
+def _prepend(first, iterator):
+    yield first
+    for item in iterator:
+        yield item
 
 
 def line_splitter(buffer, separator=u'\n'):
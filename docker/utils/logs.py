@@ -0,0 +1,294 @@
+import errno
+import ssl
+import struct
+
+import six
+
+from .. import errors
+from ..constants import STREAM_HEADER_SIZE_BYTES, STREAM_READ_SIZE
+from .socket import STDERR, STDOUT, ChunkDecoder
+from .utils import datetime_to_timestamp
+
+try:
+    import selectors
+except ImportError:  # Python < 3.4
+    selectors = None
+
+
+# The most reads of read_size bytes done for a container in a poll(), so
+# that a container logging faster than its logs are read doesn't starve the
+# others. The rest is read once the socket is reported ready again.
+MAX_READS = 4
+
+_would_block_errors = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+_ssl_would_block = getattr(ssl, 'SSLWantReadError', ())
+
+
+class LogMultiplexer(object):
+    """
+    Follows the logs of many containers from a single thread.
+
+    Each container's log stream is read from its own connection, and all the
+    connections are watched with a single ``selectors`` loop. Containers can
+    be added and removed at any time, including from inside the loop.
+
+    Args:
+        client (:py:class:`~docker.api.client.APIClient` or
+            :py:class:`~docker.client.DockerClient`): The client to use.
+        stdout (bool): Follow ``STDOUT``. Default: ``True``
+        stderr (bool): Follow ``STDERR``. Default: ``True``
+        timestamps (bool): Show timestamps. Default: ``False``
+        tail (str or int): Output specified number of lines at the end of
+            logs before following. Either an integer of number of lines or
+            the string ``all``. Default ``all``
+        since (datetime or int): Show logs since a given datetime or integer
+            epoch (in seconds)
+
+    Example:
+
+        >>> mux = LogMultiplexer(client, tail=0)
+        >>> for container in client.containers(quiet=True):
+        ...     mux.add(container)
+        >>> for container_id, stream, line in mux:
+        ...     print(container_id[:12], stream, line)
+    """
+
+    def __init__(self, client, stdout=True, stderr=True, timestamps=False,
+                 tail='all', since=None, read_size=STREAM_READ_SIZE):
+        if selectors is None:
+            raise errors.DockerException(
+                'LogMultiplexer requires the selectors module (Python 3.4+)'
+            )
+        self.client = getattr(client, 'api', client)
+        self.read_size = read_size
+        self._params = {
+            'stdout': stdout and 1 or 0,
+            'stderr': stderr and 1 or 0,
+            'timestamps': timestamps and 1 or 0,
+            'follow': 1,
+            'tail': tail,
+        }
+        if since is not None:
+            if not isinstance(since, int):
+                since = datetime_to_timestamp(since)
+            self._params['since'] = since
+        self._selector = selectors.DefaultSelector()
+        self._followers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        while self._followers:
+            for record in self.poll():
+                yield record
+
+    @property
+    def containers(self):
+        """
+        The IDs of the containers being followed.
+        """
+        return list(self._followers)
+
+    def add(self, container):
+        """
+        Start following the logs of a container.
+
+        Args:
+            container (str): The container ID or name
+
+        Returns:
+            (str): The full ID of the container.
+
+        Raises:
+            :py:class:`docker.errors.APIError`
+                If the server returns an error.
+        """
+        info = self.client.inspect_container(container)
+        container_id = info['Id']
+        if container_id in self._followers:
+            return container_id
+
+        response = self.client._get(
+            self.client._url('/containers/{0}/logs', container_id),
+            params=self._params, stream=True
+        )
+        # 404s for unknown containers, and 501s for logging drivers that
+        # can't be read, aren't log streams.
+        self.client._raise_for_status(response)
+        sock = self.client._get_raw_response_socket(response)
+        follower = _LogFollower(
+            container_id, response, sock, info['Config']['Tty'],
+            self.read_size
+        )
+        self._followers[container_id] = follower
+        self._selector.register(
+            follower.sock, selectors.EVENT_READ, follower
+        )
+        return container_id
+
+    def remove(self, container):
+        """
+        Stop following the logs of a container.
+
+        Args:
+            container (str): The container ID, as returned by :py:meth:`add`
+        """
+        follower = self._followers.pop(container, None)
+        if follower is not None:
+            self._selector.unregister(follower.sock)
+            follower.close()
+
+    def poll(self, timeout=None):
+        """
+        Wait for log output from any of the followed containers.
+
+        Args:
+            timeout (float): How long to wait, in seconds. Waits until data
+                arrives by default.
+
+        Returns:
+            (list): A list of ``(container_id, stream, line)`` tuples, where
+            ``stream`` is ``docker.utils.socket.STDOUT`` or ``STDERR`` and
+            ``line`` is the line's bytes without the trailing newline. Lines
+            of containers whose logs ended are flushed, and the containers
+            are removed.
+        """
+        records = []
+        pending = [
+            f for f in self._followers.values() if f.has_buffered_data()
+        ]
+        if pending:
+            timeout = 0
+        ready = [key.data for key, _ in self._selector.select(timeout)]
+        for follower in set(pending + ready):
+            if follower.container_id not in self._followers:
+                continue
+            records.extend(follower.read())
+            if follower.eof:
+                self.remove(follower.container_id)
+        return records
+
+    def close(self):
+        """
+        Stop following all containers.
+        """
+        for container_id in list(self._followers):
+            self.remove(container_id)
+        self._selector.close()
+
+
+class _LogFollower(object):
+    def __init__(self, container_id, response, sock, tty, read_size):
+        self.container_id = container_id
+        self.response = response
+        self.sock = sock
+        self.read_size = read_size
+        self.eof = False
+        self._recv = getattr(sock, '_sock', sock).recv
+        self._lines = {STDOUT: bytearray(), STDERR: bytearray()}
+        self._frames = None if tty else bytearray()
+        self._dechunker = (
+            ChunkDecoder() if response.raw._fp.chunked else None
+        )
+        self._buffered = b''
+
+        self._set_nonblocking()
+        # The HTTP library may already have read part of the body along with
+        # the headers; that data will never make the socket readable again.
+        fp = getattr(response.raw._fp, 'fp', None)
+        if hasattr(fp, 'read1'):
+            self._buffered = self._drain(fp)
+
+    def _set_nonblocking(self):
+        for s in (self.sock, getattr(self.sock, '_sock', None)):
+            if hasattr(s, 'setblocking'):
+                s.setblocking(False)
+
+    def _drain(self, fp):
+        # read1() returns at most read_size bytes of the buffer at a time.
+        # Once the buffer is empty it reads the socket, which is
+        # non-blocking by now.
+        data = []
+        while True:
+            try:
+                chunk = fp.read1(self.read_size)
+            except _ssl_would_block:
+                break
+            except EnvironmentError as e:
+                if e.errno not in _would_block_errors:
+                    raise
+                break
+            if not chunk:
+                break
+            data.append(chunk)
+        return six.binary_type().join(data)
+
+    def has_buffered_data(self):
+        return bool(self._buffered)
+
+    def close(self):
+        self.response.close()
+
+    def read(self):
+        data = [self._buffered]
+        self._buffered = b''
+        for i in range(MAX_READS):
+            try:
+                chunk = self._recv(self.read_size)
+            except _ssl_would_block:
+                break
+            except EnvironmentError as e:
+                if e.errno not in _would_block_errors:
+                    raise
+                break
+            if not chunk:
+                self.eof = True
+                break
+            data.append(chunk)
+        return self._feed(six.binary_type().join(data))
+
+    def _feed(self, data):
+        if self._dechunker is not None:
+            data = self._dechunker.feed(data)
+            if self._dechunker.done:
+                self.eof = True
+        if self._frames is None:
+            self._lines[STDOUT] += data
+        else:
+            frames = self._frames
+            frames += data
+            pos = 0
+            while len(frames) - pos >= STREAM_HEADER_SIZE_BYTES:
+                stream_id, length = struct.unpack_from(
+                    '>BxxxL', frames, pos
+                )
+                start = pos + STREAM_HEADER_SIZE_BYTES
+                if len(frames) - start < length:
+                    break
+                stream = STDERR if stream_id == STDERR else STDOUT
+                self._lines[stream] += frames[start:start + length]
+                pos = start + length
+            del frames[:pos]
+
+        records = []
+        for stream, buf in self._lines.items():
+            start = 0
+            eol = buf.find(b'\n')
+            while eol >= 0:
+                records.append(
+                    (self.container_id, stream,
+                     six.binary_type(buf[start:eol]))
+                )
+                start = eol + 1
+                eol = buf.find(b'\n', start)
+            del buf[:start]
+            if self.eof and buf:
+                records.append(
+                    (self.container_id, stream, six.binary_type(buf))
+                )
+                del buf[:]
+        return records
@@ -0,0 +1,612 @@
+import calendar
+import fnmatch
+import logging
+import re
+import threading
+import time
+from email.utils import parsedate
+
+import six
+
+from .. import errors
+from ..constants import EVENT_STREAM_READ_SIZE
+from .utils import normalize_filters
+
+log = logging.getLogger(__name__)
+
+BUILTIN_NETWORKS = ('bridge', 'host', 'none')
+
+# Container actions that don't change anything in the container's summary
+IGNORED_CONTAINER_ACTIONS = (
+    'archive-path', 'attach', 'commit', 'copy', 'detach', 'exec_',
+    'export', 'extract-to-dir', 'resize', 'top',
+)
+
+# Actions of image events, for servers that don't send the events' Type
+IMAGE_ACTIONS = (
+    'delete', 'import', 'load', 'pull', 'push', 'save', 'tag', 'untag',
+)
+
+_exit_code = re.compile(r'^Exited \((-?\d+)\)')
+
+
+class StateMirror(object):
+    """
+    An in-memory mirror of the containers, images, networks and volumes on
+    the server, kept up to date with the event stream.
+
+    The mirror lists every resource type once, then follows
+    :py:meth:`~docker.api.daemon.DaemonApiMixin.events` from a background
+    thread and refreshes the resources the events are about. If the event
+    stream is interrupted, it reconnects from the time of the last event it
+    received, and the server replays the events it missed. The server only
+    keeps a bounded number of past events though: when the replay doesn't
+    start with the last event received, the outage is too long, or the
+    server could not be reached at all, everything is listed again.
+
+    Queries are answered from memory, and accept the same ``filters``
+    dictionaries as the corresponding list methods.
+
+    Args:
+        client (:py:class:`~docker.api.client.APIClient` or
+            :py:class:`~docker.client.DockerClient`): The client to use.
+        max_gap (int): Longest outage, in seconds, that is recovered from by
+            replaying events. Longer outages trigger a full resync.
+            Default: 60
+
+    Example:
+
+        >>> mirror = StateMirror(client)
+        >>> mirror.start()
+        >>> mirror.containers(filters={'status': 'running', 'label': 'app'})
+        [{'Id': '...', 'Names': ['/web'], 'State': 'running', ...}]
+        >>> mirror.stop()
+    """
+
+    def __init__(self, client, max_gap=60):
+        self.client = getattr(client, 'api', client)
+        self.max_gap = max_gap
+        self.since = None
+        # The time of the last event received, in nanoseconds
+        self._last_event = None
+        self._lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._response = None
+        self._indexes = {
+            'container': _Index('Id', _container_names),
+            'image': _Index('Id', _image_names),
+            'network': _Index('Id', _single_name),
+            'volume': _Index('Name', _single_name),
+        }
+
+    def start(self):
+        """
+        List all resources and start following events in a background
+        thread.
+        """
+        self.sync()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop following events.
+        """
+        self._stopped.set()
+        response = self._response
+        if response is not None:
+            response.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sync(self):
+        """
+        List all resources again and replace the mirror's content.
+        """
+        since = self._server_time() - 1
+        containers = self.client.containers(all=True)
+        images = self.client.images()
+        networks = self.client.networks()
+        volumes = self.client.volumes().get('Volumes') or []
+        with self._lock:
+            self._indexes['container'].replace(containers)
+            self._indexes['image'].replace(images)
+            self._indexes['network'].replace(networks)
+            self._indexes['volume'].replace(volumes)
+            self.since = since
+            self._last_event = None
+
+    def run(self):
+        """
+        Follow the event stream until :py:meth:`stop` is called. This is
+        what the thread started by :py:meth:`start` runs.
+        """
+        delay = 1
+        disconnected_at = None
+        needs_sync = False
+        while not self._stopped.is_set():
+            try:
+                if disconnected_at is not None and (
+                    needs_sync or time.time() - disconnected_at > self.max_gap
+                ):
+                    log.info('Resyncing after a gap in the event stream')
+                    self.sync()
+                needs_sync = False
+                response = self._open_events()
+            except Exception as e:
+                log.warning('Could not connect to the event stream: %s', e)
+                needs_sync = True
+                if disconnected_at is None:
+                    disconnected_at = time.time()
+            else:
+                disconnected_at = None
+                delay = 1
+                try:
+                    replay = self._last_event is not None
+                    for event in self.client._stream_helper(
+                            response, decode=True,
+                            read_size=EVENT_STREAM_READ_SIZE):
+                        if replay and self._missed_events(event):
+                            log.info('Resyncing after missed events')
+                            self.sync()
+                        replay = False
+                        self.process_event(event)
+                except Exception as e:
+                    if not self._stopped.is_set():
+                        log.warning('Event stream interrupted: %s', e)
+                finally:
+                    self._response = None
+                    response.close()
+                disconnected_at = time.time()
+            self._stopped.wait(delay)
+            delay = min(delay * 2, 30)
+
+    def process_event(self, event):
+        """
+        Update the mirror from an event, as returned by
+        :py:meth:`~docker.api.daemon.DaemonApiMixin.events` with
+        ``decode=True``.
+        """
+        action = event.get('Action', event.get('status')) or ''
+        resource_type = event.get(
+            'Type', 'image' if action in IMAGE_ACTIONS else 'container'
+        )
+        resource_id = event.get('Actor', {}).get('ID', event.get('id'))
+        if resource_type == 'container':
+            self._container_event(resource_id, action)
+        elif resource_type == 'image':
+            self._image_event(resource_id, action)
+        elif resource_type == 'network':
+            self._network_event(resource_id, action)
+        elif resource_type == 'volume':
+            self._volume_event(resource_id, action)
+        if event.get('time'):
+            with self._lock:
+                self.since = max(self.since or 0, event['time'])
+                self._last_event = max(
+                    self._last_event or 0, _event_time(event)
+                )
+
+    def containers(self, filters=None):
+        """
+        List the mirrored containers. Similar to
+        :py:meth:`~docker.api.container.ContainerApiMixin.containers` with
+        ``all=True``.
+
+        Args:
+            filters (dict): Supported filters are ``id``, ``name``,
+                ``status``, ``exited``, ``label``, ``ancestor``,
+                ``network``, ``before`` and ``since``.
+
+        Returns:
+            (list of dict): The containers' summaries.
+        """
+        return self._query('container', filters, _container_filters)
+
+    def images(self, filters=None):
+        """
+        List the mirrored images. Similar to
+        :py:meth:`~docker.api.image.ImageApiMixin.images`.
+
+        Args:
+            filters (dict): Supported filters are ``dangling``, ``label``,
+                ``reference``, ``before`` and ``since``.
+
+        Returns:
+            (list of dict): The images' summaries.
+        """
+        return self._query('image', filters, _image_filters)
+
+    def networks(self, filters=None):
+        """
+        List the mirrored networks. Similar to
+        :py:meth:`~docker.api.network.NetworkApiMixin.networks`.
+
+        Args:
+            filters (dict): Supported filters are ``id``, ``name``,
+                ``driver``, ``label``, ``scope`` and ``type``.
+
+        Returns:
+            (list of dict): The networks.
+        """
+        return self._query('network', filters, _network_filters)
+
+    def volumes(self, filters=None):
+        """
+        List the mirrored volumes. Similar to
+        :py:meth:`~docker.api.volume.VolumeApiMixin.volumes`.
+
+        Args:
+            filters (dict): Supported filters are ``name``, ``driver`` and
+                ``label``.
+
+        Returns:
+            (list of dict): The volumes.
+        """
+        return self._query('volume', filters, _volume_filters)
+
+    def get(self, resource_type, key):
+        """
+        Get a mirrored resource by ID, name or unique ID prefix.
+
+        Args:
+            resource_type (str): One of ``container``, ``image``,
+                ``network`` or ``volume``
+            key (str): The resource's ID, name, or a unique prefix of its ID
+
+        Returns:
+            (dict): The resource, or ``None`` if it isn't in the mirror.
+        """
+        with self._lock:
+            item = self._indexes[resource_type].get(key)
+            return dict(item) if item is not None else None
+
+    def _query(self, resource_type, filters, matchers):
+        filters = normalize_filters(filters or {})
+        for name in filters:
+            if name not in matchers:
+                raise errors.InvalidArgument(
+                    'Unsupported {0} filter: {1}'.format(resource_type, name)
+                )
+        with self._lock:
+            index = self._indexes[resource_type]
+            if 'label' in filters:
+                items = index.with_labels(filters['label'])
+            else:
+                items = index.items.values()
+            return [
+                dict(item) for item in items
+                if all(matchers[name](index, item, values)
+                       for name, values in six.iteritems(filters))
+            ]
+
+    def _missed_events(self, event):
+        # The replay starts from the last event received, unless the server
+        # dropped it from its buffer, in which case later ones may be lost
+        # too.
+        return event.get('time') and _event_time(event) > self._last_event
+
+    def _open_events(self):
+        response = self.client._get(
+            self.client._url('/events'), params={'since': self.since},
+            stream=True, timeout=None
+        )
+        self.client._raise_for_status(response)
+        self._response = response
+        if self._stopped.is_set():
+            response.close()
+        return response
+
+    def _server_time(self):
+        response = self.client._get(self.client._url('/_ping'))
+        date = parsedate(response.headers.get('Date', ''))
+        if date is None:
+            return int(time.time())
+        return calendar.timegm(date)
+
+    def _container_event(self, container_id, action):
+        index = self._indexes['container']
+        if action.startswith(IGNORED_CONTAINER_ACTIONS):
+            return
+        if action == 'destroy':
+            with self._lock:
+                index.discard(container_id)
+            return
+        found = [
+            c for c in self.client.containers(
+                all=True, filters={'id': container_id}
+            ) if c['Id'] == container_id
+        ]
+        with self._lock:
+            index.discard(container_id)
+            for container in found:
+                index.add(container)
+
+    def _image_event(self, key, action):
+        index = self._indexes['image']
+        if action in ('push', 'save'):
+            return
+        image = None
+        if action != 'delete':
+            try:
+                image = self.client.inspect_image(key)
+            except errors.NotFound:
+                pass
+        if image is None:
+            with self._lock:
+                item = index.get(key)
+                if item is not None:
+                    index.discard(item['Id'])
+            return
+
+        # Image events don't say which tags moved: take the image's tags
+        # from the inspection, and the rest of its summary from the mirror.
+        image_id = image['Id']
+        tags = image.get('RepoTags') or []
+        with self._lock:
+            summary = index.items.get(image_id)
+        if summary is None:
+            # A new image, which has to be listed to get its summary
+            filters = {'reference': tags[0]} if tags else {'dangling': True}
+            found = [
+                i for i in self.client.images(filters=filters)
+                if i['Id'] == image_id
+            ]
+            if not found:
+                self._list_images()
+                return
+            summary = found[0]
+        summary = dict(
+            summary, RepoTags=tags or ['<none>:<none>'],
+            RepoDigests=image.get('RepoDigests') or []
+        )
+        with self._lock:
+            # The tags were moved from the images which had them
+            for tag in tags:
+                other = index.get(tag)
+                if other is not None and other['Id'] != image_id:
+                    other_tags = [t for t in other['RepoTags'] if t != tag]
+                    index.add(dict(
+                        other, RepoTags=other_tags or ['<none>:<none>']
+                    ))
+            index.add(summary)
+
+    def _list_images(self):
+        # Build the index before taking the lock
+        index = _Index('Id', _image_names)
+        index.replace(self.client.images())
+        with self._lock:
+            self._indexes['image'] = index
+
+    def _network_event(self, network_id, action):
+        index = self._indexes['network']
+        found = []
+        if action != 'destroy':
+            found = [
+                n for n in self.client.networks(ids=[network_id])
+                if n['Id'] == network_id
+            ]
+        with self._lock:
+            index.discard(network_id)
+            for network in found:
+                index.add(network)
+
+    def _volume_event(self, name, action):
+        index = self._indexes['volume']
+        if action in ('mount', 'unmount'):
+            return
+        found = []
+        if action != 'destroy':
+            volumes = self.client.volumes(filters={'name': name})
+            found = [
+                v for v in volumes.get('Volumes') or [] if v['Name'] == name
+            ]
+        with self._lock:
+            index.discard(name)
+            for volume in found:
+                index.add(volume)
+
+
+class _Index(object):
+    def __init__(self, id_attribute, names):
+        self.id_attribute = id_attribute
+        self.names = names
+        self.items = {}
+        self._names = {}
+        self._labels = {}
+
+    def replace(self, items):
+        self.items = {}
+        self._names = {}
+        self._labels = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        item_id = item[self.id_attribute]
+        self.discard(item_id)
+        self.items[item_id] = item
+        for name in self.names(item):
+            self._names[name] = item_id
+        for key, value in six.iteritems(item.get('Labels') or {}):
+            self._labels.setdefault(key, {}).setdefault(
+                value, set()
+            ).add(item_id)
+
+    def discard(self, item_id):
+        item = self.items.pop(item_id, None)
+        if item is None:
+            return
+        for name in self.names(item):
+            if self._names.get(name) == item_id:
+                del self._names[name]
+        for key, value in six.iteritems(item.get('Labels') or {}):
+            ids = self._labels[key][value]
+            ids.discard(item_id)
+            if not ids:
+                del self._labels[key][value]
+            if not self._labels[key]:
+                del self._labels[key]
+
+    def get(self, key):
+        if key in self.items:
+            return self.items[key]
+        if key in self._names:
+            return self.items[self._names[key]]
+        matches = [
+            item for item_id, item in six.iteritems(self.items)
+            if item_id.startswith(key) or
+            item_id.startswith('sha256:' + key)
+        ]
+        if len(matches) == 1:
+            return matches[0]
+
+    def with_labels(self, labels):
+        ids = None
+        for label in labels:
+            key, sep, value = label.partition('=')
+            values = self._labels.get(key, {})
+            if sep:
+                matching = values.get(value, set())
+            else:
+                matching = set().union(*values.values())
+            ids = matching if ids is None else ids & matching
+        return [self.items[item_id] for item_id in ids or ()]
+
+
+def _event_time(event):
+    return event.get('timeNano') or event['time'] * 10 ** 9
+
+
+def _container_names(container):
+    return [name.lstrip('/') for name in container.get('Names') or []]
+
+
+def _image_names(image):
+    return [
+        tag for tag in image.get('RepoTags') or [] if tag != '<none>:<none>'
+    ]
+
+
+def _single_name(item):
+    return [item['Name']]
+
+
+def _match_id(index, item, values):
+    item_id = item[index.id_attribute]
+    return any(
+        item_id.startswith(v) or item_id.startswith('sha256:' + v)
+        for v in values
+    )
+
+
+def _match_name(index, item, values):
+    names = item.get('Names') or [item.get('Name') or '']
+    return any(re.search(v, name) for v in values for name in names)
+
+
+def _match_labels(index, item, values):
+    labels = item.get('Labels') or {}
+    for label in values:
+        key, sep, value = label.partition('=')
+        if key not in labels or (sep and labels[key] != value):
+            return False
+    return True
+
+
+def _match_field(field):
+    def match(index, item, values):
+        return item.get(field) in values
+    return match
+
+
+def _match_created(compare):
+    def match(index, item, values):
+        for key in values:
+            other = index.get(key)
+            if other is None or not compare(item['Created'], other['Created']):
+                return False
+        return True
+    return match
+
+
+def _match_exited(index, item, values):
+    match = _exit_code.match(item.get('Status') or '')
+    return match is not None and match.group(1) in [str(v) for v in values]
+
+
+def _match_ancestor(index, item, values):
+    image, image_id = item.get('Image'), item.get('ImageID') or ''
+    return any(
+        v == image or image.startswith(v + ':') or
+        image_id.startswith(v) or image_id.startswith('sha256:' + v)
+        for v in values
+    )
+
+
+def _match_container_network(index, item, values):
+    networks = (item.get('NetworkSettings') or {}).get('Networks') or {}
+    return any(
+        v in networks or
+        any(n.get('NetworkID') == v for n in networks.values())
+        for v in values
+    )
+
+
+def _match_dangling(index, item, values):
+    dangling = not _image_names(item)
+    return all((v == 'true') == dangling for v in values)
+
+
+def _match_reference(index, item, values):
+    for tag in _image_names(item):
+        repository = tag.rsplit(':', 1)[0]
+        if any(fnmatch.fnmatch(tag, v) or fnmatch.fnmatch(repository, v)
+               for v in values):
+            return True
+    return False
+
+
+def _match_network_type(index, item, values):
+    builtin = item['Name'] in BUILTIN_NETWORKS
+    return any(v == ('builtin' if builtin else 'custom') for v in values)
+
+
+_container_filters = {
+    'ancestor': _match_ancestor,
+    'before': _match_created(lambda created, other: created < other),
+    'exited': _match_exited,
+    'id': _match_id,
+    'label': _match_labels,
+    'name': _match_name,
+    'network': _match_container_network,
+    'since': _match_created(lambda created, other: created > other),
+    'status': _match_field('State'),
+}
+
+_image_filters = {
+    'before': _match_created(lambda created, other: created < other),
+    'dangling': _match_dangling,
+    'label': _match_labels,
+    'reference': _match_reference,
+    'since': _match_created(lambda created, other: created > other),
+}
+
+_network_filters = {
+    'driver': _match_field('Driver'),
+    'id': _match_id,
+    'label': _match_labels,
+    'name': _match_name,
+    'scope': _match_field('Scope'),
+    'type': _match_network_type,
+}
+
+_volume_filters = {
+    'driver': _match_field('Driver'),
+    'label': _match_labels,
+    'name': _match_name,
+}
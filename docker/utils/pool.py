@@ -0,0 +1,20 @@
+import os
+import threading
+from multiprocessing.pool import ThreadPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(workers):
+    """
+    Return a thread pool of ``workers`` threads, shared by all the callers
+    asking for the same number of threads in this process.
+    """
+    with _pools_lock:
+        pid, pool = _pools.get(workers, (None, None))
+        # The threads of a pool don't survive a fork
+        if pid != os.getpid():
+            pool = ThreadPool(workers)
+            _pools[workers] = os.getpid(), pool
+        return pool
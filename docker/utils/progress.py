@@ -0,0 +1,258 @@
+import collections
+import copy
+import time
+
+from .json_stream import decoded_json_stream
+
+# Snapshots are emitted at most this often, in seconds
+INTERVAL = 0.1
+# The weight of the latest measurement in the smoothed rates
+SMOOTHING = 0.3
+
+# Statuses meaning that a layer's data has been transferred
+_TRANSFERRED = (
+    'Verifying Checksum', 'Download complete', 'Extracting', 'Pull complete',
+    'Already exists', 'Pushed', 'Layer already exists', 'Mounted from',
+)
+# Statuses meaning that a layer is done
+_DONE = (
+    'Pull complete', 'Already exists', 'Pushed', 'Layer already exists',
+    'Mounted from',
+)
+
+
+class LayerProgress(object):
+    """
+    The progress of a layer being pulled or pushed.
+
+    Attributes:
+        id (str): The (short) ID of the layer.
+        phase (str): The last status of the layer, e.g. ``Downloading``,
+            ``Extracting`` or ``Pull complete``.
+        current (int): The bytes done in the current phase.
+        total (int): The bytes to do in the current phase, if known.
+        size (int): The size of the layer's data, once it is known.
+        transferred (int): The bytes of the layer downloaded or uploaded.
+        rate (float): The smoothed transfer rate, in bytes per second.
+        done (bool): Whether the layer is complete.
+        started (float): When the first event of the layer was received.
+        updated (float): When the last event of the layer was received.
+    """
+
+    def __init__(self, id, started):
+        self.id = id
+        self.phase = None
+        self.current = 0
+        self.total = None
+        self.size = None
+        self.transferred = 0
+        self.rate = 0.0
+        self.done = False
+        self.started = started
+        self.updated = started
+
+    def __repr__(self):
+        return '<LayerProgress: {0} {1} {2}/{3}>'.format(
+            self.id, self.phase, self.current, self.total
+        )
+
+
+class ProgressSnapshot(object):
+    """
+    The state of a pull or push at some point.
+
+    Attributes:
+        time (float): When the snapshot was taken.
+        layers (:py:class:`list`): Copies of the
+            :py:class:`LayerProgress` of each layer, in the order they
+            appeared.
+        transferred (int): The bytes downloaded or uploaded.
+        total (int): The size of the layers whose size is known.
+        rate (float): The smoothed overall transfer rate, in bytes per
+            second.
+        eta (float): The estimated number of seconds until the known layers
+            are transferred, or None if it can't be estimated.
+        status (str): The last status that wasn't about a layer.
+        error (str): The error the operation failed with, if any.
+    """
+
+    def __init__(self, time, layers, transferred, total, rate, eta, status,
+                 error):
+        self.time = time
+        self.layers = layers
+        self.transferred = transferred
+        self.total = total
+        self.rate = rate
+        self.eta = eta
+        self.status = status
+        self.error = error
+
+    @property
+    def done(self):
+        """
+        The number of complete layers.
+        """
+        return len([layer for layer in self.layers if layer.done])
+
+    def __repr__(self):
+        return '<ProgressSnapshot: {0}/{1} layers, {2}/{3} bytes>'.format(
+            self.done, len(self.layers), self.transferred, self.total
+        )
+
+
+class ProgressAggregator(object):
+    """
+    Folds the progress events of a pull or a push, as returned by
+    :py:meth:`~docker.api.image.ImageApiMixin.pull` and
+    :py:meth:`~docker.api.image.ImageApiMixin.push` with ``stream=True``,
+    into a table of :py:class:`LayerProgress`, and takes
+    :py:class:`ProgressSnapshot` of it at most every ``interval`` seconds.
+
+    Args:
+        callback (callable): Called with each snapshot.
+        interval (float): The minimum time between two snapshots, in
+            seconds. The last snapshot, and snapshots of errors, are always
+            taken.
+        clock (callable): Returns the current time. Defaults to
+            ``time.time``.
+
+    Example:
+
+        >>> aggregator = ProgressAggregator()
+        >>> for snapshot in aggregator.analyze(
+        ...         client.api.pull('busybox', stream=True)):
+        ...     print('{0:.0f}%'.format(
+        ...         100.0 * snapshot.transferred / (snapshot.total or 1)))
+    """
+
+    def __init__(self, callback=None, interval=INTERVAL, clock=None):
+        self.callback = callback
+        self.interval = interval
+        self.clock = clock or time.time
+        self.layers = collections.OrderedDict()
+        self.status = None
+        self.error = None
+        self.rate = 0.0
+        self._last_snapshot = None
+        self._last_rate = None
+
+    @property
+    def transferred(self):
+        return sum(layer.transferred for layer in self.layers.values())
+
+    @property
+    def total(self):
+        return sum(layer.size or 0 for layer in self.layers.values())
+
+    def analyze(self, stream):
+        """
+        Analyze a progress stream, either decoded or not.
+
+        Returns:
+            A generator of :py:class:`ProgressSnapshot` objects.
+        """
+        for event in decoded_json_stream(stream):
+            snapshot = self.feed(event)
+            if snapshot is not None:
+                yield snapshot
+        yield self.close()
+
+    def feed(self, event):
+        """
+        Update the table with a decoded progress event.
+
+        Returns:
+            (:py:class:`ProgressSnapshot`): A snapshot, if one is due.
+        """
+        now = self.clock()
+        if 'error' in event:
+            self.error = event['error']
+            return self._emit(now)
+
+        status = event.get('status') or ''
+        layer_id = event.get('id')
+        if layer_id is None or status.startswith('Pulling from'):
+            if status:
+                self.status = status
+        else:
+            self._update(layer_id, status, event.get('progressDetail'), now)
+
+        if (self._last_snapshot is None or
+                now - self._last_snapshot >= self.interval):
+            return self._emit(now)
+        return None
+
+    def close(self):
+        """
+        Take the last snapshot.
+        """
+        return self._emit(self.clock())
+
+    def snapshot(self, now=None):
+        """
+        Take a snapshot of the table, without calling the callback.
+        """
+        now = self.clock() if now is None else now
+        self._update_rate(now)
+        transferred = self.transferred
+        total = self.total
+        eta = None
+        if self.rate > 0 and total >= transferred:
+            eta = (total - transferred) / self.rate
+        return ProgressSnapshot(
+            now, [copy.copy(layer) for layer in self.layers.values()],
+            transferred, total, self.rate, eta, self.status, self.error
+        )
+
+    def _emit(self, now):
+        self._last_snapshot = now
+        snapshot = self.snapshot(now)
+        if self.callback is not None:
+            self.callback(snapshot)
+        return snapshot
+
+    def _update(self, layer_id, status, detail, now):
+        layer = self.layers.get(layer_id)
+        if layer is None:
+            layer = self.layers[layer_id] = LayerProgress(layer_id, now)
+        detail = detail or {}
+        current = detail.get('current')
+        total = detail.get('total')
+
+        if status in ('Downloading', 'Pushing') and current is not None:
+            if total and total > 0:
+                layer.size = total
+            elapsed = now - layer.updated
+            if elapsed > 0 and current > layer.transferred:
+                layer.rate = _smooth(
+                    layer.rate, float(current - layer.transferred) / elapsed
+                )
+            layer.transferred = current
+        elif status.startswith(_TRANSFERRED):
+            if layer.size is not None:
+                layer.transferred = layer.size
+            layer.rate = 0.0
+
+        layer.phase = status
+        layer.current = current or 0
+        layer.total = total
+        layer.done = status.startswith(_DONE)
+        layer.updated = now
+
+    def _update_rate(self, now):
+        transferred = self.transferred
+        if self._last_rate is not None:
+            last_time, last_transferred = self._last_rate
+            elapsed = now - last_time
+            if elapsed <= 0:
+                return
+            self.rate = _smooth(
+                self.rate, float(transferred - last_transferred) / elapsed
+            )
+        self._last_rate = (now, transferred)
+
+
+def _smooth(average, value):
+    if not average:
+        return float(value)
+    return average + SMOOTHING * (value - average)
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import sys
+import uuid
+
+import six
+
+from .. import constants, errors
+from .context import _replace
+
+STDOUT = '-'
+
+
+def save_stream(src, target, buffer_size=constants.SAVE_BUFFER_SIZE):
+    """
+    Copy a stream, such as the raw response of
+    :py:meth:`~docker.api.image.ImageApiMixin.get_image`, to a file,
+    ``buffer_size`` bytes at a time, and hash it on the way.
+
+    Args:
+        src: A file object to read from. ``readinto()`` is used if it has
+            it, so that the same buffer is reused for every read.
+        target: A path, which is written to a temporary file next to it
+            and renamed once the copy is complete; a file descriptor or a
+            file object, which is written to as is; or ``'-'`` to write to
+            the standard output, unless it is a terminal.
+        buffer_size (int): The size of the reads and writes.
+
+    Returns:
+        (tuple): The ``sha256:`` digest of the data, and its size.
+    """
+    writer = ArchiveWriter(target)
+    try:
+        buf = bytearray(buffer_size)
+        view = memoryview(buf)
+        readinto = getattr(src, 'readinto', None)
+        while True:
+            if readinto is not None:
+                n = readinto(buf)
+            else:
+                data = src.read(buffer_size)
+                n = len(data)
+                buf[:n] = data
+            if not n:
+                break
+            writer.write(view[:n])
+    except Exception:
+        writer.abort()
+        raise
+    return writer.commit()
+
+
+class ArchiveWriter(object):
+    """
+    Writes data to a target of :py:func:`save_stream`, and hashes it.
+    """
+
+    def __init__(self, target):
+        self.path = None
+        self._tmp = None
+        if isinstance(target, six.string_types) and target != STDOUT:
+            self.path = target
+            self._tmp = '{0}.{1}.tmp'.format(target, uuid.uuid4().hex)
+            self.fd = os.open(
+                self._tmp,
+                os.O_WRONLY | os.O_CREAT | os.O_EXCL |
+                getattr(os, 'O_BINARY', 0),
+                0o666
+            )
+        else:
+            self.fd = _fileno(target)
+        self.size = 0
+        self._sha = hashlib.sha256()
+
+    def write(self, data):
+        self._sha.update(data)
+        written = 0
+        while written < len(data):
+            written += os.write(self.fd, data[written:])
+        self.size += len(data)
+
+    def commit(self):
+        """
+        Finish writing. Returns the digest and size of the data.
+        """
+        if self._tmp is not None:
+            os.close(self.fd)
+            try:
+                _replace(self._tmp, self.path)
+            except Exception:
+                os.remove(self._tmp)
+                raise
+        return 'sha256:' + self._sha.hexdigest(), self.size
+
+    def abort(self):
+        """
+        Give up writing, removing the temporary file of a path.
+        """
+        if self._tmp is not None:
+            os.close(self.fd)
+            os.remove(self._tmp)
+
+
+def _fileno(target):
+    if isinstance(target, six.integer_types):
+        return target
+    if target == STDOUT:
+        target = sys.stdout
+        if target.isatty():
+            raise errors.DockerException(
+                'Refusing to write an image archive to a terminal'
+            )
+    # Buffered data must be written before ours
+    target.flush()
+    return target.fileno()
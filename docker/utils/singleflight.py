@@ -0,0 +1,67 @@
+import sys
+import threading
+
+import six
+
+
+class SingleFlight(object):
+    """
+    Runs a function once per key at a time. Callers asking for a key that is
+    being worked on already wait for that call to finish, and share its
+    result, or the exception it raised.
+
+    Example:
+
+        >>> flight = SingleFlight()
+        >>> result, shared = flight.do('busybox:latest', pull, 'busybox')
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Call ``func(*args, **kwargs)``, unless a call for ``key`` is in
+        progress, in which case wait for it instead.
+
+        Returns:
+            (tuple): The result, and whether it came from another caller's
+            call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                six.reraise(*call.error)
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException:
+            call.error = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self, key):
+        """
+        Whether a call for ``key`` is in progress.
+        """
+        with self._lock:
+            return key in self._calls
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
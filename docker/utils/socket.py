@@ -1,30 +1,74 @@
+import collections
 import errno
+import io
 import os
 import select
 import struct
 
 import six
 
+from ..constants import STREAM_HEADER_SIZE_BYTES, STREAM_READ_SIZE
+
 try:
     from ..transport import NpipeSocket
 except ImportError:
     NpipeSocket = type(None)
 
 
+STDIN = 0
+STDOUT = 1
+STDERR = 2
+
+
 class SocketError(Exception):
     pass
 
 
-def read(socket, n=4096):
+class SocketTimeout(SocketError):
+    pass
+
+
+def _is_blocking(socket):
+    sock = getattr(socket, '_sock', None) or socket
+    if not hasattr(sock, 'gettimeout'):
+        return False
+    return sock.gettimeout() is None
+
+
+def wait_for_data(socket, timeout=None):
+    """
+    Waits until data can be read from socket. The wait is skipped for
+    blocking sockets, unless a timeout is given.
+    Raises SocketTimeout if no data arrived within timeout seconds
+    """
+    if isinstance(socket, NpipeSocket):
+        return
+    if timeout is None and _is_blocking(socket):
+        # recv will block until data is available by itself
+        return
+
+    # poll has no limit on the value of file descriptors, unlike select
+    if hasattr(select, 'poll'):
+        poller = select.poll()
+        poller.register(socket, select.POLLIN | select.POLLPRI)
+        ready = poller.poll(None if timeout is None else timeout * 1000)
+    else:
+        ready = select.select([socket], [], [], timeout)[0]
+
+    if not ready:
+        raise SocketTimeout(
+            'No data received in {0} seconds'.format(timeout)
+        )
+
+
+def read(socket, n=4096, timeout=None):
     """
     Reads at most n bytes from socket
     """
 
     recoverable_errors = (errno.EINTR, errno.EDEADLK, errno.EWOULDBLOCK)
 
-    # wait for data to become available
-    if not isinstance(socket, NpipeSocket):
-        select.select([socket], [], [])
+    wait_for_data(socket, timeout)
 
     try:
         if hasattr(socket, 'recv'):
@@ -35,18 +79,60 @@ def read(socket, n=4096):
             raise
 
 
+def read_into(socket, view, timeout=None):
+    """
+    Reads at most len(view) bytes from socket into view, and returns the
+    number of bytes read
+    """
+
+    recoverable_errors = (errno.EINTR, errno.EDEADLK, errno.EWOULDBLOCK)
+
+    if not (hasattr(socket, 'recv_into') or isinstance(socket, io.RawIOBase)):
+        # Buffered file objects, such as HTTP response bodies, wait for data
+        # on their own.
+        return socket.readinto(view)
+
+    wait_for_data(socket, timeout)
+
+    try:
+        if hasattr(socket, 'recv_into'):
+            return socket.recv_into(view)
+        return socket.readinto(view)
+    except EnvironmentError as e:
+        if e.errno not in recoverable_errors:
+            raise
+
+
+def _read_fully_into(socket, view, timeout=None):
+    n = len(view)
+    received = 0
+    while received < n:
+        size = read_into(socket, view[received:], timeout)
+        if size is None:
+            continue
+        if not size:
+            break
+        received += size
+    return received
+
+
+def read_exactly_into(socket, view, timeout=None):
+    """
+    Fills view with exactly len(view) bytes read from socket
+    Raises SocketError if there isn't enough data
+    """
+    if _read_fully_into(socket, view, timeout) < len(view):
+        raise SocketError("Unexpected EOF")
+
+
 def read_exactly(socket, n):
     """
     Reads exactly n bytes from socket
     Raises SocketError if there isn't enough data
     """
-    data = six.binary_type()
-    while len(data) < n:
-        next_data = read(socket, n - len(data))
-        if not next_data:
-            raise SocketError("Unexpected EOF")
-        data += next_data
-    return data
+    data = bytearray(n)
+    read_exactly_into(socket, memoryview(data))
+    return six.binary_type(data)
 
 
 def next_frame_size(socket):
@@ -65,34 +151,244 @@ def next_frame_size(socket):
     return actual
 
 
-def frames_iter(socket):
+def frames_iter(socket, timeout=None):
+    """
+    Returns a generator of frames read from socket. If timeout is set,
+    SocketTimeout is raised when no data arrives for that many seconds.
+    """
+    for _, data in frames_view_iter(socket, timeout=timeout):
+        yield six.binary_type(data)
+
+
+def frames_view_iter(socket, buffer_size=STREAM_READ_SIZE, timeout=None):
     """
-    Returns a generator of frames read from socket
+    Returns a generator of (stream_id, data) tuples read from a multiplexed
+    socket, where stream_id is one of STDIN, STDOUT or STDERR.
+
+    Frames are read with recv_into into a single preallocated buffer, and
+    data is a memoryview of that buffer: it is only valid until the next
+    tuple is requested. Frames larger than buffer_size are yielded in several
+    parts. If timeout is set, SocketTimeout is raised when no data arrives
+    for that many seconds.
     """
+    header = bytearray(STREAM_HEADER_SIZE_BYTES)
+    header_view = memoryview(header)
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
     while True:
-        n = next_frame_size(socket)
-        if n < 0:
-            break
+        if _read_fully_into(socket, header_view, timeout) < len(header):
+            return
+        stream_id, n = struct.unpack_from('>BxxxL', header)
         while n > 0:
-            result = read(socket, n)
-            if result is None:
+            size = read_into(socket, view[:min(n, buffer_size)], timeout)
+            if size is None:
                 continue
-            data_length = len(result)
-            if data_length == 0:
+            if size == 0:
                 # We have reached EOF
                 return
-            n -= data_length
-            yield result
+            n -= size
+            yield stream_id, view[:size]
 
 
-def socket_raw_iter(socket):
+def demux_frames(frames):
+    """
+    Splits an iterable of (stream_id, data) tuples into a pair of generators
+    of bytes, for stdout and stderr respectively.
+
+    The generators can be consumed in any order. Data read while looking for
+    the next chunk of one stream is kept in memory until the other generator
+    gets to it.
+    """
+    frames = iter(frames)
+    pending = {STDOUT: collections.deque(), STDERR: collections.deque()}
+
+    def stream_iter(stream_id):
+        queue = pending[stream_id]
+        while True:
+            while queue:
+                yield queue.popleft()
+            for frame_id, data in frames:
+                if frame_id != STDERR:
+                    frame_id = STDOUT
+                if frame_id == stream_id:
+                    yield six.binary_type(data)
+                    break
+                pending[frame_id].append(six.binary_type(data))
+            else:
+                if not queue:
+                    return
+
+    return stream_iter(STDOUT), stream_iter(STDERR)
+
+
+def join_frames(frames):
+    """
+    Consumes an iterable of (stream_id, data) tuples and returns a tuple
+    holding all of stdout and stderr, as bytes.
+    """
+    out = {STDOUT: bytearray(), STDERR: bytearray()}
+    for stream_id, data in frames:
+        out[STDERR if stream_id == STDERR else STDOUT] += data
+    return six.binary_type(out[STDOUT]), six.binary_type(out[STDERR])
+
+
+def demux_to_fds(frames, stdout_fd, stderr_fd):
+    """
+    Consumes an iterable of (stream_id, data) tuples, writing stdout data to
+    stdout_fd and stderr data to stderr_fd without buffering it. Both can be
+    file descriptors or objects with a fileno() method.
+
+    Returns a tuple holding the number of bytes written to each.
+
+    Example:
+
+        >>> sock = cli.exec_start(exec_id, socket=True)
+        >>> demux_to_fds(frames_view_iter(sock), out_file, err_file)
+        (104857600, 214)
+    """
+    fds = {}
+    written = {STDOUT: 0, STDERR: 0}
+    for stream_id, fd in ((STDOUT, stdout_fd), (STDERR, stderr_fd)):
+        fds[stream_id] = fd if isinstance(fd, int) else fd.fileno()
+
+    for stream_id, data in frames:
+        if stream_id != STDERR:
+            stream_id = STDOUT
+        fd = fds[stream_id]
+        data = memoryview(data)
+        while len(data):
+            n = os.write(fd, data)
+            written[stream_id] += n
+            data = data[n:]
+    return written[STDOUT], written[STDERR]
+
+
+def socket_raw_iter(socket, timeout=None):
     """
     Returns a generator of data read from the socket.
-    This is used for non-multiplexed streams.
+    This is used for non-multiplexed streams. If timeout is set,
+    SocketTimeout is raised when no data arrives for that many seconds.
     """
     while True:
-        result = read(socket)
+        result = read(socket, timeout=timeout)
+        if result is None:
+            continue
         if len(result) == 0:
             # We have reached EOF
             return
         yield result
+
+
+def chunks_iter(fp, read_size=STREAM_READ_SIZE):
+    """
+    Returns a generator of the chunks of a chunked-encoded HTTP body read
+    from fp, which must be positioned right after the response headers.
+
+    Data is read from fp in blocks of up to read_size bytes into a reusable
+    buffer, and the chunk framing is parsed in that buffer. Chunks larger
+    than the buffer are read directly into their own buffer.
+    """
+    buf = bytearray(read_size)
+    view = memoryview(buf)
+    start = end = 0
+    while True:
+        eol = buf.find(b'\n', start, end)
+        if eol < 0:
+            if start > 0:
+                # Move the unparsed tail to the front of the buffer
+                buf[:end - start] = view[start:end]
+                end -= start
+                start = 0
+            if end == read_size:
+                raise SocketError('Chunk size line too long')
+            n = fp.readinto1(view[end:])
+            if not n:
+                # We have reached EOF
+                return
+            end += n
+            continue
+
+        size = parse_chunk_size(buf[start:eol])
+        start = eol + 1
+        if size is None:
+            continue
+        if size == 0:
+            # Last chunk; trailers are not used by the Engine API
+            return
+
+        available = end - start
+        if available >= size:
+            data = bytes(view[start:start + size])
+            start += size
+        else:
+            chunk = bytearray(size)
+            chunk_view = memoryview(chunk)
+            chunk_view[:available] = view[start:end]
+            start = end = 0
+            while available < size:
+                n = fp.readinto1(chunk_view[available:])
+                if not n:
+                    raise SocketError('Unexpected EOF')
+                available += n
+            data = bytes(chunk)
+        yield data
+
+
+def parse_chunk_size(line):
+    """
+    Parses the size line of a chunk of a chunked-encoded HTTP body, without
+    its line feed. Returns None for an empty line, such as the CRLF
+    terminating the previous chunk's data.
+    Raises SocketError if the size isn't valid
+    """
+    line = six.binary_type(line).split(b';', 1)[0].strip()
+    if not line:
+        return None
+    try:
+        return int(line, 16)
+    except ValueError:
+        raise SocketError('Invalid chunk size: {0!r}'.format(line))
+
+
+class ChunkDecoder(object):
+    """
+    Incrementally decodes a chunked-encoded HTTP body, for readers which are
+    handed the body in pieces of any size rather than reading it from a file
+    object like chunks_iter does.
+    """
+
+    def __init__(self):
+        self.done = False
+        self._buffer = bytearray()
+        self._remaining = 0
+
+    def feed(self, data):
+        """
+        Returns the chunk data found in data and in what was fed before
+        """
+        buf = self._buffer
+        buf += data
+        out = bytearray()
+        pos = 0
+        while not self.done:
+            if self._remaining:
+                size = min(self._remaining, len(buf) - pos)
+                if not size:
+                    break
+                out += buf[pos:pos + size]
+                pos += size
+                self._remaining -= size
+                continue
+            eol = buf.find(b'\n', pos)
+            if eol < 0:
+                break
+            size = parse_chunk_size(buf[pos:eol])
+            pos = eol + 1
+            if size is None:
+                continue
+            self._remaining = size
+            if not size:
+                # Last chunk; trailers are not used by the Engine API
+                self.done = True
+        del buf[:pos]
+        return six.binary_type(out)
@@ -1,9 +1,11 @@
 import base64
+import hashlib
 import io
 import os
 import os.path
 import json
 import shlex
+import stat
 import tarfile
 import tempfile
 import warnings
@@ -16,6 +18,13 @@ import six
 from .. import constants
 from .. import errors
 from .. import tls
+from .compress import ParallelGzipWriter, gzip_stream
+
+try:
+    import grp
+    import pwd
+except ImportError:
+    grp = pwd = None
 
 if six.PY2:
     from urllib import splitnport
@@ -90,14 +99,25 @@ def build_file_list(root):
     return files
 
 
-def create_archive(root, files=None, fileobj=None, gzip=False):
+def create_archive(root, files=None, fileobj=None, gzip=False,
+                   reproducible=False, stats=None):
     if not fileobj:
         fileobj = tempfile.NamedTemporaryFile()
-    t = tarfile.open(mode='w:gz' if gzip else 'w', fileobj=fileobj)
+    gz = None
+    if gzip:
+        gz = ParallelGzipWriter(fileobj)
+    out = gz or fileobj
+    if reproducible:
+        # Hash the archive before it is compressed, see ArchiveStream
+        out = _HashingWriter(out)
+    t = tarfile.open(mode='w', fileobj=out, **tar_options(reproducible))
     if files is None:
         files = build_file_list(root)
+    if reproducible:
+        files = sort_archive_paths(files)
+    names = {}
     for path in files:
-        i = t.gettarinfo(os.path.join(root, path), arcname=path)
+        i = get_tarinfo(t, root, path, stats, names)
         if i is None:
             # This happens when we encounter a socket file. We can safely
             # ignore it and proceed.
@@ -107,6 +127,8 @@ def create_archive(root, files=None, fileobj=None, gzip=False):
             # Windows doesn't keep track of the execute bit, so we make files
             # and directories executable by default.
             i.mode = i.mode & 0o755 | 0o111
+        if reproducible:
+            normalize_tarinfo(i)
 
         try:
             # We open the file object in binary mode for Windows support.
@@ -116,10 +138,272 @@ def create_archive(root, files=None, fileobj=None, gzip=False):
             # When we encounter a directory the file object is set to None.
             t.addfile(i, None)
     t.close()
+    if gz is not None:
+        gz.close()
+    if reproducible:
+        fileobj.digest = 'sha256:' + out.sha.hexdigest()
     fileobj.seek(0)
     return fileobj
 
 
+class _HashingWriter(object):
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha = hashlib.sha256()
+
+    def write(self, data):
+        self.sha.update(data)
+        return self.fileobj.write(data)
+
+    def tell(self):
+        return self.fileobj.tell()
+
+
+def stream_archive(root, files=None, gzip=False, chunk_size=65536,
+                   reproducible=False, stats=None):
+    """
+    Generate the same archive as :py:func:`create_archive`, as a sequence of
+    byte strings produced while the files are being read, instead of writing
+    it to a temporary file first.
+
+    Args:
+        root (str): The directory the archived paths are relative to.
+        files (:py:class:`list`): The paths to archive. Defaults to every
+            file under ``root``.
+        gzip (bool): Compress the archive with gzip.
+        chunk_size (int): The size of the blocks files are read in, and the
+            minimum size of the blocks that are generated.
+        reproducible (bool): Generate the same archive for the same files,
+            see :py:func:`normalize_tarinfo`.
+        stats (dict): The ``os.lstat()`` results of (some of) the files,
+            by path, which are reused rather than statting the files again.
+
+    Returns:
+        (:py:class:`ArchiveStream`): An iterator of byte strings.
+    """
+    if files is None:
+        files = build_file_list(root)
+    if reproducible:
+        files = sort_archive_paths(files)
+    stream = _stream_tar(root, files, chunk_size, reproducible, stats)
+    sha = None
+    if reproducible:
+        sha = hashlib.sha256()
+        stream = _hashed(stream, sha)
+    if gzip:
+        stream = gzip_stream(stream)
+    return ArchiveStream(stream, sha)
+
+
+class ArchiveStream(six.Iterator):
+    """
+    The byte strings of an archive generated by :py:func:`stream_archive`.
+
+    Attributes:
+        digest (str): The SHA-256 digest of a reproducible archive before
+            compression, as ``sha256:<hex>``, once it has all been
+            generated. Reproducible archives written to a file by
+            :py:func:`create_archive` have the same ``digest`` attribute.
+    """
+
+    def __init__(self, chunks, sha=None):
+        self.digest = None
+        self._chunks = chunks
+        self._sha = sha
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            if self._sha is not None:
+                self.digest = 'sha256:' + self._sha.hexdigest()
+            raise
+
+    def close(self):
+        self._chunks.close()
+
+
+def _hashed(chunks, sha):
+    for chunk in chunks:
+        sha.update(chunk)
+        yield chunk
+
+
+def _stream_tar(root, files, chunk_size, reproducible, stats):
+    # Only used for its gettarinfo() and settings; the headers and file data
+    # are written out by hand so that large files don't need to be held in
+    # memory.
+    t = tarfile.open(
+        mode='w', fileobj=io.BytesIO(), **tar_options(reproducible)
+    )
+    buf = []
+    buffered = [0]
+
+    def write(data):
+        buf.append(data)
+        buffered[0] += len(data)
+
+    def flush():
+        data = b''.join(buf)
+        del buf[:]
+        buffered[0] = 0
+        return data
+
+    offset = 0
+    names = {}
+    for path in files:
+        full_path = os.path.join(root, path)
+        i = get_tarinfo(t, root, path, stats, names)
+        if i is None:
+            # Socket file, see create_archive
+            continue
+
+        if constants.IS_WINDOWS_PLATFORM:
+            i.mode = i.mode & 0o755 | 0o111
+        if reproducible:
+            normalize_tarinfo(i)
+
+        header = i.tobuf(t.format, t.encoding, t.errors)
+        write(header)
+        offset += len(header)
+        if i.isreg() and i.size:
+            remaining = i.size
+            with open(full_path, 'rb') as f:
+                while remaining:
+                    data = f.read(min(chunk_size, remaining))
+                    if not data:
+                        raise IOError('unexpected end of data')
+                    remaining -= len(data)
+                    write(data)
+                    if buffered[0] >= chunk_size:
+                        yield flush()
+            blocks, rest = divmod(i.size, tarfile.BLOCKSIZE)
+            if rest:
+                write(tarfile.NUL * (tarfile.BLOCKSIZE - rest))
+                blocks += 1
+            offset += blocks * tarfile.BLOCKSIZE
+        if buffered[0] >= chunk_size:
+            yield flush()
+
+    end = tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+    offset += len(end)
+    rest = offset % tarfile.RECORDSIZE
+    if rest:
+        end += tarfile.NUL * (tarfile.RECORDSIZE - rest)
+    write(end)
+    yield flush()
+
+
+def get_tarinfo(t, root, path, stats=None, names=None):
+    """
+    Create the archive entry of ``path``, relative to ``root``, like
+    ``t.gettarinfo()`` does, but reusing its ``os.lstat()`` result from
+    ``stats`` when there is one, and the user and group names looked up in
+    ``names``.
+    """
+    full_path = os.path.join(root, path)
+    statres = stats.get(path) if stats else None
+    if statres is None:
+        statres = os.lstat(full_path)
+    if names is None:
+        names = {}
+
+    arcname = os.path.splitdrive(path)[1].replace(os.sep, '/').lstrip('/')
+    tarinfo = t.tarinfo()
+    tarinfo.tarfile = t
+    linkname = ''
+
+    stmd = statres.st_mode
+    if stat.S_ISREG(stmd):
+        inode = (statres.st_ino, statres.st_dev)
+        if statres.st_nlink > 1 and inode in t.inodes and \
+                arcname != t.inodes[inode]:
+            type = tarfile.LNKTYPE
+            linkname = t.inodes[inode]
+        else:
+            type = tarfile.REGTYPE
+            if inode[0]:
+                t.inodes[inode] = arcname
+    elif stat.S_ISDIR(stmd):
+        type = tarfile.DIRTYPE
+    elif stat.S_ISFIFO(stmd):
+        type = tarfile.FIFOTYPE
+    elif stat.S_ISLNK(stmd):
+        type = tarfile.SYMTYPE
+        linkname = os.readlink(full_path)
+    elif stat.S_ISCHR(stmd):
+        type = tarfile.CHRTYPE
+    elif stat.S_ISBLK(stmd):
+        type = tarfile.BLKTYPE
+    else:
+        return None
+
+    tarinfo.name = arcname
+    tarinfo.mode = stmd
+    tarinfo.uid = statres.st_uid
+    tarinfo.gid = statres.st_gid
+    tarinfo.size = statres.st_size if type == tarfile.REGTYPE else 0
+    tarinfo.mtime = statres.st_mtime
+    tarinfo.type = type
+    tarinfo.linkname = linkname
+    if pwd:
+        key = ('u', tarinfo.uid)
+        if key not in names:
+            try:
+                names[key] = pwd.getpwuid(tarinfo.uid)[0]
+            except KeyError:
+                names[key] = None
+        if names[key] is not None:
+            tarinfo.uname = names[key]
+    if grp:
+        key = ('g', tarinfo.gid)
+        if key not in names:
+            try:
+                names[key] = grp.getgrgid(tarinfo.gid)[0]
+            except KeyError:
+                names[key] = None
+        if names[key] is not None:
+            tarinfo.gname = names[key]
+
+    if type in (tarfile.CHRTYPE, tarfile.BLKTYPE):
+        if hasattr(os, 'major') and hasattr(os, 'minor'):
+            tarinfo.devmajor = os.major(statres.st_rdev)
+            tarinfo.devminor = os.minor(statres.st_rdev)
+    return tarinfo
+
+
+def tar_options(reproducible):
+    """
+    The ``tarfile.open()`` options archives are written with. Reproducible
+    archives don't depend on the Python version and the filesystem encoding.
+    """
+    if reproducible:
+        return {'format': tarfile.GNU_FORMAT, 'encoding': 'utf-8'}
+    return {}
+
+
+def sort_archive_paths(paths):
+    """
+    Sort paths by their name in the archive, in the same order on every
+    platform.
+    """
+    return sorted(paths, key=lambda p: p.replace(os.path.sep, '/'))
+
+
+def normalize_tarinfo(tarinfo):
+    """
+    Clear the fields of an archive entry that depend on the machine rather
+    than on the file: the modification time and the ownership.
+    """
+    tarinfo.mtime = 0
+    tarinfo.uid = tarinfo.gid = 0
+    tarinfo.uname = tarinfo.gname = ''
+    return tarinfo
+
+
 def compare_version(v1, v2):
     """Compare docker versions
 
@@ -453,7 +737,7 @@ def kwargs_from_env(ssl_version=None, assert_hostname=None, environment=None):
     return params
 
 
-def convert_filters(filters):
+def normalize_filters(filters):
     result = {}
     for k, v in six.iteritems(filters):
         if isinstance(v, bool):
@@ -461,7 +745,11 @@ def convert_filters(filters):
         if not isinstance(v, list):
             v = [v, ]
         result[k] = v
-    return json.dumps(result)
+    return result
+
+
+def convert_filters(filters):
+    return json.dumps(normalize_filters(filters))
 
 
 def datetime_to_timestamp(dt):
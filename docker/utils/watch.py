@@ -0,0 +1,432 @@
+import errno
+import os
+import select
+import stat
+import struct
+import sys
+import time
+
+import six
+
+from .build import WALK_WORKERS, context_matcher, read_dockerignore, scan_paths
+from .utils import create_archive, stream_archive
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    ctypes = None
+
+# Changes are reported once the context has been left alone for this long,
+# in seconds
+DEBOUNCE = 0.2
+# How often the context is walked when inotify isn't available, in seconds
+POLL_INTERVAL = 1.0
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR |
+    IN_DONT_FOLLOW | IN_EXCL_UNLINK
+)
+
+_EVENT = struct.Struct('iIII')
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(
+            ctypes.util.find_library('c') or 'libc.so.6', use_errno=True
+        )
+    return _libc
+
+
+def inotify_available():
+    """
+    Whether the platform supports inotify.
+    """
+    if ctypes is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        return hasattr(_get_libc(), 'inotify_init1')
+    except OSError:
+        return False
+
+
+class Inotify(object):
+    """
+    A minimal binding of the Linux inotify API.
+    """
+
+    def __init__(self):
+        libc = _get_libc()
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            self._raise()
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        """
+        Watch a path. Returns the watch descriptor.
+        """
+        if isinstance(path, six.text_type):
+            path = path.encode(sys.getfilesystemencoding() or 'utf-8')
+        wd = self._libc.inotify_add_watch(self.fd, path, mask)
+        if wd < 0:
+            self._raise()
+        return wd
+
+    def rm_watch(self, wd):
+        if self._libc.inotify_rm_watch(self.fd, wd) < 0:
+            self._raise()
+
+    def read(self, timeout=None):
+        """
+        Wait up to ``timeout`` seconds (forever if None) for events.
+
+        Returns:
+            (list): ``(wd, mask, cookie, name)`` tuples, where ``name`` is
+            the name of the entry of the watched directory the event is
+            about, or ``''``.
+        """
+        try:
+            # poll has no limit on the value of file descriptors, unlike
+            # select
+            if hasattr(select, 'poll'):
+                poller = select.poll()
+                poller.register(self.fd, select.POLLIN)
+                ready = poller.poll(
+                    None if timeout is None else timeout * 1000
+                )
+            else:
+                ready = select.select([self.fd], [], [], timeout)[0]
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            return []
+        if not ready:
+            return []
+        data = os.read(self.fd, 65536)
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if six.PY3:
+                name = os.fsdecode(name)
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def _raise(self):
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+
+
+class ContextWatcher(object):
+    """
+    Keeps an index of a build context, with the paths
+    :py:func:`~docker.utils.build.walk_context` would find (following the
+    same ``.dockerignore`` rules) and their ``os.lstat()`` results, up to
+    date as files change.
+
+    On Linux, the directories of the context are watched with inotify, and
+    only the paths events are received for are stat'ed again, so the
+    context can be archived from the index without walking it. Elsewhere,
+    the context is walked every ``poll_interval`` seconds instead.
+
+    Args:
+        path (str): The directory of the build context.
+        dockerfile (str): The path of the Dockerfile within ``path``.
+        debounce (float): How long the context must be left alone, in
+            seconds, before :py:meth:`changes` returns.
+        poll_interval (float): How often the context is walked when inotify
+            isn't available, in seconds.
+
+    Example:
+
+        >>> with ContextWatcher('.') as watcher:
+        ...     while True:
+        ...         client.images.build(
+        ...             fileobj=watcher.tar(), custom_context=True
+        ...         )
+        ...         watcher.changes()
+    """
+
+    def __init__(self, path, dockerfile=None, debounce=DEBOUNCE,
+                 poll_interval=POLL_INTERVAL):
+        self.root = os.path.abspath(path)
+        self.dockerfile = (dockerfile or 'Dockerfile').replace(
+            '/', os.path.sep
+        )
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.index = {}
+        self._inotify = Inotify() if inotify_available() else None
+        self._watches = {}
+        self._dirs = {}
+        self.refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def refresh(self):
+        """
+        Walk the whole context again, and re-read its ``.dockerignore``.
+
+        Returns:
+            (set): The paths that were added, removed or changed.
+        """
+        self.matcher = context_matcher(
+            read_dockerignore(self.root) or [], self.dockerfile
+        )
+        directories = set()
+        index = self._walk(directories=directories)
+        if self._inotify is not None:
+            for d in list(self._dirs):
+                if d not in directories:
+                    self._unwatch(d)
+            for d in sorted(directories):
+                self._watch(d)
+        changed = _diff(self.index, index)
+        self.index = index
+        return changed
+
+    def changes(self, timeout=None):
+        """
+        Wait for the context to change, then for it to be left alone for
+        ``debounce`` seconds, keeping the index up to date.
+
+        Args:
+            timeout (float): How long to wait for a first change, in
+                seconds. Waits forever if None.
+
+        Returns:
+            (set): The paths that were added, removed or changed, relative
+            to the context. Empty if nothing changed before ``timeout``.
+        """
+        changed = self._collect(timeout)
+        if changed:
+            while True:
+                more = self._collect(self.debounce)
+                if not more:
+                    break
+                changed |= more
+        return changed
+
+    def tar(self, gzip=False, stream=False, reproducible=False,
+            context_cache=None):
+        """
+        Archive the context from the index, like
+        :py:func:`docker.utils.tar`.
+
+        Args:
+            gzip (bool): Compress the archive with gzip.
+            stream (bool): Return an iterator of the archive, as
+                :py:func:`docker.utils.stream_archive` does, instead of a
+                temporary file.
+            reproducible (bool): Normalize the archive entries, see
+                :py:func:`docker.utils.utils.normalize_tarinfo`.
+            context_cache (:py:class:`~docker.utils.context.ContextCache`):
+                Build the archive from the entries kept in this cache.
+
+        Returns:
+            A temporary file, a
+            :py:class:`~docker.utils.utils.ArchiveStream`, or a
+            :py:class:`~docker.utils.context.CachedContext`.
+        """
+        files = sorted(self.index)
+        if context_cache is not None:
+            return context_cache.archive(
+                self.root, files, gzip=gzip, reproducible=reproducible,
+                stats=self.index
+            )
+        if stream:
+            return stream_archive(
+                self.root, files, gzip=gzip, reproducible=reproducible,
+                stats=self.index
+            )
+        return create_archive(
+            self.root, files, gzip=gzip, reproducible=reproducible,
+            stats=self.index
+        )
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._watches = {}
+        self._dirs = {}
+
+    def _walk(self, top='', directories=None):
+        index = scan_paths(
+            self.root, self.matcher, workers=WALK_WORKERS, top=top,
+            directories=directories
+        )
+        # Like walk_context does
+        if top == '' and self.dockerfile not in index:
+            st = _lstat(os.path.join(self.root, self.dockerfile))
+            if st is not None:
+                index[self.dockerfile] = st
+        return index
+
+    def _collect(self, timeout):
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            remaining = None
+            if deadline is not None:
+                remaining = max(0, deadline - time.time())
+            if self._inotify is not None:
+                changed = self._apply(self._inotify.read(remaining))
+            else:
+                wait = self.poll_interval
+                if remaining is not None:
+                    wait = min(wait, remaining)
+                time.sleep(wait)
+                changed = self.refresh()
+            if changed or (deadline is not None and time.time() >= deadline):
+                return changed
+
+    def _apply(self, events):
+        changed = set()
+        for wd, mask, cookie, name in events:
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost
+                changed |= self.refresh()
+                continue
+            parent = self._watches.get(wd)
+            if parent is None:
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                if self._dirs.get(parent) == wd:
+                    del self._dirs[parent]
+                continue
+            if not name:
+                continue
+            path = os.path.join(parent, name) if parent else name
+            if path == '.dockerignore':
+                changed |= self.refresh()
+                continue
+            changed |= self._update(path)
+            if parent:
+                # The modification time of the directory changed too
+                changed |= self._update(parent, scan=False)
+        return changed
+
+    def _update(self, path, scan=True):
+        changed = set()
+        st = _lstat(os.path.join(self.root, path))
+        prefix = path + os.path.sep
+        old = self.index.get(path)
+        # Directories left out of the index are still watched if paths in
+        # them are included
+        was_dir = path in self._dirs or (
+            old is not None and stat.S_ISDIR(old.st_mode)
+        )
+        if was_dir and (st is None or not stat.S_ISDIR(st.st_mode)):
+            # A removed directory, or one replaced with a file
+            for p in [p for p in self.index if p.startswith(prefix)]:
+                del self.index[p]
+                changed.add(p)
+            for d in [d for d in self._dirs
+                      if d == path or d.startswith(prefix)]:
+                self._unwatch(d)
+        if st is None:
+            if self.index.pop(path, None) is not None:
+                changed.add(path)
+            return changed
+
+        included = (
+            path == self.dockerfile or self.matcher.should_include(path)
+        )
+        if included:
+            if _key(old) != _key(st):
+                changed.add(path)
+            self.index[path] = st
+        elif self.index.pop(path, None) is not None:
+            changed.add(path)
+
+        if scan and stat.S_ISDIR(st.st_mode) and path not in self._dirs and (
+                included or self.matcher.has_child_exceptions(path)):
+            # A new directory, or one moved into the context: watch it
+            # before reading it, so that nothing created in it is missed.
+            self._watch(path)
+            directories = set()
+            found = self._walk(top=path, directories=directories)
+            for d in sorted(directories):
+                self._watch(d)
+            for p, st in found.items():
+                if _key(self.index.get(p)) != _key(st):
+                    changed.add(p)
+                self.index[p] = st
+        return changed
+
+    def _watch(self, path):
+        if path in self._dirs:
+            return
+        try:
+            wd = self._inotify.add_watch(os.path.join(self.root, path))
+        except OSError:
+            # Gone already, or not a directory
+            return
+        self._watches[wd] = path
+        self._dirs[path] = wd
+
+    def _unwatch(self, path):
+        wd = self._dirs.pop(path)
+        self._watches.pop(wd, None)
+        try:
+            self._inotify.rm_watch(wd)
+        except OSError:
+            # Removed already
+            pass
+
+
+def _lstat(path):
+    try:
+        return os.lstat(path)
+    except OSError:
+        return None
+
+
+def _key(st):
+    if st is None:
+        return None
+    return (
+        getattr(st, 'st_mtime_ns', None) or st.st_mtime, st.st_size,
+        st.st_mode, st.st_ino, st.st_uid, st.st_gid
+    )
+
+
+def _diff(old, new):
+    return set(
+        path for path in set(old) | set(new)
+        if _key(old.get(path)) != _key(new.get(path))
+    )
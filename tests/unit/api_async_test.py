@@ -0,0 +1,407 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import struct
+import sys
+import tarfile
+import tempfile
+import threading
+import unittest
+
+import pytest
+
+import docker
+
+from ..helpers import make_tree
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+if sys.version_info >= (3, 6):
+    import asyncio
+    from docker.api.async_client import AsyncAPIClient
+
+
+def response(status=200, body=b'', headers=None, chunks=None):
+    reason = {101: 'UPGRADED', 200: 'OK', 204: 'No Content',
+              404: 'Not Found'}[status]
+    lines = ['HTTP/1.1 {0} {1}'.format(status, reason)]
+    for key, value in (headers or {}).items():
+        lines.append('{0}: {1}'.format(key, value))
+    if chunks is not None:
+        lines.append('Transfer-Encoding: chunked')
+        body = b''.join(
+            '{0:x}\r\n'.format(len(c)).encode('ascii') + c + b'\r\n'
+            for c in chunks
+        ) + b'0\r\n\r\n'
+    elif status != 101:
+        lines.append('Content-Length: {0}'.format(len(body)))
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('ascii') + body
+
+
+def json_response(data, status=200):
+    return response(
+        status, json.dumps(data).encode('utf-8'),
+        {'Content-Type': 'application/json'}
+    )
+
+
+def frame(stream_id, data):
+    return struct.pack('>BxxxL', stream_id, len(data)) + data
+
+
+@pytest.mark.skipif(sys.version_info < (3, 6), reason='requires Python 3.6')
+class AsyncAPIClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket_file = os.path.join(self.tmpdir, 'docker.sock')
+        self.routes = {}
+        self.requests = []
+        self.connections = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_client(self, test, **kwargs):
+        async def main():
+            server = await asyncio.start_unix_server(
+                self.handle, path=self.socket_file
+            )
+            client = AsyncAPIClient(
+                base_url='unix://' + self.socket_file, **kwargs
+            )
+            try:
+                return await test(client)
+            finally:
+                client.close()
+                server.close()
+                await server.wait_closed()
+                # Let the handlers see the connections close
+                await asyncio.sleep(0.01)
+
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(main())
+        finally:
+            loop.close()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                lines = head.decode('latin-1').split('\r\n')
+                method, target, _ = lines[0].split(' ')
+                headers = dict(
+                    line.split(': ', 1) for line in lines[1:] if line
+                )
+                if headers.get('Transfer-Encoding') == 'chunked':
+                    body = b''
+                    while True:
+                        size = int(await reader.readuntil(b'\r\n'), 16)
+                        body += (await reader.readexactly(size + 2))[:-2]
+                        if not size:
+                            break
+                else:
+                    body = await reader.readexactly(
+                        int(headers.get('Content-Length', 0))
+                    )
+                self.requests.append((method, target, headers, body))
+                path = target.split('?')[0]
+                route = self.routes.get((method, path))
+                if route is None:
+                    writer.write(json_response(
+                        {'message': 'No such container: x'}, 404
+                    ))
+                    continue
+                writer.write(route(target, body))
+                await writer.drain()
+                if b' 101 ' in route(target, body)[:16]:
+                    break
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+
+    def route(self, method, path, data):
+        self.routes[(method, '/v1.30' + path)] = (
+            data if callable(data) else lambda target, body: data
+        )
+
+    def test_json_result_and_keep_alive(self):
+        self.route('GET', '/containers/abc/json', json_response(
+            {'Id': 'abc', 'Config': {'Tty': False}}
+        ))
+
+        async def test(client):
+            first = await client.inspect_container('abc')
+            second = await client.inspect_container('abc')
+            return first, second
+
+        first, second = self.run_client(test, version='1.30')
+        assert first['Id'] == second['Id'] == 'abc'
+        assert self.connections == 1
+        assert self.requests[0][2]['Host'] == 'localunixsocket'
+
+    def test_params_and_post_processing(self):
+        self.route('GET', '/containers/json', json_response(
+            [{'Id': 'abc', 'Names': ['/web']}]
+        ))
+        result = self.run_client(
+            lambda client: client.containers(quiet=True, all=True),
+            version='1.30'
+        )
+        assert result == [{'Id': 'abc'}]
+        target = self.requests[0][1]
+        assert 'all=1' in target
+        assert 'since' not in target
+
+    def test_status_only_and_errors(self):
+        self.route('POST', '/containers/abc/start', response(204))
+
+        async def test(client):
+            assert await client.start('abc') is None
+            with pytest.raises(docker.errors.NotFound):
+                await client.start('missing')
+
+        self.run_client(test, version='1.30')
+        assert self.requests[0][0] == 'POST'
+
+    def test_post_json(self):
+        self.route('POST', '/containers/create', json_response(
+            {'Id': 'abc', 'Warnings': None}
+        ))
+        result = self.run_client(
+            lambda client: client.create_container('busybox', 'true'),
+            version='1.30'
+        )
+        assert result['Id'] == 'abc'
+        body = json.loads(self.requests[0][3].decode('utf-8'))
+        assert body['Image'] == 'busybox'
+        assert self.requests[0][2]['Content-Type'] == 'application/json'
+
+    def test_version_auto(self):
+        self.routes[('GET', '/version')] = lambda target, body: json_response(
+            {'ApiVersion': '1.30'}
+        )
+        self.route('GET', '/info', json_response({'Containers': 3}))
+
+        async def test(client):
+            return await client.info(), client.api_version
+
+        info, version = self.run_client(test, version='auto')
+        assert info == {'Containers': 3}
+        assert version == '1.30'
+
+    def test_events_stream(self):
+        events = [b'{"status": "start", "id": "a"}\n{"status"', b': "die"}\n']
+        self.route('GET', '/events', response(
+            chunks=events, headers={'Content-Type': 'application/json'}
+        ))
+
+        async def test(client):
+            return [e async for e in client.events(decode=True)]
+
+        assert self.run_client(test, version='1.30') == [
+            {'status': 'start', 'id': 'a'}, {'status': 'die'},
+        ]
+
+    def test_logs_demux(self):
+        self.route('GET', '/containers/abc/json', json_response(
+            {'Id': 'abc', 'Config': {'Tty': False}}
+        ))
+        frames = frame(1, b'out1\n') + frame(2, b'err\n') + frame(1, b'out2')
+        self.route('GET', '/containers/abc/logs', response(
+            chunks=[frames[:7], frames[7:]]
+        ))
+
+        async def test(client):
+            joined = await client.logs('abc')
+            demuxed = await client.logs('abc', demux=True)
+            streamed = [
+                item async for item in
+                client.logs('abc', stream=True, demux=True)
+            ]
+            return joined, demuxed, streamed
+
+        joined, demuxed, streamed = self.run_client(test, version='1.30')
+        assert joined == b'out1\nerr\nout2'
+        assert demuxed == (b'out1\nout2', b'err\n')
+        assert b''.join(o for o, e in streamed if o) == b'out1\nout2'
+        assert [e for o, e in streamed if e] == [b'err\n']
+
+    def test_logs_idle_timeout(self):
+        self.route('GET', '/containers/abc/json', json_response(
+            {'Id': 'abc', 'Config': {'Tty': False}}
+        ))
+        # The body never ends
+        data = frame(1, b'out')
+        self.route('GET', '/containers/abc/logs', response(
+            chunks=[data]
+        )[:-len(b'0\r\n\r\n')])
+
+        async def test(client):
+            logs = client.logs('abc', stream=True, timeout=0.1).__aiter__()
+            first = await logs.__anext__()
+            with pytest.raises(docker.utils.socket.SocketTimeout):
+                await logs.__anext__()
+            return first
+
+        assert self.run_client(test, version='1.30') == b'out'
+
+    def test_attach_upgraded_tty(self):
+        self.route('GET', '/containers/abc/json', json_response(
+            {'Id': 'abc', 'Config': {'Tty': True}}
+        ))
+        self.route('POST', '/containers/abc/attach', response(
+            101, b'raw tty output',
+            {'Content-Type': 'application/vnd.docker.raw-stream',
+             'Connection': 'Upgrade', 'Upgrade': 'tcp'}
+        ))
+        result = self.run_client(
+            lambda client: client.attach('abc', logs=True), version='1.30'
+        )
+        assert result == b'raw tty output'
+        assert self.requests[0][2]['Upgrade'] == 'tcp'
+
+    def test_login(self):
+        self.route('POST', '/auth', json_response({'Status': 'Login OK'}))
+        result = self.run_client(
+            lambda client: client.login('user', 'secret', reauth=True),
+            version='1.30'
+        )
+        assert result == {'Status': 'Login OK'}
+        assert json.loads(self.requests[0][3].decode('utf-8'))['username'] == (
+            'user'
+        )
+
+    def test_should_pull_if_digest_changed(self):
+        self.route('GET', '/images/busybox/json', json_response(
+            {'Id': 'sha256:abc', 'RepoDigests': ['busybox@sha256:old']}
+        ))
+        self.route('GET', '/distribution/busybox/json', json_response(
+            {'Descriptor': {'digest': 'sha256:new'}}
+        ))
+
+        async def test(client):
+            first = await client.should_pull(
+                'busybox', policy='if-digest-changed'
+            )
+            second = await client.should_pull(
+                'busybox', policy='if-digest-changed'
+            )
+            return first, second
+
+        assert self.run_client(test, version='1.30') == (True, True)
+        paths = [target for _, target, _, _ in self.requests]
+        # The registry digest is remembered across calls
+        assert paths.count('/v1.30/distribution/busybox/json') == 1
+
+    def test_pull_many(self):
+        def pull(target, body):
+            if 'fromImage=missing' in target:
+                events = [b'{"error": "not found"}\n']
+            else:
+                events = [
+                    b'{"status": "Pulling from library/busybox"}\n',
+                    b'{"status": "Downloaded newer image"}\n',
+                ]
+            return response(
+                chunks=events, headers={'Content-Type': 'application/json'}
+            )
+
+        self.route('POST', '/images/create', pull)
+        events = []
+
+        async def test(client):
+            return await client.pull_many(
+                ['busybox', 'busybox:latest', 'missing'], max_workers=2,
+                progress=lambda ref, event: events.append(ref)
+            )
+
+        results = self.run_client(test, version='1.30')
+        targets = [target for _, target, _, _ in self.requests]
+        assert len(targets) == 2
+        assert any('fromImage=busybox' in t and 'tag=latest' in t
+                   for t in targets)
+        assert results['busybox'] is results['busybox:latest']
+        busybox_events, error = results['busybox']
+        assert error is None
+        assert busybox_events[-1] == {'status': 'Downloaded newer image'}
+        missing_events, error = results['missing']
+        assert missing_events is None
+        assert isinstance(error, docker.errors.PullError)
+        assert sorted(set(events)) == ['busybox', 'missing']
+
+    def test_save_to(self):
+        data = os.urandom(100000)
+        self.route('GET', '/images/busybox/get', response(
+            chunks=[data[:30000], data[30000:]],
+            headers={'Content-Type': 'application/x-tar'}
+        ))
+        path = os.path.join(self.tmpdir, 'busybox.tar')
+
+        async def test(client):
+            saved = await client.save_to('busybox', path, buffer_size=4096)
+            many = await client.save_many({
+                'busybox': os.path.join(self.tmpdir, 'many.tar'),
+                'missing': os.path.join(self.tmpdir, 'missing.tar'),
+            })
+            return saved, many
+
+        saved, many = self.run_client(test, version='1.30')
+        digest = 'sha256:' + hashlib.sha256(data).hexdigest()
+        assert saved == (digest, len(data))
+        with open(path, 'rb') as f:
+            assert f.read() == data
+        assert many['busybox'] == ((digest, len(data)), None)
+        result, error = many['missing']
+        assert result is None
+        assert isinstance(error, docker.errors.NotFound)
+        assert sorted(os.listdir(self.tmpdir)) == [
+            'busybox.tar', 'docker.sock', 'many.tar'
+        ]
+
+    def test_build_streams_context_file(self):
+        base = make_tree(['foo'], ['Dockerfile', 'foo/a.py'])
+        self.addCleanup(shutil.rmtree, base)
+        self.route('POST', '/build', response(
+            chunks=[b'{"stream": "Successfully built 0123abcd"}\r\n'],
+            headers={'Content-Type': 'application/json'}
+        ))
+        image_id, _ = self.run_client(
+            lambda client: client.build(path=base), version='1.30'
+        )
+        assert image_id == '0123abcd'
+        _, _, headers, body = self.requests[0]
+        # Sent from the file in chunks, rather than read into memory
+        assert headers['Transfer-Encoding'] == 'chunked'
+        names = tarfile.open(fileobj=io.BytesIO(body)).getnames()
+        assert sorted(names) == ['Dockerfile', 'foo', 'foo/a.py']
+
+    def test_blocking_methods_run_in_executor(self):
+        threads = []
+
+        def get_config_header(client, registry):
+            threads.append(threading.current_thread())
+            return None
+
+        self.route('POST', '/images/create', response(
+            chunks=[b'{"status": "Downloaded newer image"}\r\n'],
+            headers={'Content-Type': 'application/json'}
+        ))
+        self.route('GET', '/containers/abc/json', json_response({'Id': 'abc'}))
+
+        async def test(client):
+            await client.pull('busybox', tag='latest')
+            return await client.inspect_container('abc')
+
+        with mock.patch(
+                'docker.auth.get_config_header', get_config_header):
+            assert self.run_client(test, version='1.30') == {'Id': 'abc'}
+        assert threads
+        assert threading.main_thread() not in threads
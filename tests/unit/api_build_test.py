@@ -1,11 +1,23 @@
+import base64
 import gzip
 import io
+import json
+import shutil
+import tempfile
 
 import docker
 from docker import auth
+from docker.utils.context import CachedContext, ContextCache
+from docker.utils.utils import ArchiveStream
 
+from ..helpers import make_tree
 from .api_test import BaseAPIClientTest, fake_request, url_prefix
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 
 class BuildTest(BaseAPIClientTest):
     def test_build_container(self):
@@ -70,6 +82,34 @@ class BuildTest(BaseAPIClientTest):
             encoding="gzip"
         )
 
+    def test_build_stream_context(self):
+        base = make_tree([], ['Dockerfile'])
+        self.addCleanup(shutil.rmtree, base)
+
+        self.client.build(base, stream_context=True)
+
+        data = fake_request.call_args[1]['data']
+        assert isinstance(data, ArchiveStream)
+        assert fake_request.call_args[1]['headers'] == {
+            'Content-Type': 'application/tar'
+        }
+
+    def test_build_context_cache(self):
+        base = make_tree([], ['Dockerfile'])
+        self.addCleanup(shutil.rmtree, base)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+
+        self.client.build(
+            base, gzip=True, context_cache=ContextCache(cache_dir)
+        )
+
+        data = fake_request.call_args[1]['data']
+        assert isinstance(data, CachedContext)
+        assert fake_request.call_args[1]['headers'] == {
+            'Content-Type': 'application/tar', 'Content-Encoding': 'gzip'
+        }
+
     def test_build_remote_with_registry_auth(self):
         self.client._auth_configs = {
             'https://example.com': {
@@ -157,3 +197,33 @@ class BuildTest(BaseAPIClientTest):
 
         self.client._set_auth_headers(headers)
         self.assertEqual(headers, expected_headers)
+
+    def test_set_auth_headers_with_credstore(self):
+        self.client._auth_configs = {
+            'credsStore': 'blackbox',
+            'credHelpers': {'registry1.io': 'powerlock'},
+            'registry1.io': {},
+            'registry2.io': {},
+        }
+        store = mock.Mock()
+        store.get.return_value = {'Username': 'sakuya', 'Secret': 'secret'}
+
+        with mock.patch('dockerpycreds.Store', return_value=store) as Store:
+            for i in range(2):
+                headers = {}
+                self.client._set_auth_headers(headers)
+
+        auth_data = json.loads(base64.urlsafe_b64decode(
+            headers['X-Registry-Config']
+        ).decode('ascii'))
+        assert sorted(auth_data) == ['registry1.io', 'registry2.io']
+        assert auth_data['registry2.io']['Password'] == 'secret'
+        assert sorted(c[0][0] for c in Store.call_args_list) == [
+            'blackbox', 'powerlock'
+        ]
+
+        self.client.reload_config()
+        self.client._auth_configs = {'credsStore': 'blackbox', 'a.io': {}}
+        with mock.patch('dockerpycreds.Store', return_value=store) as Store:
+            self.client._set_auth_headers({})
+        assert Store.call_count == 1
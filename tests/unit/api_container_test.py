@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import datetime
+import gzip
 import json
 import signal
 
@@ -1294,6 +1295,16 @@ class ContainerTest(BaseAPIClientTest):
             'Flowering Nights\n(Sakuya Iyazoi)\n'.encode('ascii')
         )
 
+    def test_logs_demux(self):
+        with mock.patch('docker.api.client.APIClient.inspect_container',
+                        fake_inspect_container):
+            logs = self.client.logs(fake_api.FAKE_CONTAINER_ID, demux=True)
+
+        self.assertEqual(
+            logs,
+            ('Flowering Nights\n(Sakuya Iyazoi)\n'.encode('ascii'), b'')
+        )
+
     def test_logs_with_dict_instead_of_id(self):
         with mock.patch('docker.api.client.APIClient.inspect_container',
                         fake_inspect_container):
@@ -1672,3 +1683,14 @@ class ContainerTest(BaseAPIClientTest):
         self.assertEqual(
             args[1]['headers']['Content-Type'], 'application/json'
         )
+
+    @requires_api_version('1.20')
+    def test_put_archive_gzip_file_object(self):
+        data = six.BytesIO(b'x' * 1000)
+        with mock.patch.object(self.client, '_put') as put:
+            put.return_value = mock.Mock(status_code=200)
+            assert self.client.put_archive(
+                fake_api.FAKE_CONTAINER_ID, '/tmp', data, gzip=True
+            )
+            body = b''.join(put.call_args[1]['data'])
+        assert gzip.GzipFile(fileobj=six.BytesIO(body)).read() == b'x' * 1000
@@ -5,6 +5,11 @@ from .api_test import (
     BaseAPIClientTest, url_prefix, fake_request, DEFAULT_TIMEOUT_SECONDS,
 )
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 
 class ExecTest(BaseAPIClientTest):
     def test_exec_create(self):
@@ -59,6 +64,14 @@ class ExecTest(BaseAPIClientTest):
             }
         )
 
+    def test_exec_start_timeout(self):
+        with mock.patch.object(
+                self.client, '_read_from_socket', return_value=b''
+        ) as read_from_socket:
+            self.client.exec_start(fake_api.FAKE_EXEC_ID, timeout=10)
+
+        assert read_from_socket.call_args[1]['timeout'] == 10
+
     def test_exec_start_detached(self):
         self.client.exec_start(fake_api.FAKE_EXEC_ID, detach=True)
 
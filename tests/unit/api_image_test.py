@@ -1,3 +1,9 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
 import docker
 import pytest
 
@@ -5,7 +11,7 @@ from . import fake_api
 from docker import auth
 from .api_test import (
     BaseAPIClientTest, fake_request, DEFAULT_TIMEOUT_SECONDS, url_prefix,
-    fake_resolve_authconfig
+    fake_resolve_authconfig, response
 )
 
 try:
@@ -89,6 +95,51 @@ class ImageTest(BaseAPIClientTest):
         )
         self.assertTrue(args[1]['stream'])
 
+    def test_pull_many(self):
+        pulls = []
+
+        def pull(repository, tag=None, **kwargs):
+            pulls.append((repository, tag))
+            if repository == 'missing':
+                return iter([{'error': 'not found'}])
+            return iter([
+                {'status': 'Pulling from library/' + repository},
+                {'status': 'Downloaded newer image'},
+            ])
+
+        events = []
+        with mock.patch.object(self.client, 'pull', side_effect=pull):
+            results = self.client.pull_many(
+                ['busybox', 'busybox:latest', 'docker.io/library/busybox',
+                 'alpine:3.6', 'missing'],
+                progress=lambda ref, event: events.append(ref)
+            )
+
+        assert sorted(pulls) == [
+            ('alpine', '3.6'), ('busybox', 'latest'), ('missing', 'latest')
+        ]
+        assert len(results) == 5
+        assert results['busybox'] is results['docker.io/library/busybox']
+        busybox_events, error = results['busybox:latest']
+        assert error is None
+        assert busybox_events[-1] == {'status': 'Downloaded newer image'}
+        events_, error = results['missing']
+        assert events_ is None
+        assert isinstance(error, docker.errors.PullError)
+        assert error.message == 'not found'
+        assert sorted(events) == ['alpine:3.6'] * 2 + ['busybox'] * 2 + [
+            'missing'
+        ]
+
+    def test_pull_many_in_flight(self):
+        self.client._pulls.do = mock.Mock(return_value=([{}], True))
+        with mock.patch.object(self.client, 'pull') as pull:
+            results = self.client.pull_many(['busybox'])
+        assert results == {'busybox': ([{}], None)}
+        assert not pull.called
+        key = self.client._pulls.do.call_args[0][0]
+        assert key == ('docker.io', 'busybox', 'latest', None)
+
     def test_commit(self):
         self.client.commit(fake_api.FAKE_CONTAINER_ID)
 
@@ -198,6 +249,56 @@ class ImageTest(BaseAPIClientTest):
             timeout=DEFAULT_TIMEOUT_SECONDS
         )
 
+    def test_inspect_distribution(self):
+        with mock.patch('docker.auth.resolve_authconfig',
+                        fake_resolve_authconfig):
+            self.client.inspect_distribution('busybox:latest')
+
+        fake_request.assert_called_with(
+            'GET',
+            url_prefix + 'distribution/busybox:latest/json',
+            headers={},
+            timeout=DEFAULT_TIMEOUT_SECONDS
+        )
+
+    def test_should_pull(self):
+        local = {'RepoDigests': ['busybox@sha256:aaa']}
+        remote = {'Descriptor': {'digest': 'sha256:aaa'}}
+        client = self.client
+        with mock.patch.object(client, 'inspect_image',
+                               return_value=local), \
+                mock.patch.object(client, 'inspect_distribution',
+                                  return_value=remote) as distribution:
+            assert client.should_pull('busybox', 'always')
+            assert not client.should_pull('busybox', 'if-not-present')
+            assert not client.should_pull('busybox', 'if-digest-changed')
+            assert not client.should_pull(
+                'docker.io/library/busybox:latest', 'if-digest-changed'
+            )
+            assert distribution.call_count == 1
+
+            remote['Descriptor']['digest'] = 'sha256:bbb'
+            assert not client.should_pull('busybox', 'if-digest-changed')
+            assert client.should_pull(
+                'busybox', 'if-digest-changed', max_age=0
+            )
+            assert not client.should_pull(
+                'busybox@sha256:aaa', 'if-digest-changed'
+            )
+
+            distribution.side_effect = docker.errors.APIError('unreachable')
+            assert client.should_pull(
+                'alpine', 'if-digest-changed', max_age=0
+            )
+            local['RepoDigests'] = []
+            assert client.should_pull('busybox', 'if-digest-changed')
+
+        with mock.patch.object(client, 'inspect_image',
+                               side_effect=docker.errors.ImageNotFound('')):
+            assert client.should_pull('busybox', 'if-not-present')
+        with pytest.raises(docker.errors.InvalidArgument):
+            client.should_pull('busybox', 'sometimes')
+
     def test_inspect_image_undefined_id(self):
         for arg in None, '', {True: True}:
             with pytest.raises(docker.errors.NullResource) as excinfo:
@@ -362,6 +463,42 @@ class ImageTest(BaseAPIClientTest):
             timeout=DEFAULT_TIMEOUT_SECONDS
         )
 
+    def test_save_to(self):
+        base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base)
+        path = os.path.join(base, 'image.tar')
+        data = b'x' * 10000
+        res = response(raw=io.BytesIO(data))
+        with mock.patch.object(self.client, '_get', return_value=res) as get:
+            result = self.client.save_to(
+                fake_api.FAKE_IMAGE_ID, path, buffer_size=1024
+            )
+
+        get.assert_called_with(
+            url_prefix + 'images/e9aa60c60128/get', stream=True
+        )
+        assert result == (
+            'sha256:' + hashlib.sha256(data).hexdigest(), len(data)
+        )
+        with open(path, 'rb') as f:
+            assert f.read() == data
+
+    def test_save_many(self):
+        def save_to(image, target, buffer_size=None):
+            if image == 'missing':
+                raise docker.errors.NotFound('not found')
+            return 'sha256:' + image, 1
+
+        with mock.patch.object(self.client, 'save_to', side_effect=save_to):
+            results = self.client.save_many(
+                {'busybox': '/tmp/busybox.tar', 'missing': '/tmp/x.tar'}
+            )
+
+        assert results['busybox'] == (('sha256:busybox', 1), None)
+        result, error = results['missing']
+        assert result is None
+        assert isinstance(error, docker.errors.NotFound)
+
     def test_load_image(self):
         self.client.load_image('Byte Stream....')
 
@@ -5,6 +5,7 @@ import os
 import re
 import shutil
 import socket
+import tarfile
 import tempfile
 import threading
 import time
@@ -44,7 +45,7 @@ def response(status_code=200, content='', headers=None, reason=None, elapsed=0,
     return res
 
 
-def fake_resolve_authconfig(authconfig, registry=None):
+def fake_resolve_authconfig(authconfig, registry=None, credentials=None):
     return None
 
 
@@ -83,7 +84,8 @@ def fake_delete(self, url, *args, **kwargs):
     return fake_request('DELETE', url, *args, **kwargs)
 
 
-def fake_read_from_socket(self, response, stream, tty=False):
+def fake_read_from_socket(self, response, stream, tty=False, demux=False,
+                          timeout=None):
     return six.binary_type()
 
 
@@ -232,6 +234,23 @@ class DockerApiTest(BaseAPIClientTest):
             timeout=None
         )
 
+    def test_stream_read_sizes(self):
+        constants = docker.constants
+        with mock.patch.object(self.client, '_stream_helper') as helper:
+            self.client.events()
+            self.client.stats(fake_api.FAKE_CONTAINER_ID)
+            self.client.pull('busybox', stream=True)
+            self.client.push('test_image', stream=True)
+            self.client.build(fileobj=io.BytesIO(b'FROM busybox'), stream=True)
+
+        assert [c[1]['read_size'] for c in helper.call_args_list] == [
+            constants.EVENT_STREAM_READ_SIZE,
+            constants.EVENT_STREAM_READ_SIZE,
+            constants.TRANSFER_STREAM_READ_SIZE,
+            constants.TRANSFER_STREAM_READ_SIZE,
+            constants.TRANSFER_STREAM_READ_SIZE,
+        ]
+
     def test_events_with_since_until(self):
         ts = 1356048000
         now = datetime.datetime.utcfromtimestamp(ts)
@@ -458,6 +477,86 @@ class StreamTest(unittest.TestCase):
             self.assertEqual(list(stream), [
                 str(i).encode() for i in range(50)])
 
+    def chunked_request_handler(self, connection):
+        data = b''
+        while b'\r\n\r\n' not in data:
+            data += connection.recv(2048)
+        headers, data = data.split(b'\r\n\r\n', 1)
+        assert b'Transfer-Encoding: chunked' in headers
+
+        body = b''
+        while True:
+            while b'\r\n' not in data:
+                data += connection.recv(2048)
+            size, data = data.split(b'\r\n', 1)
+            size = int(size, 16)
+            while len(data) < size + 2:
+                data += connection.recv(2048)
+            body += data[:size]
+            data = data[size + 2:]
+            if not size:
+                break
+        self.request_body = body
+        connection.sendall(self.response)
+
+    @pytest.mark.skipif(
+        docker.constants.IS_WINDOWS_PLATFORM, reason='Unix only'
+    )
+    def test_stream_context(self):
+        self.request_handler = self.chunked_request_handler
+        with open(os.path.join(self.build_context, 'Dockerfile'), 'w') as f:
+            f.write('FROM busybox\n')
+        self.response = (
+            b'HTTP/1.1 200 OK\r\n'
+            b'Transfer-Encoding: chunked\r\n'
+            b'\r\n'
+            b'4\r\ndone\r\n0\r\n\r\n'
+        )
+
+        with APIClient(base_url="http+unix://" + self.socket_file) \
+                as client:
+            stream = client.build(
+                path=self.build_context, stream_context=True
+            )
+            self.assertEqual(list(stream), [b'done'])
+
+        archive = tarfile.open(fileobj=io.BytesIO(self.request_body))
+        self.assertEqual(archive.getnames(), ['Dockerfile'])
+
+    def stalling_request_handler(self, connection):
+        data = b''
+        while b'\r\n\r\n' not in data:
+            data += connection.recv(2048)
+        connection.sendall(self.response)
+        # Keep the connection open without sending anything else
+        self.stalled.wait(5)
+
+    def stall(self, response):
+        self.stalled = threading.Event()
+        self.addCleanup(self.stalled.set)
+        self.request_handler = self.stalling_request_handler
+        self.response = response
+
+    @pytest.mark.skipif(
+        docker.constants.IS_WINDOWS_PLATFORM, reason='Unix only'
+    )
+    def test_logs_idle_timeout(self):
+        self.stall(
+            b'HTTP/1.1 200 OK\r\n'
+            b'Transfer-Encoding: chunked\r\n'
+            b'\r\n'
+            b'd\r\n\x01\x00\x00\x00\x00\x00\x00\x05hello\r\n'
+        )
+
+        with APIClient(base_url="http+unix://" + self.socket_file) \
+                as client:
+            with mock.patch.object(
+                    client, '_check_is_tty', return_value=False):
+                logs = client.logs('abc', stream=True, timeout=0.2)
+            self.assertEqual(next(logs), b'hello')
+            with pytest.raises(docker.utils.socket.SocketTimeout):
+                next(logs)
+
 
 class UserAgentTest(unittest.TestCase):
     def setUp(self):
@@ -531,3 +630,33 @@ class DisableSocketTest(unittest.TestCase):
 
         self.assertEqual(socket.timeout, None)
         self.assertEqual(socket._sock.timeout, 0.0)
+
+
+class ReadFromSocketTest(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.sock, self.peer = socket.socketpair()
+        self.addCleanup(self.sock.close)
+        self.addCleanup(self.peer.close)
+
+    def read(self, **kwargs):
+        with mock.patch.object(
+                self.client, '_get_raw_response_socket',
+                return_value=self.sock):
+            return self.client._read_from_socket(mock.Mock(), **kwargs)
+
+    def test_idle_timeout(self):
+        self.peer.sendall(b'\x01\x00\x00\x00\x00\x00\x00\x05hello')
+        frames = self.read(stream=True, timeout=0.1)
+        assert next(frames) == b'hello'
+        with pytest.raises(docker.utils.socket.SocketTimeout):
+            next(frames)
+
+    def test_idle_timeout_tty(self):
+        with pytest.raises(docker.utils.socket.SocketTimeout):
+            self.read(stream=False, tty=True, timeout=0.1)
+
+    def test_idle_timeout_demux(self):
+        out, err = self.read(stream=True, demux=True, timeout=0.1)
+        with pytest.raises(docker.utils.socket.SocketTimeout):
+            next(err)
@@ -323,6 +323,87 @@ class CredStoreTest(unittest.TestCase):
         ) == 'truesecret'
 
 
+class CredentialCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000
+        self.queries = []
+        patcher = mock.patch('dockerpycreds.Store', side_effect=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.auth_config = {
+            'credHelpers': {'registry1.io': 'powerlock'},
+            'credsStore': 'blackbox',
+            'registry1.io': {},
+            'registry2.io': {},
+        }
+
+    def store(self, name):
+        store = mock.Mock()
+
+        def get(registry):
+            self.queries.append((name, registry))
+            if registry == 'registry3.io':
+                raise auth.dockerpycreds.CredentialsNotFound('missing')
+            return {'Username': 'sakuya', 'Secret': name}
+
+        store.get.side_effect = get
+        return store
+
+    def test_ttl(self):
+        cache = auth.CredentialCache(ttl=60, clock=lambda: self.now)
+        expected = {
+            'ServerAddress': 'registry1.io',
+            'Username': 'sakuya',
+            'Password': 'powerlock',
+        }
+        for i in range(2):
+            assert auth.resolve_authconfig(
+                self.auth_config, 'registry1.io', credentials=cache
+            ) == expected
+            assert auth.resolve_authconfig(
+                self.auth_config, 'registry3.io', credentials=cache
+            ) is None
+        assert self.queries == [
+            ('powerlock', 'registry1.io'), ('blackbox', 'registry3.io')
+        ]
+
+        self.now += 61
+        auth.resolve_authconfig(
+            self.auth_config, 'registry1.io', credentials=cache
+        )
+        assert len(self.queries) == 3
+
+    def test_invalidate(self):
+        cache = auth.CredentialCache()
+        cache.get('blackbox', None)
+        cache.get('blackbox', 'registry2.io')
+        cache.invalidate('docker.io')
+        cache.get('blackbox', None)
+        cache.get('blackbox', 'registry2.io')
+        assert self.queries == [
+            ('blackbox', auth.INDEX_URL), ('blackbox', 'registry2.io'),
+            ('blackbox', auth.INDEX_URL)
+        ]
+        cache.invalidate()
+        cache.get('blackbox', 'registry2.io')
+        assert len(self.queries) == 4
+
+    def test_resolve_authconfigs(self):
+        cache = auth.CredentialCache()
+        registries = ['registry1.io', 'registry2.io', 'registry3.io']
+        result = auth.resolve_authconfigs(
+            self.auth_config, registries, credentials=cache
+        )
+        assert sorted(result) == registries
+        assert result['registry1.io']['Password'] == 'powerlock'
+        assert result['registry2.io']['Password'] == 'blackbox'
+        assert result['registry3.io'] is None
+        assert sorted(self.queries) == [
+            ('blackbox', 'registry2.io'), ('blackbox', 'registry3.io'),
+            ('powerlock', 'registry1.io')
+        ]
+
+
 class FindConfigFileTest(unittest.TestCase):
     def tmpdir(self, name):
         tmpdir = ensuretemp(name)
@@ -586,3 +667,49 @@ class LoadConfigTest(unittest.TestCase):
         cfg = cfg[registry]
         assert 'IdentityToken' in cfg
         assert cfg['IdentityToken'] == token
+
+    def test_load_config_cached(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        dockercfg_path = os.path.join(folder, 'config.json')
+
+        def write(registry):
+            entry = encode_auth({'username': 'sakuya'}).decode('ascii')
+            with open(dockercfg_path, 'w') as f:
+                json.dump({'auths': {registry: {'auth': entry}}}, f)
+
+        write('scarlet.net')
+        with mock.patch(
+                'docker.auth._load_config_file',
+                wraps=auth._load_config_file) as load:
+            cfg = auth.load_config(dockercfg_path)
+            cfg['scarlet.net']['username'] = 'remilia'
+            cfg['other.net'] = {}
+            cfg = auth.load_config(dockercfg_path)
+            assert load.call_count == 1
+            assert cfg == {'scarlet.net': {
+                'username': 'sakuya', 'password': '', 'email': None,
+                'serveraddress': 'scarlet.net',
+            }}
+
+            write('remilia.net')
+            st = os.stat(dockercfg_path)
+            os.utime(dockercfg_path, (st.st_atime, st.st_mtime + 10))
+            assert list(auth.load_config(dockercfg_path)) == ['remilia.net']
+            assert load.call_count == 2
+
+    def test_encode_header_precomputed(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        dockercfg_path = os.path.join(folder, 'config.json')
+        with open(dockercfg_path, 'w') as f:
+            json.dump({'auths': {'flandre.net': {
+                'auth': encode_auth({'username': 'flandre'}).decode('ascii'),
+            }}}, f)
+
+        cfg = auth.load_config(dockercfg_path)
+        expected = base64.urlsafe_b64encode(
+            json.dumps(cfg['flandre.net']).encode('ascii')
+        )
+        with mock.patch('json.dumps', side_effect=AssertionError):
+            assert auth.encode_header(cfg['flandre.net']) == expected
@@ -71,6 +71,7 @@ def get_fake_images():
         'Created': '2 days ago',
         'Repository': 'busybox',
         'RepoTags': ['busybox:latest', 'busybox:1.0'],
+        'Labels': {'bar': 'foo'},
     }]
     return status_code, response
 
@@ -104,9 +105,13 @@ def get_fake_containers():
     status_code = 200
     response = [{
         'Id': FAKE_CONTAINER_ID,
+        'Names': ['/foobar'],
         'Image': 'busybox:latest',
+        'ImageID': 'sha256:' + FAKE_IMAGE_ID,
         'Created': '2 days ago',
         'Command': 'true',
+        'Labels': {'foo': 'bar'},
+        'State': 'running',
         'Status': 'fake status'
     }]
     return status_code, response
@@ -191,6 +196,20 @@ def get_fake_inspect_image():
     return status_code, response
 
 
+def get_fake_inspect_distribution():
+    status_code = 200
+    response = {
+        'Descriptor': {
+            'MediaType':
+                'application/vnd.docker.distribution.manifest.list.v2+json',
+            'digest': 'sha256:' + 'f' * 64,
+            'Size': 1000,
+        },
+        'Platforms': [{'architecture': 'amd64', 'os': 'linux'}],
+    }
+    return status_code, response
+
+
 def get_fake_insert_image():
     status_code = 200
     response = {'StatusCode': 0}
@@ -573,6 +592,10 @@ fake_responses = {
     post_fake_load_image,
     '{1}/{0}/images/test_image/json'.format(CURRENT_VERSION, prefix):
     get_fake_inspect_image,
+    '{1}/{0}/distribution/busybox:latest/json'.format(
+        CURRENT_VERSION, prefix
+    ):
+    get_fake_inspect_distribution,
     '{1}/{0}/images/test_image/insert'.format(CURRENT_VERSION, prefix):
     get_fake_insert_image,
     '{1}/{0}/images/test_image/push'.format(CURRENT_VERSION, prefix):
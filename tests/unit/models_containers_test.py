@@ -228,6 +228,27 @@ class ContainerCollectionTest(unittest.TestCase):
         assert container.id == FAKE_CONTAINER_ID
         client.api.pull.assert_called_with('alpine', tag=None)
 
+    def test_run_pull_policy(self):
+        client = make_fake_client()
+        client.api.should_pull.return_value = True
+        client.containers.run(
+            'alpine', 'sleep 300', detach=True, pull_policy='always'
+        )
+        client.api.pull.assert_called_with('alpine', tag=None)
+        assert not client.api.should_pull.called
+
+        client.api.pull.reset_mock()
+        client.containers.run(
+            'alpine', 'sleep 300', detach=True,
+            pull_policy='if-digest-changed'
+        )
+        client.api.should_pull.assert_called_with(
+            'alpine', policy='if-digest-changed', max_age=60,
+            auth_config=None
+        )
+        assert client.api.pull.called
+        assert 'pull_policy' not in client.api.create_container.call_args[1]
+
     def test_run_with_error(self):
         client = make_fake_client()
         client.api.logs.return_value = "some error"
@@ -355,6 +376,28 @@ class ContainerCollectionTest(unittest.TestCase):
         assert isinstance(containers[0], Container)
         assert containers[0].id == FAKE_CONTAINER_ID
 
+    def test_list_sparse(self):
+        client = make_fake_client()
+        containers = client.containers.list(all=True, sparse=True)
+        assert len(containers) == 1
+        container = containers[0]
+        assert isinstance(container, Container)
+        assert container.id == FAKE_CONTAINER_ID
+        assert container.name == 'foobar'
+        assert container.status == 'running'
+        assert container.labels == {'foo': 'bar'}
+        assert container.image.id == FAKE_IMAGE_ID
+        assert not client.api.inspect_container.called
+
+        assert container.attrs['HostConfig'] is not None
+        client.api.inspect_container.assert_called_once_with(
+            FAKE_CONTAINER_ID
+        )
+        assert container.status == 'running'
+        assert container.name == 'foobar'
+        assert container.attrs.get('NotAKey') is None
+        assert client.api.inspect_container.call_count == 1
+
 
 class ContainerTest(unittest.TestCase):
     def test_name(self):
@@ -398,7 +441,8 @@ class ContainerTest(unittest.TestCase):
             stdin=False, tty=False, privileged=True, user='', environment=None
         )
         client.api.exec_start.assert_called_with(
-            FAKE_EXEC_ID, detach=False, tty=False, stream=True, socket=False
+            FAKE_EXEC_ID, detach=False, tty=False, stream=True, socket=False,
+            demux=False
         )
 
     def test_export(self):
@@ -446,7 +490,7 @@ class ContainerTest(unittest.TestCase):
         container = client.containers.get(FAKE_CONTAINER_ID)
         container.put_archive('path', 'foo')
         client.api.put_archive.assert_called_with(FAKE_CONTAINER_ID,
-                                                  'path', 'foo')
+                                                  'path', 'foo', gzip=False)
 
     def test_remove(self):
         client = make_fake_client()
@@ -1,8 +1,25 @@
-from docker.models.images import Image
+import io
+import os
+import shutil
+import tarfile
 import unittest
 
+import pytest
+
+from docker.constants import BUILD_DIGEST_LABEL
+from docker.errors import BuildError, PullError
+from docker.models.images import Image
+from docker.utils import build_digest, tar
+from docker.utils.build_stream import BuildAnalyzer
+
 from .fake_api import FAKE_IMAGE_ID
 from .fake_api_client import make_fake_client
+from ..helpers import make_tree
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
 
 
 class ImageCollectionTest(unittest.TestCase):
@@ -14,6 +31,183 @@ class ImageCollectionTest(unittest.TestCase):
         assert isinstance(image, Image)
         assert image.id == FAKE_IMAGE_ID
 
+    def test_build_analyzer(self):
+        client = make_fake_client()
+        client.api.build.return_value = [
+            b'{"stream": "Step 1/1 : FROM busybox\\n"}',
+            b'{"stream": "Successfully built ' +
+            FAKE_IMAGE_ID.encode('ascii') + b'\\n"}',
+        ]
+        analyzer = BuildAnalyzer()
+        image = client.images.build(path='.', analyzer=analyzer)
+        client.api.build.assert_called_with(path='.')
+        assert image.id == FAKE_IMAGE_ID
+        assert analyzer.image_id == FAKE_IMAGE_ID
+        assert analyzer.steps[0].duration is not None
+
+    def test_build_reuse_existing(self):
+        base = make_tree([], ['Dockerfile'])
+        self.addCleanup(shutil.rmtree, base)
+        digest = build_digest(path=base, buildargs={'a': 'b'})
+        client = make_fake_client()
+        client.api.images.return_value = [{'Id': FAKE_IMAGE_ID}]
+
+        image = client.images.build(
+            path=base, tag='web:1', buildargs={'a': 'b'}, reuse_existing=True
+        )
+        assert image.id == FAKE_IMAGE_ID
+        assert not client.api.build.called
+        client.api.images.assert_called_with(filters={
+            'label': '{0}={1}'.format(BUILD_DIGEST_LABEL, digest)
+        })
+        client.api.tag.assert_called_with(FAKE_IMAGE_ID, 'web', tag='1')
+
+        client.api.images.return_value = []
+        client.images.build(
+            path=base, buildargs={'a': 'b'}, labels={'x': 'y'},
+            reuse_existing=True
+        )
+        labels = client.api.build.call_args[1]['labels']
+        assert labels['x'] == 'y'
+        assert labels[BUILD_DIGEST_LABEL] == build_digest(
+            path=base, buildargs={'a': 'b'}, labels={'x': 'y'}
+        )
+
+    def test_build_reuse_existing_uploads_hashed_archive(self):
+        base = make_tree(['foo'], ['Dockerfile', 'foo/a.py'])
+        self.addCleanup(shutil.rmtree, base)
+        client = make_fake_client()
+        client.api.images.return_value = []
+        uploaded = []
+
+        def build(**kwargs):
+            uploaded.append(kwargs['fileobj'].read())
+            return iter([
+                '{{"stream": "Successfully built {0}"}}'.format(FAKE_IMAGE_ID)
+            ])
+        client.api.build.side_effect = build
+
+        with mock.patch('docker.models.images.tar', wraps=tar) as tar_mock:
+            client.images.build(path=base, gzip=True, reuse_existing=True)
+        # The context was archived once, and that archive uploaded
+        assert tar_mock.call_count == 1
+        kwargs = client.api.build.call_args[1]
+        assert 'path' not in kwargs and 'gzip' not in kwargs
+        assert kwargs['custom_context'] is True
+        assert kwargs['encoding'] == 'gzip'
+        assert kwargs['labels'][BUILD_DIGEST_LABEL] == build_digest(path=base)
+        with tar(base, gzip=True, reproducible=True) as archive:
+            assert uploaded == [archive.read()]
+
+    def test_build_reuse_existing_remote(self):
+        client = make_fake_client()
+        client.images.build(
+            path='https://github.com/docker/compose.git', reuse_existing=True
+        )
+        assert not client.api.images.called
+        client.api.build.assert_called_with(
+            path='https://github.com/docker/compose.git'
+        )
+
+    def test_build_digest(self):
+        base = make_tree(['foo'], ['Dockerfile', 'foo/a.py'])
+        self.addCleanup(shutil.rmtree, base)
+        digest = build_digest(path=base)
+        os.utime(os.path.join(base, 'foo', 'a.py'), (0, 1000))
+        assert build_digest(path=base) == digest
+        assert build_digest(path=base, target='dev') != digest
+
+        with open(os.path.join(base, 'foo', 'a.py'), 'w') as f:
+            f.write('changed')
+        assert build_digest(path=base) != digest
+
+        fileobj = io.BytesIO(b'FROM busybox')
+        assert build_digest(fileobj=fileobj) == build_digest(
+            fileobj=fileobj
+        )
+
+    def test_build_many(self):
+        base = make_tree(['foo'], ['Dockerfile', 'foo/a.py'])
+        self.addCleanup(shutil.rmtree, base)
+        client = make_fake_client()
+        contexts = {}
+
+        def build(**kwargs):
+            contexts[kwargs['target']] = kwargs['fileobj'].read()
+            if kwargs['target'] == 'broken':
+                return [b'{"error": "failed"}']
+            return FAKE_IMAGE_ID
+
+        client.api.build.side_effect = build
+        results = client.images.build_many(
+            [{'target': 'web', 'tag': 'app/web'}, {'target': 'broken'},
+             {'target': 'worker', 'rm': False}],
+            path=base, gzip=True, rm=True, max_workers=2
+        )
+
+        assert [image.id if image else None for image, _ in results] == [
+            FAKE_IMAGE_ID, None, FAKE_IMAGE_ID
+        ]
+        assert results[0][1] is None
+        assert isinstance(results[1][1], BuildError)
+        assert contexts['web'] == contexts['broken'] == contexts['worker']
+        with tarfile.open(fileobj=io.BytesIO(contexts['web'])) as t:
+            assert sorted(t.getnames()) == ['Dockerfile', 'foo', 'foo/a.py']
+
+        assert client.api.build.call_count == 3
+        for call in client.api.build.call_args_list:
+            kwargs = call[1]
+            assert 'path' not in kwargs and 'gzip' not in kwargs
+            assert kwargs['custom_context'] is True
+            assert kwargs['encoding'] == 'gzip'
+            assert kwargs['rm'] is (kwargs['target'] != 'worker')
+
+    def test_build_many_context_per_build(self):
+        client = make_fake_client()
+        with pytest.raises(TypeError):
+            client.images.build_many([{'path': '.'}], path='.')
+        assert not client.api.build.called
+
+    def test_build_many_remote(self):
+        client = make_fake_client()
+        results = client.images.build_many(
+            [{'target': 'a'}, {'target': 'b'}],
+            path='https://github.com/docker/compose.git'
+        )
+        assert [error for _, error in results] == [None, None]
+        client.api.build.assert_any_call(
+            path='https://github.com/docker/compose.git', target='b'
+        )
+
+    def test_watch_build(self):
+        base = make_tree([], ['Dockerfile', 'a.py'])
+        self.addCleanup(shutil.rmtree, base)
+        client = make_fake_client()
+        contexts = []
+
+        def build(**kwargs):
+            with tarfile.open(fileobj=kwargs['fileobj']) as t:
+                contexts.append(sorted(t.getnames()))
+            return FAKE_IMAGE_ID
+
+        client.api.build.side_effect = build
+        builds = client.images.watch_build(
+            base, tag='app', debounce=0.05, timeout=1
+        )
+        image, error = next(builds)
+        assert image.id == FAKE_IMAGE_ID and error is None
+        with open(os.path.join(base, 'b.py'), 'w') as f:
+            f.write('x')
+        image, error = next(builds)
+        assert contexts == [
+            ['Dockerfile', 'a.py'], ['Dockerfile', 'a.py', 'b.py']
+        ]
+        assert client.api.build.call_args[1]['tag'] == 'app'
+        builds.close()
+
+        with pytest.raises(TypeError):
+            next(client.images.watch_build(base, fileobj=io.BytesIO()))
+
     def test_get(self):
         client = make_fake_client()
         image = client.images.get(FAKE_IMAGE_ID)
@@ -34,6 +228,21 @@ class ImageCollectionTest(unittest.TestCase):
         assert isinstance(images[0], Image)
         assert images[0].id == FAKE_IMAGE_ID
 
+    def test_list_sparse(self):
+        client = make_fake_client()
+        images = client.images.list(sparse=True)
+        assert len(images) == 1
+        image = images[0]
+        assert isinstance(image, Image)
+        assert image.id == FAKE_IMAGE_ID
+        assert image.tags == ['busybox:latest', 'busybox:1.0']
+        assert image.labels == {'bar': 'foo'}
+        assert not client.api.inspect_image.called
+
+        assert image.attrs['Parent'] == '27cf784147099545'
+        client.api.inspect_image.assert_called_once_with(FAKE_IMAGE_ID)
+        assert image.labels == {'bar': 'foo'}
+
     def test_load(self):
         client = make_fake_client()
         client.images.load('byte stream')
@@ -47,6 +256,70 @@ class ImageCollectionTest(unittest.TestCase):
         assert isinstance(image, Image)
         assert image.id == FAKE_IMAGE_ID
 
+    def test_pull_policy(self):
+        client = make_fake_client()
+        client.api.should_pull.return_value = False
+        image = client.images.pull(
+            'test_image', tag='1', policy='if-digest-changed', max_age=10
+        )
+        client.api.should_pull.assert_called_with(
+            'test_image:1', policy='if-digest-changed', max_age=10,
+            auth_config=None
+        )
+        assert not client.api.pull.called
+        assert image.id == FAKE_IMAGE_ID
+
+        client.api.should_pull.return_value = True
+        client.images.pull('test_image', policy='if-not-present')
+        client.api.pull.assert_called_with('test_image', tag=None)
+
+    def test_pull_progress(self):
+        client = make_fake_client()
+        client.api.pull.return_value = [
+            {'status': 'Pulling fs layer', 'progressDetail': {}, 'id': 'a'},
+            {'status': 'Downloading', 'id': 'a',
+             'progressDetail': {'current': 10, 'total': 20}},
+            {'status': 'Pull complete', 'progressDetail': {}, 'id': 'a'},
+        ]
+        snapshots = []
+        image = client.images.pull('test_image', progress=snapshots.append)
+        client.api.pull.assert_called_with(
+            'test_image', tag=None, stream=True, decode=True
+        )
+        assert image.id == FAKE_IMAGE_ID
+        assert snapshots[-1].done == 1
+        assert snapshots[-1].transferred == 20
+
+        client.api.pull.return_value = [{'error': 'not found'}]
+        with pytest.raises(PullError):
+            client.images.pull('test_image', progress=snapshots.append)
+        assert snapshots[-1].error == 'not found'
+
+    def test_pull_many(self):
+        client = make_fake_client()
+        error = PullError('missing', 'not found')
+        client.api.pull_many.return_value = {
+            'test_image': ([], None), 'missing': (None, error)
+        }
+        results = client.images.pull_many(
+            ['test_image', 'missing'], max_workers=2
+        )
+        client.api.pull_many.assert_called_with(
+            ['test_image', 'missing'], max_workers=2
+        )
+        client.api.inspect_image.assert_called_with('test_image')
+        assert results['test_image'][0].id == FAKE_IMAGE_ID
+        image, error = results['missing']
+        assert image is None
+        assert isinstance(error, PullError) and error.message == 'not found'
+
+    def test_save_many(self):
+        client = make_fake_client()
+        client.images.save_many({'busybox': '/tmp/busybox.tar'})
+        client.api.save_many.assert_called_with(
+            {'busybox': '/tmp/busybox.tar'}
+        )
+
     def test_push(self):
         client = make_fake_client()
         client.images.push('foobar', insecure_registry=True)
@@ -105,6 +378,14 @@ class ImageTest(unittest.TestCase):
         image.save()
         client.api.get_image.assert_called_with(FAKE_IMAGE_ID)
 
+    def test_save_to(self):
+        client = make_fake_client()
+        image = client.images.get(FAKE_IMAGE_ID)
+        image.save_to('/tmp/image.tar', buffer_size=1024)
+        client.api.save_to.assert_called_with(
+            FAKE_IMAGE_ID, '/tmp/image.tar', buffer_size=1024
+        )
+
     def test_tag(self):
         client = make_fake_client()
         image = client.images.get(FAKE_IMAGE_ID)
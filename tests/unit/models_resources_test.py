@@ -1,5 +1,10 @@
 import unittest
 
+import pytest
+
+from docker.errors import APIError
+from docker.models.resource import SparseAttrs
+
 from .fake_api import FAKE_CONTAINER_ID
 from .fake_api_client import make_fake_client
 
@@ -26,3 +31,22 @@ class ModelTest(unittest.TestCase):
         image1 = client.images.get(FAKE_CONTAINER_ID)
         my_set.add(image1)
         assert len(my_set) == 2
+
+
+class SparseAttrsTest(unittest.TestCase):
+    def test_hydrate_retries_after_error(self):
+        calls = []
+
+        def load():
+            calls.append(None)
+            if len(calls) == 1:
+                raise APIError('timeout')
+            return {'Id': 'abc', 'Config': {}}
+
+        attrs = SparseAttrs({'Id': 'abc'}, load)
+        with pytest.raises(APIError):
+            attrs['Config']
+        assert attrs.sparse
+        assert attrs['Config'] == {}
+        assert not attrs.sparse
+        assert len(calls) == 2
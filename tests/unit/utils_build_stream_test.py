@@ -0,0 +1,99 @@
+import json
+import unittest
+
+from docker.utils.build_stream import BuildAnalyzer
+
+BUILD_OUTPUT = [
+    {'stream': 'Step 1/4 : FROM busybox'},
+    {'stream': '\n'},
+    {'stream': ' ---> 54511612f1c4\n'},
+    {'stream': 'Step 2/4 : RUN make\n'},
+    {'stream': ' ---> Running in 8e3f0c1b2a4d\n'},
+    {'stream': 'compiling\nlink'},
+    {'stream': 'ing\n'},
+    {'stream': ' ---> 3c5a2b1d9e8f\n'},
+    {'stream': 'Removing intermediate container 8e3f0c1b2a4d\n'},
+    {'stream': 'Step 3/4 : COPY . /src\n'},
+    {'stream': ' ---> Using cache\n ---> abcdef012345\n'},
+    {'stream': 'Step 4/4 : CMD sh\n'},
+    {'stream': ' ---> Running in 0a1b2c3d4e5f\n ---> 99aa88bb77cc\n'},
+    {'stream': 'Successfully built 99aa88bb77cc\n'},
+    {'stream': 'Successfully tagged web:latest\n'},
+]
+
+
+class FakeClock(object):
+    def __init__(self, times):
+        self.times = list(times)
+
+    def __call__(self):
+        return self.times.pop(0)
+
+
+class BuildAnalyzerTest(unittest.TestCase):
+
+    def analyze(self, output, times):
+        analyzer = BuildAnalyzer(clock=FakeClock(times))
+        return analyzer, list(analyzer.analyze(output))
+
+    def test_steps(self):
+        times = [
+            0, 1, 1.5, 2, 2, 12, 40, 41, 42, 43, 43.5, 45, 46, 48.5, 49, 50
+        ]
+        analyzer, events = self.analyze(BUILD_OUTPUT, times)
+
+        assert [e.type for e in events] == [
+            'step', 'layer', 'step', 'container', 'output', 'output',
+            'layer', 'removed', 'step', 'cache', 'layer', 'step',
+            'container', 'layer', 'built', 'tagged',
+        ]
+        steps = [(s.number, s.total, s.instruction) for s in analyzer.steps]
+        assert steps == [
+            (1, 4, 'FROM busybox'), (2, 4, 'RUN make'),
+            (3, 4, 'COPY . /src'), (4, 4, 'CMD sh'),
+        ]
+        make = analyzer.steps[1]
+        assert make.container == '8e3f0c1b2a4d'
+        assert make.image == '3c5a2b1d9e8f'
+        assert make.output_lines == 2
+        assert make.duration == 43 - 2
+        assert analyzer.steps[2].cached
+        assert analyzer.image_id == '99aa88bb77cc'
+        assert analyzer.tags == ['web:latest']
+        assert analyzer.duration == 48.5
+        # Time since the previous event
+        assert events[5].text == 'linking'
+        assert events[5].duration == 40 - 12
+
+        assert [s.number for s in analyzer.slowest(2)] == [2, 4]
+        report = analyzer.report(count=1)
+        assert report.splitlines() == [
+            'Built 99aa88bb77cc in 48.5s: 4 steps, 1 cached',
+            'Slowest steps:',
+            '  2/4     41.0s  RUN make',
+        ]
+
+    def test_raw_stream_and_error(self):
+        raw = [
+            json.dumps(chunk).encode('utf-8') + b'\r\n'
+            for chunk in BUILD_OUTPUT[:6]
+        ] + [b'{"errorDetail": {"code": 2}, "error": "make failed"}']
+        analyzer, events = self.analyze(raw, range(20))
+
+        assert events[-1].type == 'error'
+        assert analyzer.error == 'make failed'
+        assert analyzer.image_id is None
+        assert analyzer.steps[1].duration == 6 - 3
+        assert analyzer.report().splitlines()[:2] == [
+            'Failed in 6.0s: 2 steps, 0 cached', 'Error: make failed'
+        ]
+
+    def test_legacy_step_format(self):
+        analyzer, events = self.analyze(
+            [{'stream': 'Step 1 : FROM busybox\n'}], [0, 1]
+        )
+        step = analyzer.steps[0]
+        assert (step.number, step.total, step.instruction) == (
+            1, None, 'FROM busybox'
+        )
+        assert step.duration == 1
@@ -0,0 +1,92 @@
+import gzip
+import io
+import os
+import shutil
+import tarfile
+import unittest
+import zlib
+
+from docker.utils import create_archive, stream_archive
+from docker.utils.compress import ParallelGzipWriter, gzip_stream
+from docker.utils.pool import get_pool
+
+from ..helpers import make_tree
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def gunzip(data):
+    return gzip.GzipFile(fileobj=io.BytesIO(data)).read()
+
+
+def count_members(data):
+    members = 0
+    while data:
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        d.decompress(data)
+        data = d.unused_data
+        members += 1
+    return members
+
+
+class ParallelGzipWriterTest(unittest.TestCase):
+
+    def test_multiple_members(self):
+        data = os.urandom(50000) + b'x' * 100000
+        out = io.BytesIO()
+        writer = ParallelGzipWriter(out, block_size=16384)
+        for i in range(0, len(data), 1000):
+            writer.write(data[i:i + 1000])
+        assert writer.tell() == len(data)
+        writer.close()
+
+        assert gunzip(out.getvalue()) == data
+        assert count_members(out.getvalue()) == 10
+        assert not out.closed
+
+    def test_empty(self):
+        out = io.BytesIO()
+        with ParallelGzipWriter(out):
+            pass
+        assert gunzip(out.getvalue()) == b''
+
+    def test_write_after_close(self):
+        writer = ParallelGzipWriter(io.BytesIO())
+        writer.close()
+        with self.assertRaises(ValueError):
+            writer.write(b'data')
+
+    def test_gzip_stream(self):
+        chunks = [os.urandom(4096) for i in range(20)]
+        compressed = list(gzip_stream(iter(chunks), block_size=8192))
+        assert len(compressed) > 1
+        assert gunzip(b''.join(compressed)) == b''.join(chunks)
+
+    def test_pool_recreated_after_fork(self):
+        pool = get_pool(2)
+        assert get_pool(2) is pool
+        with mock.patch('docker.utils.pool.os.getpid', return_value=-1):
+            forked = get_pool(2)
+            assert forked is not pool
+            data = b''.join(gzip_stream([os.urandom(20000)], block_size=4096))
+        assert count_members(data) == 5
+
+
+class GzipArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base = make_tree(['foo'], ['Dockerfile', 'foo/a.py'])
+        self.addCleanup(shutil.rmtree, self.base)
+
+    def test_create_archive(self):
+        with create_archive(self.base, gzip=True) as archive:
+            names = tarfile.open(fileobj=archive, mode='r:gz').getnames()
+        assert sorted(names) == ['Dockerfile', 'foo', 'foo/a.py']
+
+    def test_stream_archive(self):
+        data = b''.join(stream_archive(self.base, gzip=True))
+        with create_archive(self.base) as archive:
+            assert gunzip(data) == archive.read()
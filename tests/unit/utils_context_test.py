@@ -0,0 +1,152 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+import pytest
+
+from docker.constants import IS_WINDOWS_PLATFORM
+from docker.utils import tar
+from docker.utils.context import ContextCache, SharedBuffer
+
+from ..helpers import make_tree
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def members(archive):
+    return [
+        (m.name, m.type, m.linkname, m.size, m.mode)
+        for m in archive.getmembers()
+    ]
+
+
+class ContextCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base = make_tree(
+            ['foo', 'foo/bar'],
+            ['Dockerfile', 'a.py', 'foo/b.py', 'foo/bar/c.txt', 'ignored.pyc']
+        )
+        self.addCleanup(shutil.rmtree, self.base)
+        with open(os.path.join(self.base, 'big'), 'wb') as f:
+            f.write(os.urandom(200000))
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.cache = ContextCache(cache_dir)
+        self.write_segment = mock.patch.object(
+            self.cache, '_write_segment', wraps=self.cache._write_segment
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def archive(self, gzip=False):
+        context = self.cache.tar(self.base, exclude=['*.pyc'], gzip=gzip)
+        data = b''.join(context)
+        return context, tarfile.open(fileobj=io.BytesIO(data))
+
+    def test_same_archive_as_tar(self):
+        with tar(self.base, exclude=['*.pyc']) as archive:
+            expected = members(tarfile.open(fileobj=archive))
+
+        for gzip in (False, True):
+            context, archive = self.archive(gzip=gzip)
+            assert members(archive) == expected
+            with open(os.path.join(self.base, 'big'), 'rb') as f:
+                assert archive.extractfile('big').read() == f.read()
+
+    def test_unchanged_context(self):
+        first, _ = self.archive()
+        count = self.write_segment.call_count
+        assert count == 7
+
+        second, archive = self.archive()
+        assert self.write_segment.call_count == count
+        assert second.digest == first.digest
+        assert archive.extractfile('a.py').read() == b'content'
+
+        # The digest doesn't depend on the compression
+        assert self.archive(gzip=True)[0].digest == first.digest
+
+    def test_changed_file(self):
+        first, _ = self.archive()
+        count = self.write_segment.call_count
+        path = os.path.join(self.base, 'foo', 'b.py')
+        with open(path, 'w') as f:
+            f.write('changed content')
+        os.utime(path, (0, 12345))
+
+        second, archive = self.archive()
+        assert self.write_segment.call_count == count + 1
+        assert second.digest != first.digest
+        assert archive.extractfile('foo/b.py').read() == b'changed content'
+
+    @pytest.mark.skipif(IS_WINDOWS_PLATFORM, reason='No hard links on Windows')
+    def test_hard_links(self):
+        os.link(
+            os.path.join(self.base, 'big'), os.path.join(self.base, 'zlink')
+        )
+        for i in range(2):
+            _, archive = self.archive()
+            link = archive.getmember('zlink')
+            assert link.islnk()
+            assert link.linkname == 'big'
+
+        os.remove(os.path.join(self.base, 'big'))
+        _, archive = self.archive()
+        assert archive.getmember('zlink').isreg()
+
+    def test_reproducible(self):
+        copy = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, copy)
+        copy = os.path.join(copy, 'copy')
+        shutil.copytree(self.base, copy)
+        os.utime(os.path.join(copy, 'a.py'), (0, 12345))
+
+        digests = [
+            self.cache.tar(path, reproducible=True).digest
+            for path in (self.base, copy)
+        ]
+        assert digests[0] == digests[1]
+        assert self.cache.tar(self.base).digest != digests[0]
+        assert self.cache.tar(copy).digest != self.cache.tar(self.base).digest
+
+    def test_prune(self):
+        self.archive()
+        os.remove(os.path.join(self.base, 'big'))
+        self.archive()
+        segments = os.listdir(self.cache.segments_dir)
+        self.cache.prune()
+        assert len(os.listdir(self.cache.segments_dir)) == len(segments) - 1
+
+
+class SharedBufferTest(unittest.TestCase):
+
+    def test_readers(self):
+        data = os.urandom(100000)
+        f = tempfile.TemporaryFile()
+        self.addCleanup(f.close)
+        f.write(data)
+        with SharedBuffer(f) as buf:
+            first, second = buf.reader(), buf.reader()
+            assert len(first) == len(data)
+            assert first.read(10) == data[:10]
+            assert second.read() == data
+            assert first.read() == data[10:]
+            assert first.read() == b''
+            first.seek(-5, 2)
+            assert first.tell() == len(data) - 5
+            assert first.read(100) == data[-5:]
+
+    def test_sources(self):
+        with SharedBuffer(io.BytesIO(b'context')) as buf:
+            assert buf.reader().read() == b'context'
+        with SharedBuffer(iter([b'con', b'text'])) as buf:
+            assert buf.reader().read() == b'context'
+        with SharedBuffer(io.BytesIO()) as buf:
+            assert buf.size == 0
+            assert buf.reader().read() == b''
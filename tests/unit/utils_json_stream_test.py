@@ -2,7 +2,13 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
-from docker.utils.json_stream import json_splitter, stream_as_text, json_stream
+import pytest
+
+from docker.errors import StreamParseError
+from docker.utils.json_stream import (
+    JSONStreamDecoder, decoded_json_stream, json_splitter, stream_as_text,
+    json_stream
+)
 
 
 class TestJsonSplitter(object):
@@ -60,3 +66,58 @@ class TestJsonStream(object):
             {'three': 'four'},
             {'x': 2}
         ]
+
+    def test_with_fragmented_bytes(self):
+        data = '{"status": "ěĝ"}\r\n{"x": [1, 2]}\r\n'.encode('utf-8')
+        stream = [data[i:i + 1] for i in range(len(data))]
+        output = list(json_stream(stream))
+        assert output == [{'status': 'ěĝ'}, {'x': [1, 2]}]
+
+    def test_with_multiline_object(self):
+        stream = ['{\n  "one": "two"\n', '}\n{"x": 1}\n']
+        output = list(json_stream(stream))
+        assert output == [{'one': 'two'}, {'x': 1}]
+
+    def test_with_trailing_whitespace(self):
+        stream = [b'{"one": "two"}', b'\r\n']
+        output = list(json_stream(stream))
+        assert output == [{'one': 'two'}]
+
+    def test_with_invalid_trailing_data(self):
+        stream = [b'{"one": "two"}\n{"x": ']
+        with pytest.raises(StreamParseError):
+            list(json_stream(stream))
+
+    def test_decoded_json_stream(self):
+        assert list(decoded_json_stream([{'one': 'two'}, {'x': 1}])) == [
+            {'one': 'two'}, {'x': 1}
+        ]
+        assert list(decoded_json_stream([b'{"one": "tw', b'o"}\n{}'])) == [
+            {'one': 'two'}, {}
+        ]
+
+
+class TestJSONStreamDecoder(object):
+
+    def test_feed_returns_completed_objects(self):
+        decoder = JSONStreamDecoder()
+        assert decoder.feed(b'{"a": 1}\n{"b"') == [{'a': 1}]
+        assert decoder.feed(b': 2}') == [{'b': 2}]
+        assert decoder.feed(b'\n') == []
+        assert decoder.close() == []
+
+    def test_invalid_utf8_in_unterminated_object(self):
+        decoder = JSONStreamDecoder()
+        assert decoder.feed(b'{"a": "\xed"}{"b": 1}') == [
+            {'a': '\ufffd'}, {'b': 1}
+        ]
+
+    def test_partial_line_scanned_once(self):
+        decoder = JSONStreamDecoder()
+        assert decoder.feed(b'{"a": 1}\n{"b": "') == [{'a': 1}]
+        assert decoder._scanned == len(b'{"b": "')
+        assert decoder.feed(b'x' * 10) == []
+        assert decoder._scanned == len(b'{"b": "') + 10
+        assert decoder.feed(b'"}\n{"c": 3}\n') == [{'b': 'x' * 10}, {'c': 3}]
+        assert decoder._scanned == 0
+        assert decoder.close() == []
@@ -0,0 +1,179 @@
+import socket
+import struct
+import unittest
+
+import pytest
+import six
+from requests.models import Response
+from urllib3.response import HTTPResponse
+
+import docker
+from docker.utils.logs import LogMultiplexer, selectors
+from docker.utils.socket import STDERR, STDOUT
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def frame(stream_id, data):
+    return struct.pack('>BxxxL', stream_id, len(data)) + data
+
+
+def chunk(data):
+    return '{0:x}\r\n'.format(len(data)).encode('ascii') + data + b'\r\n'
+
+
+@pytest.mark.skipif(
+    selectors is None or not six.PY3, reason='requires selectors'
+)
+class LogMultiplexerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = docker.APIClient(base_url='unix:///var/run/fake.sock')
+        self.servers = {}
+        self.tty = {}
+        self.patchers = [
+            mock.patch.object(
+                self.client, 'inspect_container', self.fake_inspect
+            ),
+            mock.patch.object(self.client, '_get', self.fake_get),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        for server in self.servers.values():
+            server.close()
+
+    def fake_inspect(self, container):
+        return {
+            'Id': container + '-id',
+            'Config': {'Tty': self.tty.get(container, False)},
+        }
+
+    def fake_get(self, url, params=None, stream=False):
+        assert params['follow'] == 1
+        container_id = url.split('/')[-2]
+        sock, server = socket.socketpair()
+        self.servers[container_id] = server
+        server.sendall(
+            b'HTTP/1.1 ' + self.status + b'\r\n'
+            b'Content-Type: application/vnd.docker.raw-stream\r\n'
+            b'Transfer-Encoding: chunked\r\n\r\n'
+        )
+        if self.initial:
+            server.sendall(self.initial)
+
+        http_response = six.moves.http_client.HTTPResponse(sock)
+        http_response.begin()
+        sock.close()
+        response = Response()
+        response.status_code = http_response.status
+        response.reason = http_response.reason
+        response.url = url
+        response.raw = HTTPResponse(
+            body=http_response, preload_content=False,
+            original_response=http_response
+        )
+        return response
+
+    initial = b''
+    status = b'200 OK'
+
+    def test_multiplexes_containers(self):
+        mux = LogMultiplexer(self.client)
+        self.assertEqual(mux.add('a'), 'a-id')
+        mux.add('b')
+        self.assertEqual(sorted(mux.containers), ['a-id', 'b-id'])
+
+        self.servers['a-id'].sendall(chunk(frame(STDOUT, b'one\ntw')))
+        self.servers['b-id'].sendall(chunk(frame(STDERR, b'err\n')))
+        self.servers['a-id'].sendall(chunk(frame(STDOUT, b'o\nthree')))
+        self.servers['a-id'].sendall(b'0\r\n\r\n')
+        self.servers['b-id'].shutdown(socket.SHUT_WR)
+
+        records = list(mux)
+        self.assertEqual(
+            [r for r in records if r[0] == 'a-id'],
+            [('a-id', STDOUT, b'one'), ('a-id', STDOUT, b'two'),
+             ('a-id', STDOUT, b'three')]
+        )
+        self.assertEqual(
+            [r for r in records if r[0] == 'b-id'],
+            [('b-id', STDERR, b'err')]
+        )
+        self.assertEqual(mux.containers, [])
+        mux.close()
+
+    def test_data_buffered_with_headers(self):
+        self.initial = chunk(frame(STDOUT, b'early\n'))
+        with LogMultiplexer(self.client) as mux:
+            mux.add('a')
+            self.assertEqual(mux.poll(0), [('a-id', STDOUT, b'early')])
+            self.assertEqual(mux.poll(0), [])
+
+    def test_buffered_data_larger_than_read_size(self):
+        lines = [('line {0}'.format(i)).encode('ascii') for i in range(20)]
+        self.initial = b''.join(
+            chunk(frame(STDOUT, line + b'\n')) for line in lines
+        )
+        with LogMultiplexer(self.client, read_size=16) as mux:
+            mux.add('a')
+            self.assertEqual(
+                mux.poll(0), [('a-id', STDOUT, line) for line in lines]
+            )
+
+    def test_error_response(self):
+        self.status = b'501 Not Implemented'
+        self.initial = chunk(
+            b'{"message": "configured logging driver does not support '
+            b'reading"}'
+        ) + b'0\r\n\r\n'
+        with LogMultiplexer(self.client) as mux:
+            with pytest.raises(docker.errors.APIError) as excinfo:
+                mux.add('a')
+            self.assertEqual(excinfo.value.status_code, 501)
+            self.assertEqual(mux.containers, [])
+
+    def test_tty_and_split_frames(self):
+        self.tty['a'] = True
+        data = chunk(b'raw\nlines\n')
+        with LogMultiplexer(self.client) as mux:
+            mux.add('a')
+            self.servers['a-id'].sendall(data[:5])
+            self.assertEqual(mux.poll(1), [])
+            self.servers['a-id'].sendall(data[5:])
+            self.assertEqual(
+                mux.poll(1),
+                [('a-id', STDOUT, b'raw'), ('a-id', STDOUT, b'lines')]
+            )
+
+    def test_remove(self):
+        with LogMultiplexer(self.client) as mux:
+            mux.add('a')
+            mux.add('b')
+            mux.remove('a-id')
+            self.assertEqual(mux.containers, ['b-id'])
+            self.servers['b-id'].sendall(chunk(frame(STDOUT, b'b\n')))
+            self.assertEqual(mux.poll(1), [('b-id', STDOUT, b'b')])
+
+    def test_fast_container_does_not_starve_others(self):
+        lines = [('line {0:04}'.format(i)).encode('ascii') for i in range(500)]
+        with LogMultiplexer(self.client, read_size=64) as mux:
+            mux.add('a')
+            mux.add('b')
+            self.servers['a-id'].sendall(b''.join(
+                chunk(frame(STDOUT, line + b'\n')) for line in lines
+            ))
+            self.servers['b-id'].sendall(chunk(frame(STDOUT, b'b\n')))
+            records = mux.poll(1)
+            assert ('b-id', STDOUT, b'b') in records
+            # Only a few reads of the fast container's logs were done
+            assert len(records) < 20
+            while len(records) < len(lines) + 1:
+                records.extend(mux.poll(1))
+            assert [r[2] for r in records if r[0] == 'a-id'] == lines
@@ -0,0 +1,284 @@
+import threading
+import unittest
+
+import pytest
+
+from docker.errors import InvalidArgument
+from docker.utils.mirror import StateMirror
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def container(container_id, name, state='running', labels=None, created=1,
+              status='Up 2 minutes', image='busybox:latest'):
+    return {
+        'Id': container_id,
+        'Names': ['/' + name],
+        'Image': image,
+        'ImageID': 'sha256:' + container_id[::-1],
+        'State': state,
+        'Status': status,
+        'Labels': labels or {},
+        'Created': created,
+    }
+
+
+class StateMirrorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.client._get.return_value.headers = {
+            'Date': 'Mon, 02 Oct 2017 10:00:00 GMT'
+        }
+        self.client.containers.return_value = [
+            container('abc123', 'web', labels={'app': 'web', 'tier': 'a'},
+                      created=1),
+            container('abd456', 'db', labels={'app': 'db'}, created=2),
+            container('fed789', 'job', state='exited', created=3,
+                      status='Exited (3) 5 minutes ago'),
+        ]
+        self.client.images.return_value = [
+            {'Id': 'sha256:111', 'RepoTags': ['busybox:latest'],
+             'Labels': None, 'Created': 10},
+            {'Id': 'sha256:222', 'RepoTags': ['<none>:<none>'],
+             'Labels': {'a': 'b'}, 'Created': 20},
+        ]
+        self.client.networks.return_value = [
+            {'Id': 'n1', 'Name': 'bridge', 'Driver': 'bridge'},
+            {'Id': 'n2', 'Name': 'backend', 'Driver': 'overlay'},
+        ]
+        self.client.volumes.return_value = {'Volumes': [
+            {'Name': 'data', 'Driver': 'local', 'Labels': {'keep': ''}},
+        ]}
+        self.mirror = StateMirror(mock.Mock(api=self.client))
+        self.mirror.sync()
+
+    def ids(self, items, key='Id'):
+        return sorted(item[key] for item in items)
+
+    def test_sync(self):
+        assert len(self.mirror.containers()) == 3
+        assert len(self.mirror.images()) == 2
+        assert len(self.mirror.networks()) == 2
+        assert len(self.mirror.volumes()) == 1
+        assert self.mirror.since == 1506938400 - 1
+        self.client.containers.assert_called_once_with(all=True)
+
+    def test_get(self):
+        assert self.mirror.get('container', 'abc123')['Id'] == 'abc123'
+        assert self.mirror.get('container', 'web')['Id'] == 'abc123'
+        assert self.mirror.get('container', 'fe')['Id'] == 'fed789'
+        assert self.mirror.get('container', 'ab') is None
+        assert self.mirror.get('image', 'busybox:latest')['Id'] == (
+            'sha256:111'
+        )
+        assert self.mirror.get('image', '222')['Id'] == 'sha256:222'
+        assert self.mirror.get('volume', 'data')['Driver'] == 'local'
+
+    def test_container_filters(self):
+        query = self.mirror.containers
+        assert self.ids(query({'status': 'running'})) == ['abc123', 'abd456']
+        assert self.ids(query({'label': 'app'})) == ['abc123', 'abd456']
+        assert self.ids(query({'label': ['app=web', 'tier']})) == ['abc123']
+        assert self.ids(query({'label': 'app=nope'})) == []
+        assert self.ids(query({'name': '^/w'})) == ['abc123']
+        assert self.ids(query({'id': 'ab'})) == ['abc123', 'abd456']
+        assert self.ids(query({'exited': 3})) == ['fed789']
+        assert self.ids(query({'since': 'web'})) == ['abd456', 'fed789']
+        assert self.ids(query({'before': 'job', 'id': 'abd'})) == ['abd456']
+        assert self.ids(query({'ancestor': 'busybox'})) == [
+            'abc123', 'abd456', 'fed789'
+        ]
+
+    def test_other_filters(self):
+        assert self.ids(self.mirror.images({'dangling': True})) == [
+            'sha256:222'
+        ]
+        assert self.ids(self.mirror.images({'reference': 'busy*'})) == [
+            'sha256:111'
+        ]
+        assert self.ids(self.mirror.networks({'type': 'custom'})) == ['n2']
+        assert self.ids(self.mirror.networks({'driver': 'bridge'})) == ['n1']
+        assert self.ids(
+            self.mirror.volumes({'label': 'keep'}), key='Name'
+        ) == ['data']
+
+    def test_unsupported_filter(self):
+        with pytest.raises(InvalidArgument):
+            self.mirror.containers({'health': 'healthy'})
+
+    def test_container_events(self):
+        self.client.containers.return_value = [
+            container('abc1234', 'other'),
+            container('abc123', 'web2', state='exited', labels={'app': 'x'}),
+        ]
+        self.mirror.process_event({
+            'Type': 'container', 'Action': 'die', 'time': 1506938500,
+            'Actor': {'ID': 'abc123', 'Attributes': {}},
+        })
+        self.client.containers.assert_called_with(
+            all=True, filters={'id': 'abc123'}
+        )
+        assert self.mirror.get('container', 'web') is None
+        assert self.mirror.get('container', 'web2')['State'] == 'exited'
+        assert self.ids(self.mirror.containers({'label': 'app=x'})) == [
+            'abc123'
+        ]
+        assert self.ids(self.mirror.containers({'label': 'tier'})) == []
+        assert self.mirror.since == 1506938500
+
+        self.mirror.process_event({'status': 'destroy', 'id': 'abd456'})
+        assert self.ids(self.mirror.containers()) == ['abc123', 'fed789']
+
+        calls = self.client.containers.call_count
+        self.mirror.process_event({
+            'Type': 'container', 'Action': 'exec_start: sh',
+            'Actor': {'ID': 'abc123'},
+        })
+        assert self.client.containers.call_count == calls
+
+    def test_other_events(self):
+        self.client.inspect_image.return_value = {
+            'Id': 'sha256:111', 'RepoTags': [], 'RepoDigests': []
+        }
+        self.mirror.process_event({'status': 'untag', 'id': 'sha256:111'})
+        assert self.ids(self.mirror.images({'dangling': True})) == [
+            'sha256:111', 'sha256:222'
+        ]
+        self.mirror.process_event({'status': 'delete', 'id': 'sha256:111'})
+        assert self.ids(self.mirror.images()) == ['sha256:222']
+        # Only the initial sync listed the images
+        self.client.images.assert_called_once_with()
+
+        self.client.networks.return_value = [
+            {'Id': 'n3', 'Name': 'front', 'Driver': 'bridge'}
+        ]
+        self.mirror.process_event({
+            'Type': 'network', 'Action': 'create', 'Actor': {'ID': 'n3'},
+        })
+        self.client.networks.assert_called_with(ids=['n3'])
+        self.mirror.process_event({
+            'Type': 'network', 'Action': 'destroy', 'Actor': {'ID': 'n1'},
+        })
+        assert self.ids(self.mirror.networks()) == ['n2', 'n3']
+
+        self.mirror.process_event({
+            'Type': 'volume', 'Action': 'destroy', 'Actor': {'ID': 'data'},
+        })
+        assert self.mirror.volumes() == []
+
+    def test_image_event_lists_images_without_lock(self):
+        locked = []
+
+        def images(filters):
+            def try_lock():
+                acquired = self.mirror._lock.acquire(False)
+                locked.append(not acquired)
+                if acquired:
+                    self.mirror._lock.release()
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            return [{'Id': 'sha256:333', 'RepoTags': ['alpine:latest'],
+                     'Labels': None, 'Created': 30}]
+
+        self.client.inspect_image.return_value = {
+            'Id': 'sha256:333', 'RepoTags': ['alpine:latest'],
+            'RepoDigests': ['alpine@sha256:aaa'],
+        }
+        self.client.images.side_effect = images
+        self.mirror.process_event({
+            'Type': 'image', 'Action': 'pull',
+            'Actor': {'ID': 'alpine:latest'},
+        })
+        assert locked == [False]
+        self.client.images.assert_called_with(
+            filters={'reference': 'alpine:latest'}
+        )
+        assert self.mirror.get('image', 'alpine:latest')['RepoDigests'] == [
+            'alpine@sha256:aaa'
+        ]
+
+    def test_image_tag_moved(self):
+        self.client.inspect_image.return_value = {
+            'Id': 'sha256:222', 'RepoTags': ['busybox:latest'],
+            'RepoDigests': [],
+        }
+        self.mirror.process_event({
+            'Type': 'image', 'Action': 'tag',
+            'Actor': {'ID': 'sha256:222',
+                      'Attributes': {'name': 'busybox:latest'}},
+        })
+        self.client.inspect_image.assert_called_once_with('sha256:222')
+        assert self.mirror.get('image', 'busybox:latest')['Id'] == (
+            'sha256:222'
+        )
+        assert self.mirror.get('image', 'sha256:222')['Labels'] == {'a': 'b'}
+        assert self.ids(self.mirror.images({'dangling': True})) == [
+            'sha256:111'
+        ]
+        self.client.images.assert_called_once_with()
+
+    def test_resync_after_failed_reconnect(self):
+        events = [
+            {'Type': 'container', 'Action': 'destroy',
+             'Actor': {'ID': 'abc123'}, 'time': 1506938600},
+        ]
+
+        def stream_helper(response, decode, read_size):
+            for event in events:
+                yield event
+            raise IOError('connection lost')
+
+        def open_events():
+            if open_events.calls == 1:
+                open_events.calls += 1
+                raise IOError('connection refused')
+            if open_events.calls == 3:
+                self.mirror._stopped.set()
+            open_events.calls += 1
+            return mock.MagicMock()
+        open_events.calls = 0
+
+        self.client._stream_helper.side_effect = stream_helper
+        self.mirror._open_events = open_events
+        with mock.patch.object(self.mirror._stopped, 'wait'):
+            self.mirror.run()
+
+        assert open_events.calls == 4
+        # Initial sync, and the resync after the failed reconnection
+        assert self.client.images.call_count == 2
+
+    def run_streams(self, streams):
+        def stream_helper(response, decode, read_size):
+            for event in streams.pop(0):
+                yield event
+            if not streams:
+                self.mirror._stopped.set()
+            raise IOError('connection lost')
+
+        self.client._stream_helper.side_effect = stream_helper
+        self.mirror._open_events = mock.MagicMock()
+        with mock.patch.object(self.mirror._stopped, 'wait'):
+            self.mirror.run()
+
+    def test_replay_from_last_event(self):
+        last = {'Type': 'container', 'Action': 'die', 'time': 1506938500,
+                'timeNano': 1506938500000000123, 'Actor': {'ID': 'abc123'}}
+        later = dict(last, time=1506938501, timeNano=1506938501000000000)
+        self.run_streams([[last], [last, later]])
+        # The replay started with the last event received: nothing was lost
+        assert self.client.images.call_count == 1
+        assert self.mirror.since == 1506938501
+
+    def test_resync_after_missed_events(self):
+        last = {'Type': 'container', 'Action': 'die', 'time': 1506938500,
+                'timeNano': 1506938500000000123, 'Actor': {'ID': 'abc123'}}
+        later = dict(last, timeNano=1506938500000000456)
+        self.run_streams([[last], [later]])
+        # The server no longer had the last event received
+        assert self.client.images.call_count == 2
+        assert self.mirror.since == 1506938500
@@ -0,0 +1,132 @@
+import json
+import unittest
+
+from docker.utils.progress import ProgressAggregator
+
+PULL_OUTPUT = [
+    {'status': 'Pulling from library/web', 'id': 'latest'},
+    {'status': 'Pulling fs layer', 'progressDetail': {}, 'id': 'aaa'},
+    {'status': 'Already exists', 'progressDetail': {}, 'id': 'bbb'},
+    {'status': 'Downloading', 'id': 'aaa',
+     'progressDetail': {'current': 100, 'total': 1000}},
+    {'status': 'Downloading', 'id': 'aaa',
+     'progressDetail': {'current': 300, 'total': 1000}},
+    {'status': 'Downloading', 'id': 'aaa',
+     'progressDetail': {'current': 500, 'total': 1000}},
+    {'status': 'Verifying Checksum', 'progressDetail': {}, 'id': 'aaa'},
+    {'status': 'Extracting', 'id': 'aaa',
+     'progressDetail': {'current': 200, 'total': 1000}},
+    {'status': 'Pull complete', 'progressDetail': {}, 'id': 'aaa'},
+    {'status': 'Status: Downloaded newer image for web:latest'},
+]
+
+
+class FakeClock(object):
+    def __init__(self, times):
+        self.times = list(times)
+
+    def __call__(self):
+        return self.times.pop(0)
+
+
+class ProgressAggregatorTest(unittest.TestCase):
+
+    def test_layers(self):
+        aggregator = ProgressAggregator(
+            clock=FakeClock([0, 0, 0, 0.5, 1.5, 2.5, 3, 3.5, 4, 4, 4]),
+            interval=0
+        )
+        snapshots = list(aggregator.analyze(PULL_OUTPUT))
+        assert len(snapshots) == len(PULL_OUTPUT) + 1
+
+        assert list(aggregator.layers) == ['aaa', 'bbb']
+        aaa = aggregator.layers['aaa']
+        assert aaa.phase == 'Pull complete'
+        assert aaa.done
+        assert aaa.size == 1000
+        assert aaa.transferred == 1000
+        assert aaa.started == 0
+        assert aaa.updated == 4
+        assert aggregator.layers['bbb'].done
+        assert aggregator.status == (
+            'Status: Downloaded newer image for web:latest'
+        )
+
+        downloading = snapshots[4]
+        layer = downloading.layers[0]
+        assert (layer.phase, layer.current, layer.total) == (
+            'Downloading', 300, 1000
+        )
+        assert layer.rate == 200.0
+        assert downloading.transferred == 300
+        assert downloading.total == 1000
+        assert downloading.rate == 200.0
+        assert downloading.eta == 3.5
+        assert downloading.done == 1
+
+        extracting = snapshots[7]
+        assert extracting.layers[0].current == 200
+        assert extracting.transferred == 1000
+
+        last = snapshots[-1]
+        assert last.done == 2
+        assert last.transferred == last.total == 1000
+        assert last.eta == 0
+        assert last.error is None
+
+    def test_snapshots_are_copies(self):
+        aggregator = ProgressAggregator(interval=0)
+        first = aggregator.feed(PULL_OUTPUT[1])
+        aggregator.feed(PULL_OUTPUT[3])
+        assert first.layers[0].phase == 'Pulling fs layer'
+        assert aggregator.layers['aaa'].phase == 'Downloading'
+
+    def test_throttled(self):
+        snapshots = []
+        times = [0, 0.05, 0.09, 0.1, 0.15, 0.25, 0.26, 0.27, 0.28, 0.29, 1]
+        aggregator = ProgressAggregator(
+            callback=snapshots.append, clock=FakeClock(times)
+        )
+        emitted = [aggregator.feed(event) for event in PULL_OUTPUT]
+        aggregator.close()
+        assert [e is not None for e in emitted] == [
+            True, False, False, True, False, True, False, False, False,
+            False
+        ]
+        assert [s.time for s in snapshots] == [0, 0.1, 0.25, 1]
+
+    def test_error(self):
+        snapshots = []
+        aggregator = ProgressAggregator(
+            callback=snapshots.append, clock=FakeClock([0, 0.01, 0.02])
+        )
+        aggregator.feed(PULL_OUTPUT[1])
+        aggregator.feed(PULL_OUTPUT[3])
+        aggregator.feed({'error': 'unauthorized'})
+        assert len(snapshots) == 2
+        assert snapshots[-1].error == 'unauthorized'
+        assert aggregator.error == 'unauthorized'
+
+    def test_push(self):
+        output = [
+            {'status': 'The push refers to repository [docker.io/x/web]'},
+            {'status': 'Preparing', 'progressDetail': {}, 'id': 'aaa'},
+            {'status': 'Pushing', 'id': 'aaa',
+             'progressDetail': {'current': 512, 'total': 2048}},
+            {'status': 'Pushed', 'progressDetail': {}, 'id': 'aaa'},
+            {'status': 'latest: digest: sha256:abc size: 527'},
+        ]
+        aggregator = ProgressAggregator(interval=0)
+        last = list(aggregator.analyze(output))[-1]
+        assert last.done == 1
+        assert last.transferred == last.total == 2048
+        assert last.status == 'latest: digest: sha256:abc size: 527'
+
+    def test_raw_stream(self):
+        output = [
+            json.dumps(event).encode('utf-8') for event in PULL_OUTPUT
+        ]
+        aggregator = ProgressAggregator(interval=0)
+        last = list(aggregator.analyze(output))[-1]
+        assert last.done == 2
+        assert last.transferred == 1000
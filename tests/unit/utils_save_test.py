@@ -0,0 +1,103 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import pytest
+
+from docker.errors import DockerException
+from docker.utils.save import save_stream
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+DATA = os.urandom(100000)
+DIGEST = 'sha256:' + hashlib.sha256(DATA).hexdigest()
+
+
+class ReadOnly(object):
+    def __init__(self, data):
+        self._f = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self._f.read(min(size, 1000))
+
+
+class Broken(io.BytesIO):
+    def readinto(self, buf):
+        if self.tell() >= 5000:
+            raise IOError('connection reset')
+        return super(Broken, self).readinto(buf)
+
+
+class SaveStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, 'image.tar')
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_path(self):
+        result = save_stream(io.BytesIO(DATA), self.path, buffer_size=4096)
+        assert result == (DIGEST, len(DATA))
+        assert self.read() == DATA
+        assert os.listdir(self.dir) == ['image.tar']
+
+    def test_replaces_path(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'old')
+        save_stream(io.BytesIO(DATA), self.path)
+        assert self.read() == DATA
+
+    def test_error_keeps_path(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'old')
+        with pytest.raises(IOError):
+            save_stream(Broken(DATA), self.path, buffer_size=1024)
+        assert self.read() == b'old'
+        assert os.listdir(self.dir) == ['image.tar']
+
+    def test_fd(self):
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT)
+        try:
+            os.write(fd, b'head')
+            result = save_stream(io.BytesIO(DATA), fd)
+        finally:
+            os.close(fd)
+        assert result == (DIGEST, len(DATA))
+        assert self.read() == b'head' + DATA
+
+    def test_file_object(self):
+        with open(self.path, 'wb') as f:
+            # Buffered, and written before the stream
+            f.write(b'head')
+            result = save_stream(ReadOnly(DATA), f, buffer_size=4096)
+        assert result == (DIGEST, len(DATA))
+        assert self.read() == b'head' + DATA
+
+    def test_empty(self):
+        result = save_stream(io.BytesIO(), self.path)
+        assert result == ('sha256:' + hashlib.sha256().hexdigest(), 0)
+        assert self.read() == b''
+
+    def test_stdout(self):
+        with open(self.path, 'wb') as f:
+            with mock.patch('sys.stdout', f):
+                result = save_stream(io.BytesIO(DATA), '-')
+        assert result == (DIGEST, len(DATA))
+        assert self.read() == DATA
+
+    def test_stdout_terminal(self):
+        stdout = mock.Mock()
+        stdout.isatty.return_value = True
+        with mock.patch('sys.stdout', stdout):
+            with pytest.raises(DockerException):
+                save_stream(io.BytesIO(DATA), '-')
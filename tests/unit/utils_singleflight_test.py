@@ -0,0 +1,72 @@
+import threading
+import unittest
+
+import pytest
+
+from docker.utils.singleflight import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_shared_result(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def func():
+            calls.append(1)
+            release.wait()
+            return 'result'
+
+        def call():
+            results.append(flight.do('key', func))
+
+        threads = [threading.Thread(target=call) for i in range(3)]
+        threads[0].start()
+        while not flight.in_flight('key'):
+            threads[0].join(0.01)
+        for t in threads[1:]:
+            t.start()
+            t.join(0.1)
+            assert t.is_alive()
+        release.set()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1
+        assert sorted(results) == [
+            ('result', False), ('result', True), ('result', True)
+        ]
+        assert not flight.in_flight('key')
+        assert flight.do('key', lambda: 'again') == ('again', False)
+
+    def test_shared_error(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        started = threading.Event()
+
+        def func():
+            started.set()
+            release.wait()
+            raise ValueError('failed')
+
+        errors = []
+
+        def follower():
+            try:
+                flight.do('key', lambda: 'unused')
+            except ValueError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=lambda: pytest.raises(
+            ValueError, flight.do, 'key', func
+        ))
+        leader.start()
+        started.wait()
+        thread = threading.Thread(target=follower)
+        thread.start()
+        release.set()
+        leader.join()
+        thread.join()
+        assert len(errors) == 1
+        assert str(errors[0]) == 'failed'
@@ -0,0 +1,176 @@
+import io
+import os
+import socket
+import struct
+
+import pytest
+
+from docker.utils.socket import (
+    STDERR, STDOUT, ChunkDecoder, SocketError, SocketTimeout, chunks_iter,
+    demux_frames, demux_to_fds, frames_iter, frames_view_iter, join_frames,
+    parse_chunk_size, read
+)
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def chunked(*chunks):
+    body = b''.join(
+        '{0:x}\r\n'.format(len(c)).encode('ascii') + c + b'\r\n'
+        for c in chunks
+    )
+    return io.BufferedReader(io.BytesIO(body + b'0\r\n\r\n'))
+
+
+class TestChunksIter(object):
+
+    def test_yields_each_chunk(self):
+        chunks = [b'{"status": "a"}\n', b'x', b'{"status": "b"}\n']
+        assert list(chunks_iter(chunked(*chunks))) == chunks
+
+    def test_small_read_size(self):
+        chunks = [b'0123456789' * 5, b'abc', b'de' * 30]
+        assert list(chunks_iter(chunked(*chunks), read_size=16)) == chunks
+
+    def test_chunk_extensions(self):
+        fp = io.BufferedReader(io.BytesIO(b'3;name=value\r\nabc\r\n0\r\n\r\n'))
+        assert list(chunks_iter(fp)) == [b'abc']
+
+    def test_eof_without_last_chunk(self):
+        fp = io.BufferedReader(io.BytesIO(b'3\r\nabc\r\n'))
+        assert list(chunks_iter(fp)) == [b'abc']
+
+    def test_truncated_chunk(self):
+        fp = io.BufferedReader(io.BytesIO(b'a\r\nabc'))
+        with pytest.raises(SocketError):
+            list(chunks_iter(fp))
+
+    def test_invalid_chunk_size(self):
+        fp = io.BufferedReader(io.BytesIO(b'xyz\r\nabc\r\n'))
+        with pytest.raises(SocketError):
+            list(chunks_iter(fp))
+
+
+class TestChunkDecoder(object):
+
+    def test_pieces_of_any_size(self):
+        chunks = [b'0123456789' * 5, b'abc', b'de' * 30]
+        body = chunked(*chunks).read()
+        for size in (1, 7, len(body)):
+            decoder = ChunkDecoder()
+            data = b''.join(
+                decoder.feed(body[i:i + size])
+                for i in range(0, len(body), size)
+            )
+            assert data == b''.join(chunks)
+            assert decoder.done
+
+    def test_invalid_chunk_size(self):
+        with pytest.raises(SocketError):
+            ChunkDecoder().feed(b'xyz\r\nabc\r\n')
+
+    def test_parse_chunk_size(self):
+        assert parse_chunk_size(b'1a;name=value\r') == 26
+        assert parse_chunk_size(bytearray(b'\r')) is None
+
+
+def frame(stream_id, data):
+    return struct.pack('>BxxxL', stream_id, len(data)) + data
+
+
+class TestFramesViewIter(object):
+
+    def setup_method(self, method):
+        self.sock, self.server = socket.socketpair()
+
+    def teardown_method(self, method):
+        self.sock.close()
+        self.server.close()
+
+    def send(self, *frames):
+        self.server.sendall(b''.join(frames))
+        self.server.shutdown(socket.SHUT_WR)
+
+    def test_stream_ids(self):
+        self.send(frame(STDOUT, b'out'), frame(STDERR, b'err'))
+        frames = [
+            (stream_id, bytes(data))
+            for stream_id, data in frames_view_iter(self.sock)
+        ]
+        assert frames == [(STDOUT, b'out'), (STDERR, b'err')]
+
+    def test_frames_larger_than_buffer(self):
+        self.send(frame(STDOUT, b'x' * 40), frame(STDERR, b'e'))
+        data = [
+            (stream_id, bytes(data))
+            for stream_id, data in frames_view_iter(self.sock, buffer_size=16)
+        ]
+        assert b''.join(d for s, d in data if s == STDOUT) == b'x' * 40
+        assert all(len(d) <= 16 for s, d in data)
+        assert data[-1] == (STDERR, b'e')
+
+    def test_frames_iter(self):
+        self.send(frame(STDOUT, b'out'), frame(STDERR, b'err'))
+        assert list(frames_iter(self.sock)) == [b'out', b'err']
+
+
+class TestDemux(object):
+    frames = [
+        (STDOUT, b'1'), (STDERR, b'a'), (STDERR, b'b'), (STDOUT, b'2'),
+    ]
+
+    def test_demux_frames(self):
+        stdout, stderr = demux_frames(iter(self.frames))
+        assert next(stdout) == b'1'
+        assert next(stdout) == b'2'
+        assert list(stderr) == [b'a', b'b']
+        assert list(stdout) == []
+
+    def test_join_frames(self):
+        assert join_frames(self.frames) == (b'12', b'ab')
+
+    def test_demux_to_fds(self):
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        try:
+            assert demux_to_fds(self.frames, out_w, err_w) == (2, 2)
+            assert os.read(out_r, 10) == b'12'
+            assert os.read(err_r, 10) == b'ab'
+        finally:
+            for fd in (out_r, out_w, err_r, err_w):
+                os.close(fd)
+
+
+class TestRead(object):
+
+    def setup_method(self, method):
+        self.sock, self.server = socket.socketpair()
+
+    def teardown_method(self, method):
+        self.sock.close()
+        self.server.close()
+
+    def test_read_blocking_socket(self):
+        self.server.sendall(b'data')
+        with mock.patch('select.poll') as poll:
+            assert read(self.sock) == b'data'
+        assert not poll.called
+
+    def test_read_non_blocking_socket(self):
+        self.sock.setblocking(False)
+        self.server.sendall(b'data')
+        assert read(self.sock) == b'data'
+
+    def test_read_timeout(self):
+        with pytest.raises(SocketTimeout):
+            read(self.sock, timeout=0.01)
+
+    def test_frames_iter_timeout(self):
+        self.server.sendall(frame(STDOUT, b'out'))
+        frames = frames_iter(self.sock, timeout=0.01)
+        assert next(frames) == b'out'
+        with pytest.raises(SocketTimeout):
+            next(frames)
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
 import base64
+import hashlib
+import io
 import json
 import os
 import os.path
@@ -10,6 +12,8 @@ import sys
 import tarfile
 import tempfile
 import unittest
+from gzip import GzipFile
+from multiprocessing.pool import ThreadPool
 
 import pytest
 import six
@@ -21,14 +25,22 @@ from docker.utils import (
     parse_repository_tag, parse_host, convert_filters, kwargs_from_env,
     parse_bytes, parse_env_file, exclude_paths, convert_volume_binds,
     decode_json_header, tar, split_command, parse_devices, update_headers,
+    stream_archive, archive_digest,
 )
 
-from docker.utils.build import should_check_directory
+from docker.utils.build import (
+    PatternMatcher, match_path, should_check_directory, walk_context
+)
 from docker.utils.ports import build_port_bindings, split_port
-from docker.utils.utils import format_environment
+from docker.utils.utils import format_environment, get_tarinfo
 
 from ..helpers import make_tree
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 
 TEST_CERT_DIR = os.path.join(
     os.path.dirname(__file__),
@@ -891,6 +903,39 @@ class ExcludePathsTest(unittest.TestCase):
             )
         )
 
+    def test_walk_context_stats(self):
+        stats = walk_context(self.base, ['foo', '*.py', '!b.py'], workers=4)
+        assert set(stats) == self.exclude(['foo', '*.py', '!b.py'])
+        for path, statres in stats.items():
+            expected = os.lstat(os.path.join(self.base, path))
+            assert (statres.st_ino, statres.st_mode) == (
+                expected.st_ino, expected.st_mode
+            )
+
+    def test_walk_context_sequential(self):
+        assert walk_context(self.base, ['subdir'], workers=1) == (
+            walk_context(self.base, ['subdir'])
+        )
+
+    def test_walk_context_reuses_pool(self):
+        with mock.patch(
+                'docker.utils.pool.ThreadPool', wraps=ThreadPool) as pool:
+            walk_context(self.base, ['foo'], workers=3)
+            walk_context(self.base, ['bar'], workers=3)
+        assert pool.call_count <= 1
+
+
+class ExcludePathsWalkTest(ExcludePathsTest):
+    """
+    The same tests, using os.listdir where scandir isn't available.
+    """
+
+    def setUp(self):
+        super(ExcludePathsWalkTest, self).setUp()
+        patcher = mock.patch('docker.utils.build.scandir', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
 
 class TarTest(unittest.TestCase):
     def test_tar_with_excludes(self):
@@ -990,6 +1035,112 @@ class TarTest(unittest.TestCase):
                 sorted(tar_data.getnames()), ['bar', 'foo']
             )
 
+    @pytest.mark.skipif(IS_WINDOWS_PLATFORM, reason='No symlinks on Windows')
+    def test_tar_stream(self):
+        base = make_tree(['foo', 'foo/bar'], ['Dockerfile', 'foo/bar/a.py'])
+        self.addCleanup(shutil.rmtree, base)
+        with open(os.path.join(base, 'big'), 'wb') as f:
+            f.write(os.urandom(300000))
+        os.symlink('foo', os.path.join(base, 'link'))
+        os.link(
+            os.path.join(base, 'big'), os.path.join(base, 'foo', 'big2')
+        )
+
+        with tar(base) as archive:
+            expected = tarfile.open(fileobj=archive)
+            expected_members = [
+                (m.name, m.type, m.linkname, m.size)
+                for m in expected.getmembers()
+            ]
+            expected_big = expected.extractfile('big').read()
+
+        for gzip in (False, True):
+            data = b''.join(tar(base, gzip=gzip, stream=True))
+            archive = tarfile.open(fileobj=io.BytesIO(data))
+            assert [
+                (m.name, m.type, m.linkname, m.size)
+                for m in archive.getmembers()
+            ] == expected_members
+            assert archive.extractfile('big').read() == expected_big
+            if not gzip:
+                assert len(data) % tarfile.RECORDSIZE == 0
+
+    def test_tar_stream_is_incremental(self):
+        base = make_tree([], ['Dockerfile'])
+        self.addCleanup(shutil.rmtree, base)
+        with open(os.path.join(base, 'big'), 'wb') as f:
+            f.write(b'x' * 300000)
+
+        chunks = list(stream_archive(base, chunk_size=4096))
+        assert len(chunks) > 1
+        assert max(len(c) for c in chunks[:-1]) < 8192
+
+    def test_tar_reproducible(self):
+        trees = []
+        for mtime in (1000, 2000):
+            base = make_tree(['foo', 'bar'], ['Dockerfile', 'foo/a.py'])
+            self.addCleanup(shutil.rmtree, base)
+            for root, dirs, files in os.walk(base):
+                for name in dirs + files:
+                    os.utime(os.path.join(root, name), (mtime, mtime))
+            trees.append(base)
+
+        archives = []
+        for base in trees:
+            with tar(base, reproducible=True) as archive:
+                archives.append(archive.read())
+        assert archives[0] == archives[1]
+        assert b''.join(tar(trees[0], stream=True, reproducible=True)) == (
+            archives[0]
+        )
+        with tar(trees[0]) as archive:
+            assert archive.read() != archives[0]
+
+        archive = tarfile.open(fileobj=io.BytesIO(archives[0]))
+        assert archive.getnames() == ['Dockerfile', 'bar', 'foo', 'foo/a.py']
+        for member in archive.getmembers():
+            assert (member.mtime, member.uid, member.uname) == (0, 0, '')
+
+        digest = archive_digest(trees[0])
+        assert digest == archive_digest(trees[1])
+        assert digest == 'sha256:' + hashlib.sha256(archives[0]).hexdigest()
+
+    def test_tar_reproducible_digest(self):
+        base = make_tree(['foo'], ['Dockerfile', 'foo/a.py'])
+        self.addCleanup(shutil.rmtree, base)
+        digest = archive_digest(base)
+
+        with tar(base, reproducible=True, gzip=True) as archive:
+            assert archive.digest == digest
+        stream = tar(base, stream=True, reproducible=True, gzip=True)
+        assert stream.digest is None
+        data = b''.join(stream)
+        assert stream.digest == digest
+        # The digest is the one of the archive before compression
+        assert hashlib.sha256(
+            GzipFile(fileobj=io.BytesIO(data)).read()
+        ).hexdigest() == digest[len('sha256:'):]
+        assert tar(base, stream=True).digest is None
+
+    @pytest.mark.skipif(IS_WINDOWS_PLATFORM, reason='No symlinks on Windows')
+    def test_get_tarinfo(self):
+        base = make_tree(['foo'], ['Dockerfile', 'foo/a.py'])
+        self.addCleanup(shutil.rmtree, base)
+        os.symlink('foo', os.path.join(base, 'link'))
+        os.link(
+            os.path.join(base, 'Dockerfile'), os.path.join(base, 'hard')
+        )
+        paths = ['Dockerfile', 'foo', 'foo/a.py', 'hard', 'link']
+        t1 = tarfile.open(mode='w', fileobj=io.BytesIO())
+        t2 = tarfile.open(mode='w', fileobj=io.BytesIO())
+        names = {}
+        for path in paths:
+            statres = os.lstat(os.path.join(base, path))
+            info = get_tarinfo(t2, base, path, {path: statres}, names)
+            expected = t1.gettarinfo(os.path.join(base, path), arcname=path)
+            assert info.get_info() == expected.get_info()
+        assert t2.inodes == t1.inodes
+
 
 class ShouldCheckDirectoryTest(unittest.TestCase):
     exclude_patterns = [
@@ -1054,6 +1205,58 @@ class ShouldCheckDirectoryTest(unittest.TestCase):
         )
 
 
+class PatternMatcherTest(unittest.TestCase):
+    exclude_patterns = [
+        '*.py', 'foo/*/a.py', '**/target', 'Sub?ir', 'dir/with/exceptions',
+        'dir/with/subdir_excluded/', ''
+    ]
+    include_patterns = [
+        'foo/b.py', 'dir/with/exceptions/like_this_one', '**/keep.py'
+    ]
+    paths = [
+        'a.py', 'A.PY', 'foo/b.py', 'foo/bar/a.py', 'foo/bar/b.py',
+        'foo/bar/a.py/inner', 'target', 'x/y/target', 'x/target/file',
+        'subdir', 'SUBDIR/file', 'subdirs', 'dir', 'dir/with',
+        'dir/with/exceptions', 'dir/with/exceptions/like_this_one',
+        'dir/with/exceptions/in', 'dir/with/subdir_excluded/file',
+        'deep/keep.py', 'keep.py', 'Dockerfile',
+    ]
+
+    def test_matches_match_path(self):
+        matcher = PatternMatcher(self.exclude_patterns, self.include_patterns)
+        for path in map(convert_path, self.paths):
+            excluded = any(
+                match_path(path, p) for p in self.exclude_patterns
+            )
+            included = any(
+                match_path(path, p) for p in self.include_patterns
+            )
+            assert matcher.should_include(path) == (
+                not excluded or included
+            ), path
+
+    def test_should_check_directory(self):
+        matcher = PatternMatcher(self.exclude_patterns, self.include_patterns)
+        assert matcher.should_check_directory(convert_path('dir/with'))
+        assert matcher.should_check_directory(
+            convert_path('dir/with/exceptions')
+        )
+        assert not matcher.should_check_directory(
+            convert_path('x/y/target')
+        )
+
+    def test_no_patterns(self):
+        matcher = PatternMatcher([], [])
+        assert matcher.should_include('anything')
+        assert not matcher.has_child_exceptions('anything')
+
+    def test_many_double_star_patterns(self):
+        patterns = ['**/dir{0}/**'.format(i) for i in range(200)]
+        matcher = PatternMatcher(patterns, [])
+        assert not matcher.should_include(convert_path('a/dir150/b'))
+        assert matcher.should_include(convert_path('a/dir200/b'))
+
+
 class FormatEnvironmentTest(unittest.TestCase):
     def test_format_env_binary_unicode_value(self):
         env_dict = {
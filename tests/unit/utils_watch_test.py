@@ -0,0 +1,140 @@
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+import pytest
+
+from docker.utils.build import walk_context
+from docker.utils.watch import ContextWatcher, Inotify, inotify_available
+
+from ..helpers import make_tree
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class InotifyTest(unittest.TestCase):
+
+    def setUp(self):
+        if not inotify_available():
+            pytest.skip('inotify is not available')
+
+    def test_read_high_file_descriptor(self):
+        try:
+            import resource
+        except ImportError:
+            pytest.skip('requires the resource module')
+        high = 1500
+        if resource.getrlimit(resource.RLIMIT_NOFILE)[0] <= high:
+            pytest.skip('the file descriptor limit is too low')
+        base = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base)
+        inotify = Inotify()
+        self.addCleanup(inotify.close)
+        # select() can't wait on descriptors above FD_SETSIZE (1024)
+        os.dup2(inotify.fd, high)
+        os.close(inotify.fd)
+        inotify.fd = high
+
+        inotify.add_watch(base)
+        open(os.path.join(base, 'a'), 'w').close()
+        names = [name for _, _, _, name in inotify.read(timeout=2)]
+        assert 'a' in names
+
+
+class ContextWatcherTest(unittest.TestCase):
+    use_inotify = True
+
+    def setUp(self):
+        if self.use_inotify and not inotify_available():
+            pytest.skip('inotify is not available')
+        self.base = make_tree(
+            ['foo', 'build'],
+            ['Dockerfile', 'foo/a.py', 'build/out', 'a.pyc']
+        )
+        self.addCleanup(shutil.rmtree, self.base)
+        self.write('.dockerignore', 'build\n*.pyc\n')
+        patcher = mock.patch(
+            'docker.utils.watch.inotify_available',
+            return_value=self.use_inotify
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.watcher = ContextWatcher(
+            self.base, debounce=0.05, poll_interval=0.05
+        )
+        self.addCleanup(self.watcher.close)
+
+    def write(self, path, data='x'):
+        with open(os.path.join(self.base, path), 'w') as f:
+            f.write(data)
+
+    def assert_indexed(self, patterns=('build', '*.pyc')):
+        assert set(self.watcher.index) == set(
+            walk_context(self.base, list(patterns))
+        )
+
+    def test_index(self):
+        self.assert_indexed()
+        with tarfile.open(fileobj=self.watcher.tar()) as t:
+            assert sorted(t.getnames()) == sorted(self.watcher.index)
+
+    def test_changed_file(self):
+        self.write('foo/a.py', 'changed')
+        assert 'foo/a.py' in self.watcher.changes(timeout=2)
+        assert self.watcher.index['foo/a.py'].st_size == len('changed')
+
+    def test_new_directories(self):
+        os.makedirs(os.path.join(self.base, 'foo', 'bar', 'baz'))
+        self.write('foo/bar/baz/b.py')
+        changed = self.watcher.changes(timeout=2)
+        assert 'foo/bar/baz/b.py' in changed
+        self.assert_indexed()
+
+        self.write('foo/bar/baz/d.py')
+        assert 'foo/bar/baz/d.py' in self.watcher.changes(timeout=2)
+        self.assert_indexed()
+
+    def test_moved_and_removed_directories(self):
+        os.rename(
+            os.path.join(self.base, 'foo'), os.path.join(self.base, 'qux')
+        )
+        changed = self.watcher.changes(timeout=2)
+        assert set(['foo/a.py', 'qux/a.py']) <= changed
+        self.assert_indexed()
+
+        shutil.rmtree(os.path.join(self.base, 'qux'))
+        assert 'qux/a.py' in self.watcher.changes(timeout=2)
+        self.assert_indexed()
+
+    def test_excluded_changes(self):
+        os.mkdir(os.path.join(self.base, 'build', 'sub'))
+        self.write('build/out', 'changed')
+        self.write('b.pyc')
+        assert self.watcher.changes(timeout=0.3) == set()
+
+    def test_removed_file_does_not_scan_index(self):
+        index = mock.MagicMock(wraps=self.watcher.index)
+        index.get.side_effect = self.watcher.index.get
+        index.pop.side_effect = self.watcher.index.pop
+        self.watcher.index = index
+        os.remove(os.path.join(self.base, 'foo', 'a.py'))
+        assert self.watcher._update('foo/a.py') == set(['foo/a.py'])
+        index.__iter__.assert_not_called()
+
+    def test_dockerignore_changed(self):
+        self.write('.dockerignore', '*.pyc\n')
+        changed = self.watcher.changes(timeout=2)
+        assert 'build/out' in changed
+        self.assert_indexed(['*.pyc'])
+
+        self.write('build/out', 'changed')
+        assert 'build/out' in self.watcher.changes(timeout=2)
+
+
+class PollingContextWatcherTest(ContextWatcherTest):
+    use_inotify = False